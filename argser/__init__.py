@@ -1,11 +1,23 @@
 __version__ = "0.0.16"
 
+import sys
+
+from argser.choices import Choices
 from argser.consts import FALSE_VALUES, TRUE_VALUES
 from argser.display import print_args, stringify
 from argser.exceptions import ArgserException
 from argser.fields import Arg, Opt
-from argser.parse_func import SubCommands, call, make_args_cls
-from argser.parser import make_parser, parse_args, populate_holder, sub_command
+from argser.parse_func import (
+    SubCommands,
+    bind,
+    call,
+    call_async,
+    call_many,
+    make_args_cls,
+    module_cli,
+)
+from argser.parser import make_parser, parse_args, populate_holder, sub_command, to_argv
+from argser.spec import from_bytes, to_bytes
 from argser.utils import with_args
 
 
@@ -13,3 +25,33 @@ parse = parse_args
 Argument = Arg
 Option = Opt
 Subs = SubCommands
+
+# names that pull in sockets, threads and hashing are imported on first access to keep startup fast
+_LAZY = {
+    'CachedCompleter': 'argser.completers',
+    'cached_completer': 'argser.completers',
+    'MultiTool': 'argser.dispatch',
+    'repl': 'argser.interactive',
+    'serve': 'argser.server',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+if sys.version_info < (3, 7):  # module __getattr__ isn't supported
+    from argser.completers import CachedCompleter, cached_completer  # noqa: F401
+    from argser.dispatch import MultiTool  # noqa: F401
+    from argser.interactive import repl  # noqa: F401
+    from argser.server import serve  # noqa: F401
@@ -1,10 +1,10 @@
 import argparse
-import glob
 import os
 import sys
 from typing import List
 
 import argser
+from argser import scripts
 
 argcomplete_desc = "Add auto completion for scripts. Ex: eval \"$(python -m argser auto foo.py)\""
 
@@ -21,21 +21,14 @@ class AutoArgs:
     complete_arguments = argser.Opt(nargs=argparse.REMAINDER)
     shell: str = argser.Opt(choices=('bash', 'tcsh', 'fish'), default='bash')
     mark: bool = argser.Opt(default=True, help="Add only scripts with PYTHON_ARGCOMPLETE_OK mark.")
-
-
-def _find_scripts(path: str, mark=True):
-    for fp in glob.glob(path, recursive=True):
-        fp = os.path.abspath(fp)
-        if mark:
-            with open(fp) as f:
-                if 'PYTHON_ARGCOMPLETE_OK' in f.read(1024):
-                    yield fp
-        else:
-            yield fp
+    daemon: bool = argser.Opt(
+        default=False,
+        help="Answer completions from background process that caches parsers (bash only).",
+    )
 
 
 def find_scripts(mark=True):
-    res = list(_find_scripts(os.path.join('.', '**', '*.py'), mark))
+    res = scripts.find_scripts('.', mark)
     if not res:
         raise FileNotFoundError(f"no python files with PYTHON_ARGCOMPLETE_OK marker")
     return res
@@ -46,7 +39,7 @@ def extract_scripts(executables: List[str], mark=True):
     for i, ex in enumerate(executables):
         executables[i] = os.path.abspath(ex)
         if os.path.isdir(ex):
-            res.extend(_find_scripts(os.path.join(ex, '*.py'), mark))
+            res.extend(scripts.find_scripts(ex, mark, recursive=False))
         elif os.path.exists(ex):
             res.append(os.path.abspath(ex))
     if not res:
@@ -58,6 +51,9 @@ def extract_scripts(executables: List[str], mark=True):
 def autocomplete(args: AutoArgs):
     import argcomplete
 
+    if args.daemon and args.shell != 'bash':
+        sys.stderr.write("completion daemon supports only bash\n")
+        return
     try:
         if args.executables:
             exs = extract_scripts(args.executables, args.mark)
@@ -67,16 +63,111 @@ def autocomplete(args: AutoArgs):
         sys.stderr.write(f"{e}\n")
         return
 
-    # noinspection PyTypeChecker
-    print(argcomplete.shellcode(exs, args.use_defaults, args.shell, args.complete_arguments))
+    if args.daemon:
+        from argser.completion import shellcode
+
+        print(shellcode(exs, args.complete_arguments, args.use_defaults))
+    else:
+        # noinspection PyTypeChecker
+        print(argcomplete.shellcode(exs, args.use_defaults, args.shell, args.complete_arguments))
 
     print("added autocompletion to files (if you ran this with eval):", file=sys.stderr)
     for file in exs:
         print(f"- {file}", file=sys.stderr)
 
 
+run_desc = "Call function from module with command line arguments. Ex: python -m argser run pkg.mod func"
+
+
+class RunArgs:
+    module: str = argser.Arg(help="Import path of the module.")
+    arguments: List[str] = argser.Arg(
+        nargs=argparse.REMAINDER, help="Name of the function and its arguments."
+    )
+
+
+def run(args: RunArgs):
+    cli = argser.module_cli(args.module)
+    result = cli.parse(args.arguments, parser_prog=f'argser run {args.module}')
+    if result is not None:
+        print(result)
+
+
+client_desc = "Send command line to the server started with argser.serve."
+
+
+class ClientArgs:
+    socket: str = argser.Opt(
+        default=os.environ.get('ARGSER_SOCKET'),
+        help="Path to the server's socket. Default is $ARGSER_SOCKET.",
+    )
+    cwd: bool = argser.Opt(default=False, help="Run command in current working directory.")
+    env: bool = argser.Opt(default=False, help="Send environment variables.")
+    arguments: List[str] = argser.Arg(nargs=argparse.REMAINDER, help="Command line to send.")
+
+
+def client(args: ClientArgs):
+    from argser.server import request
+
+    if not args.socket:
+        sys.stderr.write("socket is not specified\n")
+        return 2
+    env = os.environ if args.env else None
+    cwd = os.getcwd() if args.cwd else None
+    response = request(args.socket, args.arguments, cwd=cwd, env=env)
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stderr.write(response.get('stderr', ''))
+    if response.get('error'):
+        sys.stderr.write(response['error'].get('traceback') or response['error']['message'])
+    if response.get('result') is not None:
+        print(response['result'])
+    return response.get('exit_code', 1)
+
+
+completion_desc = (
+    "Print completion code for scripts. "
+    "Ex: eval \"$(python -m argser completion --static foo.py)\""
+)
+
+
+class CompletionArgs:
+    scripts: List[str] = argser.Arg(nargs='+', help="Python scripts to complete.")
+    static: bool = argser.Opt(
+        default=False,
+        help="Generate code from parsers of scripts that doesn't run python on Tab press.",
+    )
+    shell: str = argser.Opt(choices=('bash', 'tcsh', 'fish'), default='bash')
+    cache: bool = argser.Opt(
+        default=True, help="Reuse static code generated for scripts that weren't modified."
+    )
+
+
+def completion(args: CompletionArgs):
+    if not args.static:
+        import argcomplete
+
+        executables = [os.path.abspath(script) for script in args.scripts]
+        print(argcomplete.shellcode(executables, shell=args.shell))
+        return 0
+    from argser.static_completion import static_completion
+
+    code = 0
+    for script in args.scripts:
+        try:
+            print(static_completion(script, args.shell, cache_dir=None if args.cache else False))
+        except (OSError, argser.ArgserException) as e:
+            sys.stderr.write(f"{e}\n")
+            code = 1
+    return code
+
+
 class Args:
     auto = argser.sub_command(AutoArgs, help=argcomplete_desc, description=argcomplete_desc)
+    completion = argser.sub_command(
+        CompletionArgs, help=completion_desc, description=completion_desc
+    )
+    run = argser.sub_command(RunArgs, help=run_desc, description=run_desc)
+    client = argser.sub_command(ClientArgs, help=client_desc, description=client_desc)
     version = argser.Opt(action='version', version=f'%(prog)s {argser.__version__}')
 
 
@@ -84,6 +175,12 @@ def main():
     args = argser.parse_args(Args, parser_prog='argser')
     if args.auto:
         autocomplete(args.auto)
+    elif args.completion:
+        sys.exit(completion(args.completion))
+    elif args.run:
+        run(args.run)
+    elif args.client:
+        sys.exit(client(args.client))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+"""
+Choices for options with huge sets of allowed values.
+"""
+from argparse import ArgumentTypeError
+from bisect import bisect_left
+from typing import Callable, Iterable, List
+
+from argser.exceptions import ArgserException
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+class Choices:
+    """
+    Set of allowed values that is checked in constant time, completed with binary search
+    over sorted values and shown in help and errors as short summary.
+    Pass it to :class:`argser.Opt` or :class:`argser.Arg` as ``choices``, the option
+    also gets completer for argcomplete.
+
+    >>> regions = Choices(['eu-west-1', 'eu-central-1', 'us-east-1', 'us-west-2'], limit=2)
+    >>> 'us-east-1' in regions
+    True
+    >>> regions.complete('eu-')
+    ['eu-central-1', 'eu-west-1']
+    >>> regions.summary()
+    'eu-central-1, eu-west-1, ... (4 total)'
+    """
+
+    def __init__(self, values: Iterable = None, path: str = None, limit=5):
+        """
+        :param values: allowed values
+        :param path: file with one value per line, read only when values are needed.
+            Empty lines and lines starting with ``#`` are skipped.
+        :param limit: number of values to show in help and errors
+        """
+        if (values is None) == (path is None):
+            raise ArgserException("specify either values or path of choices")
+        self.path = path
+        self.limit = limit
+        self._values = None if values is None else list(values)
+        self._set = None
+        self._sorted = None
+        self._converted = {}  # factory -> set of values read from file and converted by it
+
+    @classmethod
+    def from_file(cls, path: str, limit=5) -> 'Choices':
+        """Choices that are read from the file on first use."""
+        return cls(path=path, limit=limit)
+
+    def __repr__(self):
+        if self._values is None:
+            return f'{self.__class__.__name__}(path={self.path!r})'
+        return f'{self.__class__.__name__}({self.summary()})'
+
+    @property
+    def values(self) -> list:
+        if self._values is None:
+            with open(self.path, encoding='utf-8') as f:
+                lines = (line.strip() for line in f)
+                self._values = [line for line in lines if line and not line.startswith('#')]
+        return self._values
+
+    @property
+    def sorted(self) -> List[str]:
+        """Sorted string representations of values."""
+        if self._sorted is None:
+            self._sorted = sorted(set(map(str, self.values)))
+        return self._sorted
+
+    def __contains__(self, value):
+        if self._set is None:
+            self._set = frozenset(self.values)
+        return value in self._set
+
+    def _contains_converted(self, value, factory: Callable) -> bool:
+        """Check converted value, values from file are strings, so they are converted too."""
+        if self.path is None or factory is None or factory is str:
+            return value in self
+        converted = self._converted.get(factory)
+        if converted is None:
+            try:
+                converted = frozenset(map(factory, self.values))
+            except (TypeError, ValueError, ArgumentTypeError) as e:
+                raise ArgserException(f"invalid choice in {self.path}: {e}")
+            self._converted[factory] = converted
+        return value in converted
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def complete(self, prefix: str, **kwargs) -> List[str]:
+        """
+        Get sorted values that start with prefix.
+        Accepts parameters of argcomplete completer and ignores all but prefix.
+        """
+        values = self.sorted
+        start = bisect_left(values, prefix)
+        end = bisect_left(values, prefix + MAX_CHAR, start)
+        return values[start:end]
+
+    def summary(self) -> str:
+        if self._values is None:
+            return f'values from {self.path}'
+        values = self.sorted
+        if len(values) <= self.limit:
+            return ', '.join(values)
+        return f"{', '.join(values[:self.limit])}, ... ({len(values)} total)"
+
+    def format_help(self, help: str = None) -> str:
+        summary = f'one of {self.summary()}'
+        return f'{help} ({summary})' if help else summary
+
+    def type(self, factory: Callable = None, default=None) -> Callable:
+        """
+        Make argparse ``type`` that converts value with factory and checks
+        that result is one of choices. Default value is not checked, as argparse does.
+        Values from file are converted with the same factory.
+        """
+
+        def convert(value: str):
+            res = factory(value) if factory else value
+            if value != default and not self._contains_converted(res, factory):
+                raise ArgumentTypeError(f"invalid choice: {value!r} (choose from {self.summary()})")
+            return res
+
+        convert.__name__ = getattr(factory, '__name__', 'str')
+        return convert
@@ -0,0 +1,308 @@
+"""
+Completers with persistent cache and time limit.
+
+Each Tab press starts new process, so results of slow completers are kept in files:
+``$XDG_CACHE_HOME/argser/completers/<hash>.json``. Uncached completer runs in forked process
+that sends completions through pipe as soon as they are produced, if it doesn't finish in time
+then stale cached or partial results are returned and the process keeps working in background
+to fill the cache for the next Tab press. Completions that are already computed by other process
+are awaited instead of starting one more.
+
+>>> from argser import Opt
+>>> def tables(prefix, parsed_args=None, **kwargs):
+...     return ['users', 'orders']  # slow query to the database
+>>> class Args:
+...     database = 'main'
+...     table: str = Opt(completer=cached_completer(tables, ttl=600, args=['database']))
+"""
+import hashlib
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Iterable, Optional
+
+from argser.utils import dump_json, load_json, user_cache_path
+
+logger = logging.getLogger(__name__)
+
+TTL = 60
+TIMEOUT = 0.5
+# lock of stale refresh is ignored after this number of seconds, in case refreshing process died
+LOCK_TIMEOUT = 60
+_DONE = {'done': True}
+
+
+def default_cache_dir():
+    return user_cache_path('completers')
+
+
+def _arg_value(parsed_args, name: str):
+    """Get value of argument, dests of sub-commands' arguments have ``<path>__`` prefix."""
+    values = vars(parsed_args) if parsed_args is not None else {}
+    if name in values:
+        return values[name]
+    suffix = '__' + name
+    for dest, value in values.items():
+        if dest.endswith(suffix):
+            return value
+    return None
+
+
+def _collect(output, send: Callable = None):
+    """
+    Turn output of completer into JSON-compatible result.
+
+    :param send: function that is called with every completion as soon as it's produced
+    """
+    if isinstance(output, Mapping):
+        return dict(output)
+    result = []
+    for item in output:
+        result.append(item)
+        if send:
+            send(item)
+    return result
+
+
+class CachedCompleter:
+    def __init__(
+        self,
+        completer: Callable,
+        ttl: float = TTL,
+        timeout: Optional[float] = TIMEOUT,
+        args: Iterable[str] = (),
+        refresh=True,
+        cache_dir: str = None,
+        name: str = None,
+    ):
+        """
+        :param completer: argcomplete completer
+        :param ttl: number of seconds while cached completions are fresh
+        :param timeout: number of seconds to wait for completer, ``None`` to wait until it finishes
+        :param args: names of parsed arguments that completions depend on, they are part of the key
+        :param refresh: return stale completions immediately and refresh them in background,
+            otherwise stale completions are returned only if completer is out of time
+        :param cache_dir: directory with cached completions, default is
+            ``$XDG_CACHE_HOME/argser/completers``
+        :param name: name of completer in the key, default is its module, qualified name and file
+        """
+        self.completer = completer
+        self.ttl = ttl
+        self.timeout = timeout
+        self.args = list(args)
+        self.refresh = refresh
+        self.cache_dir = cache_dir or default_cache_dir()
+        if name is None:
+            code = getattr(completer, '__code__', None)
+            name = ':'.join(
+                [
+                    getattr(completer, '__module__', ''),
+                    getattr(completer, '__qualname__', type(completer).__qualname__),
+                    getattr(code, 'co_filename', ''),
+                ]
+            )
+        self.name = name
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r})'
+
+    def _key(self, prefix: str, parsed_args) -> str:
+        values = [[arg, repr(_arg_value(parsed_args, arg))] for arg in self.args]
+        return json.dumps([self.name, prefix, values])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def load(self, key: str) -> Optional[dict]:
+        """Load cached entry: ``{"key": ..., "time": ..., "result": ...}``."""
+        entry = load_json(self._path(key))
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+        return entry
+
+    def save(self, key: str, result):
+        try:
+            dump_json(self._path(key), {'key': key, 'time': time.time(), 'result': result})
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"unable to cache completions of {self.name}: {e}")
+
+    def _lock(self, key: str) -> bool:
+        """Take lock of refresh, so repeated Tab presses don't start many processes."""
+        path = self._path(key) + '.lock'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError:
+            return False
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime < LOCK_TIMEOUT:
+                        return False
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                return False
+        return False
+
+    def _unlock(self, key: str):
+        try:
+            os.remove(self._path(key) + '.lock')
+        except OSError:
+            pass
+
+    def _wait(self, key: str, entry: Optional[dict]) -> Optional[dict]:
+        """
+        Wait until other process that holds the lock caches new completions.
+
+        :param entry: cached entry that was loaded before
+        :return: new entry or None if the process hasn't finished in time or has failed
+        """
+        lock = self._path(key) + '.lock'
+        deadline = time.monotonic() + (LOCK_TIMEOUT if self.timeout is None else self.timeout)
+        while os.path.exists(lock) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        new = self.load(key)
+        if new and (entry is None or new['time'] != entry['time']):
+            return new
+        return None
+
+    def _compute(self, key: str, kwargs: dict, send: Callable = None, locked=True):
+        try:
+            result = _collect(self.completer(**kwargs), send)
+            self.save(key, result)
+            return result
+        finally:
+            if locked:
+                self._unlock(key)
+
+    def __call__(self, prefix: str, parsed_args=None, **kwargs):
+        kwargs.update(prefix=prefix, parsed_args=parsed_args)
+        key = self._key(prefix, parsed_args)
+        entry = self.load(key)
+        if entry and time.time() - entry['time'] < self.ttl:
+            return entry['result']
+        if entry and self.refresh:
+            if self._lock(key):
+                self._spawn(key, kwargs)
+            return entry['result']
+        locked = self._lock(key)
+        if not locked and os.path.exists(self._path(key) + '.lock'):
+            # other process is computing the same completions
+            new = self._wait(key, entry)
+            if new is not None:
+                return new['result']
+            if self.timeout is not None:
+                logger.debug(f"completer {self.name} is out of time")
+                return entry['result'] if entry else []
+        if self.timeout is None:
+            return self._compute(key, kwargs, locked=locked)
+        done, result = self._spawn(key, kwargs, self.timeout, locked)
+        if done:
+            return result
+        logger.debug(f"completer {self.name} is out of time")
+        return entry['result'] if entry else result
+
+    def _spawn(self, key: str, kwargs: dict, timeout: float = 0, locked=True):
+        """
+        Run completer in background process or thread.
+
+        :param locked: lock of the key is taken by this call and should be released
+        :return: whether it has finished in time and completions received so far
+        """
+        if not hasattr(os, 'fork'):
+            return self._spawn_thread(key, kwargs, timeout, locked)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            # child forks again, so grandchild is adopted by init and there are no zombies
+            os.close(r)
+            if os.fork() == 0:
+                self._child(key, kwargs, w, locked)
+            os._exit(0)
+        os.close(w)
+        os.waitpid(pid, 0)
+        try:
+            return self._receive(r, timeout)
+        finally:
+            os.close(r)
+
+    def _child(self, key: str, kwargs: dict, w: int, locked: bool):  # pragma: no cover
+        """Detach from terminal and pipes of the shell, then run completer and send results."""
+        try:
+            os.setsid()
+            null = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(null, fd)
+            os.closerange(3, w)
+            os.closerange(w + 1, 65536)
+            out = os.fdopen(w, 'w', buffering=1)
+
+            def send(item):
+                try:
+                    out.write(json.dumps(item) + '\n')
+                except OSError:
+                    pass  # parent is out of time, keep filling the cache
+
+            result = self._compute(key, kwargs, send, locked)
+            if isinstance(result, dict):
+                send({'mapping': result})
+            send(_DONE)
+        finally:
+            os._exit(0)
+
+    @staticmethod
+    def _receive(fd: int, timeout: float):
+        result = []
+        deadline = time.monotonic() + timeout
+        buffer = b''
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return False, result
+            chunk = os.read(fd, 65536)
+            if not chunk:  # completer failed
+                return False, result
+            *lines, buffer = (buffer + chunk).split(b'\n')
+            for line in lines:
+                item = json.loads(line)
+                if item == _DONE:
+                    return True, result
+                if isinstance(item, dict) and 'mapping' in item:
+                    result = item['mapping']
+                else:
+                    result.append(item)
+
+    def _spawn_thread(self, key: str, kwargs: dict, timeout: float, locked: bool):
+        partial = []
+        holder = {}
+
+        def target():
+            holder['result'] = self._compute(key, kwargs, partial.append, locked)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if 'result' in holder:
+            return True, holder['result']
+        return False, list(partial)
+
+
+def cached_completer(completer: Callable = None, **kwargs):
+    """
+    Wrap completer into :class:`CachedCompleter`, can be used as decorator with or without arguments.
+
+    >>> @cached_completer(ttl=3600)
+    ... def users(prefix, **kwargs):
+    ...     return ['alice', 'bob']
+    """
+    if completer is None:
+        return lambda func: CachedCompleter(func, **kwargs)
+    return CachedCompleter(completer, **kwargs)
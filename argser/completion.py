@@ -0,0 +1,429 @@
+"""
+Completion daemon: per-user background process that answers argcomplete requests
+with parsers that were built only once.
+
+Shell snippet from ``python -m argser auto --daemon foo.py`` runs thin client
+(this file run as a script, it uses only standard library) on each Tab press.
+The client sends the script path, working directory and environment to the daemon
+over Unix domain socket, the daemon starts on the first request.
+Messages are encoded with :mod:`marshal`, both sides run the same interpreter and
+the socket is in directory that is accessible only by the user: both sides refuse to use
+the directory if it's owned by someone else or is accessible by others.
+Daemon runs the script once to capture its parser, which is cached until the script's
+modification time changes. If the daemon can't find parser, the client falls back to
+running the script directly, as plain argcomplete integration does.
+
+Stop the daemon: ``python -m argser.completion stop``.
+"""
+import _socket  # socket module takes longer to import than the whole request
+import io
+import marshal
+import os
+import stat
+import sys
+import time
+
+IDLE_TIMEOUT = 30 * 60  # seconds before idle daemon exits
+START_TIMEOUT = 5  # seconds to wait for daemon to start
+REQUEST_TIMEOUT = 10
+
+BASH_CODE = r'''
+_argser_complete() {
+    local IFS=$'\013'
+    local SUPPRESS_SPACE=0
+    if compopt +o nospace 2> /dev/null; then
+        SUPPRESS_SPACE=1
+    fi
+    COMPREPLY=($(IFS="$IFS" \
+        COMP_LINE="$COMP_LINE" \
+        COMP_POINT="$COMP_POINT" \
+        COMP_TYPE="$COMP_TYPE" \
+        _ARGCOMPLETE_COMP_WORDBREAKS="$COMP_WORDBREAKS" \
+        _ARGCOMPLETE=1 \
+        _ARGCOMPLETE_SHELL="bash" \
+        _ARGCOMPLETE_SUPPRESS_SPACE=$SUPPRESS_SPACE \
+        %(client)s complete "$1" 8>&1 9>&2 1>/dev/null 2>&1 </dev/null))
+    if [[ $? != 0 ]]; then
+        unset COMPREPLY
+    elif [[ $SUPPRESS_SPACE == 1 ]] && [[ "${COMPREPLY-}" =~ [=/:]$ ]]; then
+        compopt -o nospace
+    fi
+}
+complete %(options)s -F _argser_complete %(executables)s
+'''
+
+
+class _Captured(BaseException):
+    """Raised instead of argcomplete call to stop the script once parser is built."""
+
+
+class _Exit(Exception):
+    def __init__(self, code=0):
+        super().__init__(code)
+        self.code = code
+
+
+class _Output(io.StringIO):
+    """Output stream for both text (argcomplete 3) and bytes (argcomplete 1)."""
+
+    def write(self, s):
+        return super().write(s.decode() if isinstance(s, bytes) else s)
+
+
+def default_socket_path() -> str:
+    """Socket path of current user's daemon, ``$ARGSER_COMPLETE_SOCKET`` if it's set."""
+    if os.environ.get('ARGSER_COMPLETE_SOCKET'):
+        return os.environ['ARGSER_COMPLETE_SOCKET']
+    root = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    return os.path.join(root, f'argser-{os.getuid()}', 'complete.sock')
+
+
+def _check_dir(socket_path: str):
+    """
+    Make sure that directory of the socket is owned by current user and is inaccessible
+    by others, so other users can't spoof the daemon or read requests.
+    Raise :class:`PermissionError` otherwise.
+    """
+    directory = os.path.dirname(socket_path) or '.'
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"directory of completion socket is unsafe: {directory}")
+
+
+def shellcode(executables, complete_arguments=None, use_defaults=True) -> str:
+    """
+    Get bash code that completes executables with help of the daemon.
+
+    :param executables: list of scripts
+    :param complete_arguments: arguments for bash ``complete`` command
+    :param use_defaults: fallback to default completion of readline if there are no matches
+    """
+    from shlex import quote
+
+    if complete_arguments is None:
+        complete_arguments = ['-o', 'nospace', '-o', 'bashdefault']
+        if use_defaults:
+            complete_arguments[2:2] = ['-o', 'default']
+    client = [sys.executable, '-S', os.path.abspath(__file__)]
+    return BASH_CODE % dict(
+        client=' '.join(map(quote, client)),
+        options=' '.join(complete_arguments),
+        executables=' '.join(map(quote, executables)),
+    )
+
+
+# daemon
+
+
+def _capture_parser(path: str):
+    """
+    Run the script until it's about to set up argcomplete and capture the parser.
+    Works with argser scripts even if argcomplete isn't installed.
+
+    :return: parser and argcomplete parameters or None if script didn't build parser
+    """
+    import runpy
+
+    from argser import parser as parser_module
+
+    captured = []
+
+    def capture(parser, **kwargs):
+        captured.append((parser, kwargs))
+        raise _Captured
+
+    try:
+        import argcomplete
+    except ImportError:
+        argcomplete = None
+    patched = [(parser_module, '_setup_argcomplete'), (argcomplete, 'autocomplete')]
+    patched = [(obj, name, getattr(obj, name)) for obj, name in patched if obj is not None]
+    for obj, name, _ in patched:
+        setattr(obj, name, capture)
+    argv, sys_path = sys.argv, sys.path[:]
+    sys.argv = [path]
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except (_Captured, SystemExit, Exception):
+        pass
+    finally:
+        for obj, name, value in patched:
+            setattr(obj, name, value)
+        sys.argv, sys.path[:] = argv, sys_path
+    return captured[0] if captured else None
+
+
+def _load_parser(path: str):
+    """
+    Capture parser of the script and make argcomplete finder for it.
+
+    :return: completion finder, parser and argcomplete parameters
+        or None if script didn't build parser
+    """
+    from argcomplete import CompletionFinder
+
+    captured = _capture_parser(path)
+    if captured is None:
+        return None
+    # argcomplete patches parser's actions with references to the finder, so it's reused
+    finder = CompletionFinder()
+    # argcomplete 3 opens fd 9 for debug output, which can be one of daemon's sockets
+    finder._init_debug_stream = lambda: None
+    return (finder,) + captured
+
+
+def _get_parser(cache: dict, path: str):
+    mtime = os.stat(path).st_mtime_ns
+    if path not in cache or cache[path][0] != mtime:
+        cache[path] = (mtime, _load_parser(path))
+    return cache[path][1]
+
+
+def _run_completion(finder, parser, kwargs) -> str:
+    def exit_method(code=0):
+        raise _Exit(code)
+
+    output = _Output()
+    try:
+        finder(parser, **dict(kwargs, exit_method=exit_method, output_stream=output))
+    except _Exit as e:
+        if e.code:
+            raise
+    return output.getvalue()
+
+
+def complete_request(cache: dict, request: dict) -> dict:
+    """
+    Get completions for the request of the client.
+
+    :param cache: mapping of script path to its modification time and parser
+    :param request: ``{"script": "...", "cwd": "...", "env": {...}}``, environment
+        should have variables that are set by argcomplete's shell code
+    :return: ``{"ok": true, "output": "..."}`` or ``{"ok": false, "error": "..."}``
+    """
+    from argser.server import _environment
+
+    try:
+        captured = _get_parser(cache, request['script'])
+        if captured is None:
+            return {'ok': False, 'error': "script didn't build parser"}
+        with _environment(request.get('cwd'), request.get('env')):
+            return {'ok': True, 'output': _run_completion(*captured)}
+    except Exception as e:
+        return {'ok': False, 'error': f'{e.__class__.__name__}: {e}'}
+
+
+def _reserve_fds():
+    """
+    Keep fds 8 and 9 (argcomplete's output and debug streams) open, so that
+    argcomplete 1 doesn't write into or close one of daemon's sockets.
+    """
+    for fd in (8, 9):
+        try:
+            os.fstat(fd)
+        except OSError:
+            null = os.open(os.devnull, os.O_RDWR)
+            if null != fd:
+                os.dup2(null, fd)
+                os.close(null)
+
+
+def _bind(socket_path: str):
+    """Bind daemon socket, return None if other daemon is already listening on it."""
+    import socket
+
+    os.makedirs(os.path.dirname(socket_path), mode=0o700, exist_ok=True)
+    _check_dir(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.close()
+        return None
+    except OSError:
+        sock.close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # stale socket of previous daemon
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.listen(16)
+    return sock
+
+
+def _recv_all(sock) -> bytes:
+    chunks = []
+    chunk = sock.recv(65536)
+    while chunk:
+        chunks.append(chunk)
+        chunk = sock.recv(65536)
+    return b''.join(chunks)
+
+
+def _handle(conn, cache: dict) -> bool:
+    conn.settimeout(REQUEST_TIMEOUT)
+    request = marshal.loads(_recv_all(conn))
+    if request.get('stop'):
+        response = {'ok': True}
+    else:
+        response = complete_request(cache, request)
+        _reserve_fds()
+    conn.sendall(marshal.dumps(response))
+    return not request.get('stop')
+
+
+def serve(socket_path: str = None, idle_timeout=IDLE_TIMEOUT):
+    """
+    Run completion daemon until it's stopped or idle for too long.
+
+    :param socket_path: path of Unix domain socket, see :func:`default_socket_path`
+    :param idle_timeout: seconds without requests before exit
+    """
+    import socket
+
+    _reserve_fds()
+    socket_path = socket_path or default_socket_path()
+    sock = _bind(socket_path)
+    if sock is None:
+        return
+    sock.settimeout(idle_timeout)
+    cache = {}
+    try:
+        running = True
+        while running:
+            try:
+                conn, _ = sock.accept()
+            except socket.timeout:
+                break
+            with conn:
+                try:
+                    running = _handle(conn, cache)
+                except (OSError, ValueError, EOFError, TypeError):
+                    pass
+    finally:
+        sock.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# client
+
+
+def _request(socket_path: str, request: dict) -> dict:
+    _check_dir(socket_path)
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.settimeout(REQUEST_TIMEOUT)
+        sock.connect(socket_path)
+        sock.sendall(marshal.dumps(request))
+        sock.shutdown(_socket.SHUT_WR)
+        return marshal.loads(_recv_all(sock))
+    finally:
+        sock.close()
+
+
+def _start_daemon(socket_path: str):
+    import subprocess
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    python_path = [root] + os.environ.get('PYTHONPATH', '').split(os.pathsep)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, python_path)))
+    for key in [k for k in env if k.startswith(('_ARGCOMPLETE', 'COMP_'))]:
+        del env[key]
+    subprocess.Popen(
+        [sys.executable, '-m', 'argser.completion', 'serve', socket_path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd='/',
+        env=env,
+        start_new_session=True,
+    )
+
+
+def _request_or_start(socket_path: str, request: dict) -> dict:
+    try:
+        return _request(socket_path, request)
+    except PermissionError:
+        raise  # daemon wouldn't start either
+    except OSError:
+        _start_daemon(socket_path)
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        time.sleep(0.01)
+        try:
+            return _request(socket_path, request)
+        except PermissionError:
+            raise
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+
+
+def _resolve(script: str) -> str:
+    if os.sep in script:
+        return os.path.abspath(script)
+    from shutil import which
+
+    return which(script) or os.path.abspath(script)
+
+
+def _write_output(output: str):
+    filename = os.environ.get('_ARGCOMPLETE_STDOUT_FILENAME')
+    if filename:
+        with open(filename, 'w') as f:
+            f.write(output)
+    else:
+        os.write(8, output.encode())
+
+
+def complete(script: str, socket_path: str = None) -> int:
+    """
+    Get completions of the script from the daemon, start daemon if it isn't running.
+    Should be called from argcomplete's shell code, environment variables
+    describe the line that is completed.
+
+    :param script: path or name of the script, as it was typed
+    :param socket_path: path of daemon's socket, see :func:`default_socket_path`
+    :return: exit code
+    """
+    path = _resolve(script)
+    request = {'script': path, 'cwd': os.getcwd(), 'env': dict(os.environ)}
+    try:
+        response = _request_or_start(socket_path or default_socket_path(), request)
+    except (OSError, ValueError, EOFError):
+        response = {'ok': False}
+    if response.get('ok'):
+        _write_output(response['output'])
+        return 0
+    try:  # let the script complete itself
+        os.execv(path, [script])
+    except OSError:
+        return 1
+
+
+def stop(socket_path: str = None) -> bool:
+    """Stop the daemon. Return False if it isn't running."""
+    try:
+        return _request(socket_path or default_socket_path(), {'stop': True})['ok']
+    except (OSError, EOFError):
+        return False
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        serve(*argv[1:2])
+    elif argv[:1] == ['stop']:
+        return int(not stop(*argv[1:2]))
+    elif argv[:1] == ['complete'] and len(argv) == 2:
+        return complete(argv[1])
+    else:
+        sys.stderr.write(
+            "usage: completion.py complete SCRIPT | serve [SOCKET] | stop [SOCKET]\n"
+            "SCRIPT is completed as described by argcomplete's environment variables\n"
+        )
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,3 +7,5 @@ ArgsObj = Union[Args, Type[Args]]
 TRUE_VALUES = {'1', 'true', 't', 'okay', 'ok', 'affirmative', 'yes', 'y', 'totally'}
 FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', 'nope', 'nah'}
 SUB_COMMAND_MARK = '__sub_command'
+RESULT_MARK = '__result_fields'
+SPEC_MARK = '__spec'
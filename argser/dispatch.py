@@ -0,0 +1,151 @@
+"""
+Multiple tools behind single entry point, tool is chosen by the name of executable
+(``argv[0]``) or by the first argument.
+"""
+import os
+import shlex
+import sys
+from argparse import REMAINDER, ArgumentParser
+from types import FunctionType
+
+from argser.exceptions import ArgserException
+from argser.parse_func import SubCommands, _get_parser_params, call, compile_func, import_target
+from argser.parser import make_parser, parse_args
+
+EXECUTABLE_SUFFIXES = ('-script.py', '.py', '.exe')
+
+
+def _tool_name(executable: str):
+    name = os.path.basename(executable)
+    for suffix in EXECUTABLE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+class MultiTool:
+    """
+    Dispatch command line to one of the registered tools. Only the chosen tool
+    is imported and only its parser is built.
+
+    Tool can be arguments class, function (see :func:`argser.call`), :class:`SubCommands`
+    or import path of any of them (``'package.module:object'``).
+
+    Point entry points of all tools to :meth:`main` (e.g. ``foo = "pkg.cli:tools.main"``)
+    or call it as ``python -m pkg.cli foo ...``.
+
+    >>> tools = MultiTool()
+    >>> @tools.add
+    ... def foo(a: int = 1):
+    ...     return a + 1
+    >>> tools.run('foo -a 2')
+    3
+    >>> tools.run('-a 2', prog='/usr/bin/foo')
+    3
+    """
+
+    def __init__(self, prog=None):
+        self.prog = prog
+        # name -> (tool or import path, handler, parser params)
+        self.tools = {}
+        # name -> (tool, compiled parser or None)
+        self._compiled = {}
+
+    def add(self, tool=None, name=None, handler=None, **kwargs):
+        """
+        Register tool. Use as ``@tools.add`` or ``tools.add(tool, name, ...)``.
+
+        :param tool: arguments class, function, :class:`SubCommands` or import path
+        :param name: name of the tool. Default is name of function or class.
+        :param handler: function to call with parsed arguments class,
+            by default populated arguments are returned
+        :param kwargs: parameters for :func:`argser.parse_args`
+        """
+        if tool is None:
+
+            def dec(t):
+                return self.add(t, name, handler, **kwargs)
+
+            return dec
+        if name is None:
+            if isinstance(tool, str):
+                name = tool.rpartition(':')[2].rpartition('.')[2]
+            elif isinstance(tool, SubCommands):
+                raise ArgserException("Name of SubCommands tool is required.")
+            else:
+                name = tool.__name__
+        self.tools[name] = tool, handler, kwargs
+        self._compiled.pop(name, None)
+        return tool
+
+    def compile(self, name: str):
+        """
+        Import the tool and build its parser. Result is cached.
+
+        :return: ``(tool, (parser, spec))``, parser is ``None`` for :class:`SubCommands`
+        """
+        if name in self._compiled:
+            return self._compiled[name]
+        tool, _, kwargs = self.tools[name]
+        if isinstance(tool, str):
+            tool = import_target(tool)
+        kwargs = {'parser_prog': name, **kwargs}
+        if isinstance(tool, SubCommands):
+            tool.compile(**kwargs)
+            compiled = None
+        elif isinstance(tool, FunctionType):
+            compiled = compile_func(tool, **kwargs)[1]
+        else:
+            kwargs = _get_parser_params(kwargs)
+            compiled = make_parser(tool() if isinstance(tool, type) else tool, **kwargs)
+        self._compiled[name] = tool, compiled
+        return tool, compiled
+
+    def warm(self):
+        """Build parsers of all tools, e.g. before forking workers."""
+        for name in self.tools:
+            self.compile(name)
+
+    def _choose(self, args, prog):
+        if args is None:
+            args = sys.argv[1:]
+        elif isinstance(args, str):
+            args = shlex.split(args)
+        prog = prog or (sys.argv[0] if sys.argv else '')
+        name = _tool_name(prog)
+        if name in self.tools:
+            return name, args
+        if args and args[0] in self.tools:
+            return args[0], args[1:]
+        parser = ArgumentParser(prog=self.prog or name)
+        parser.add_argument('tool', choices=list(self.tools))
+        parser.add_argument('args', nargs=REMAINDER)
+        parser.parse_args(args)
+        raise ArgserException("Unknown tool.")  # unreachable, parser exits on error
+
+    def run(self, args=None, prog=None):
+        """
+        Choose tool and run it with the rest of arguments.
+
+        :param args: string or list of arguments, default is ``sys.argv[1:]``
+        :param prog: name of executable, default is ``sys.argv[0]``
+        :return: result of the tool
+        """
+        name, args = self._choose(args, prog)
+        tool, compiled = self.compile(name)
+        _, handler, kwargs = self.tools[name]
+        kwargs = {'parser_prog': name, **kwargs}
+        if isinstance(tool, SubCommands):
+            return tool.parse(args, **kwargs)
+        if isinstance(tool, FunctionType):
+            return call(tool, args, **kwargs)
+        result = parse_args(tool, args, compiled=compiled, **kwargs)
+        return handler(result) if handler else result
+
+    def main(self):
+        """Entry point for scripts. Prints result of the tool unless it is exit code."""
+        result = self.run()
+        if isinstance(result, int) and not isinstance(result, bool):
+            return result
+        if result is not None:
+            print(result)
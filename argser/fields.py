@@ -5,11 +5,14 @@ from argparse import ArgumentParser, SUPPRESS
 from functools import partial
 from typing import Tuple, Optional, List
 
+from argser.choices import Choices
 from argser.exceptions import ArgserException
 from argser.logging import VERBOSE
 from argser.utils import str2bool, is_list_like_type
 
 RE_OPT_PREFIX = re.compile(r'^([^\w]*)\w.*$')
+# argparse doesn't take negative numbers for options
+RE_NEGATIVE_NUMBER = re.compile(r'^-\d+$|^-\d*\.\d+$')
 logger = logging.getLogger(__name__)
 
 
@@ -243,6 +246,13 @@ class Opt:
         )
         params.update(**kwargs)
         params.update(**self.extra)
+        choices = params.get('choices')
+        if isinstance(choices, Choices):
+            # membership is checked by type, so argparse never iterates over all choices
+            del params['choices']
+            params['type'] = choices.type(params.get('type'), self.default)
+            if params.get('help') != SUPPRESS:
+                params['help'] = choices.format_help(params.get('help'))
         logger.log(VERBOSE, params)
         for key in exclude:
             params.pop(key)
@@ -277,6 +287,88 @@ class Opt:
         action = parser.add_argument(*self.options, **params)
         return action
 
+    def _format_value(self, value) -> str:
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return str(value)
+
+    def _option_value(self, value) -> List[str]:
+        value = self._format_value(value)
+        if value[:1] in self.prefix:
+            return [f'{self.options[0]}={value}']
+        return [self.options[0], value]
+
+    def _format_item(self, value) -> str:
+        """Format value that should be separate argument, it can't look like an option."""
+        value = self._format_value(value)
+        if value[:1] and value[:1] in self.prefix and not RE_NEGATIVE_NUMBER.match(value):
+            raise self._unrepresentable(value)
+        return value
+
+    def _unrepresentable(self, value):
+        return ArgserException(f"{value!r} can't be represented as value of {self.options}.")
+
+    def _counted(self, value, default):
+        """Number of repeated flags for count and append_const actions."""
+        count = value - (default or 0) if isinstance(value, int) else len(value) - len(default or [])
+        if count < 0:
+            raise self._unrepresentable(value)
+        return count
+
+    def _const_to_argv(self, value) -> List[str]:
+        action = self.action
+        const = {'store_true': True, 'store_false': False}.get(action, self.extra.get('const'))
+        default = self.default
+        if default is None and action != 'store_const':
+            default = not const  # default of argparse action
+        if value == default:
+            return []
+        if value == const:
+            return [self.options[0]]
+        raise self._unrepresentable(value)
+
+    def _append_to_argv(self, value) -> List[str]:
+        default = list(self.default or [])
+        start = len(default)
+        if list(value[:start]) != default:
+            raise self._unrepresentable(value)
+        res = []
+        for item in value[start:]:
+            res.extend(self._option_value(item))
+        return res
+
+    def to_argv(self, value) -> List[str]:
+        """
+        Make command line arguments that will be parsed into :attr:`value`.
+        Values are converted with ``str``, so factory should be able to read them back.
+        Items of lists and values of positional arguments can't start with prefix of options
+        (except negative numbers), as argparse would take them for options.
+
+        >>> Opt('a', type=int).to_argv(1)
+        ['-a', '1']
+        >>> Opt('verbose', action='count').to_argv(2)
+        ['--verbose', '--verbose']
+        """
+        action = self.action
+        option = self.options[0]
+        if action in ('help', 'version'):
+            return []
+        if action in ('count', 'append_const'):
+            return [option] * self._counted(value, self.default)
+        if action in ('store_const', 'store_true', 'store_false'):
+            return self._const_to_argv(value)
+        if value is None:
+            if self.default is None:
+                return []
+            raise self._unrepresentable(value)
+        if action == 'append':
+            return self._append_to_argv(value)
+        if self.factory is bool and self.bool_flag and self.nargs not in ('*', '+'):
+            return [option] if value else [self.no_options[0]]
+        if isinstance(value, (list, tuple)) and self.nargs not in (None, '?'):
+            return [option, *map(self._format_item, value)]
+        return self._option_value(value)
+
     def inject(self, parser: ArgumentParser):
         logger.log(VERBOSE, f"adding {self.dest} to the parser")
         if self.factory is bool:
@@ -285,6 +377,8 @@ class Opt:
             action = self._inject(parser)
         if callable(self.completer):
             action.completer = self.completer
+        elif isinstance(self.extra.get('choices'), Choices):
+            action.completer = self.extra['choices'].complete
         logger.log(VERBOSE, action)
         setattr(action, '__meta', self)  # will be useful in help formatter
         return action
@@ -302,3 +396,10 @@ class Arg(Opt):
 
     def make_options(self, *options: str, prefix=None, repl=None):
         return []
+
+    def to_argv(self, value) -> List[str]:
+        if isinstance(value, (list, tuple)) and self.nargs not in (None, '?'):
+            return list(map(self._format_item, value))
+        if value is None:
+            return []
+        return [self._format_item(value)]
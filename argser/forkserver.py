@@ -0,0 +1,180 @@
+"""
+Fork-server: parent process imports heavy modules and builds parser once,
+each invocation is run in forked child that inherits warm state.
+Client passes its stdin, stdout and stderr to the child, so command behaves
+as if it was started directly.
+
+Start server: ``python -m argser.forkserver serve pkg.cli:subs /tmp/cli.sock --preload numpy``.
+Run command: ``python -m argser.forkserver /tmp/cli.sock sub-command --arg 1``.
+
+Client uses only standard library, to skip import of argser run this file as a script:
+``python path/to/argser/forkserver.py /tmp/cli.sock sub-command --arg 1``.
+"""
+import array
+import json
+import os
+import signal
+import socket
+import sys
+
+FDS_COUNT = 3  # stdin, stdout, stderr
+MAX_REQUEST_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 5  # seconds, requests are read one by one so a silent client mustn't block others
+
+
+def _send_fds(sock: socket.socket, data: bytes, fds):
+    fds = array.array('i', fds)
+    sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds.tobytes())])
+
+
+def _recv_request(conn: socket.socket):
+    """Receive JSON request line and file descriptors sent with it."""
+    fds = array.array('i')
+    msg, ancdata, _, _ = conn.recvmsg(4096, socket.CMSG_SPACE(FDS_COUNT * fds.itemsize))
+    for level, type_, data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+    chunks = [msg]
+    while msg and not msg.endswith(b'\n') and sum(map(len, chunks)) < MAX_REQUEST_SIZE:
+        msg = conn.recv(4096)
+        chunks.append(msg)
+    return json.loads(b''.join(chunks)), list(fds)
+
+
+def _run_child(run, conn: socket.socket, request: dict, fds):
+    """Attach client's stdio, run command and report exit code. Never returns."""
+    code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target_fd, fd in enumerate(fds[:FDS_COUNT]):
+            os.dup2(fd, target_fd)
+        if request.get('cwd'):
+            os.chdir(request['cwd'])
+        if request.get('env') is not None:
+            os.environ.clear()
+            os.environ.update(request['env'])
+        try:
+            result = run(list(request.get('argv') or []))
+            if result is not None:
+                print(result)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            import traceback
+
+            traceback.print_exc()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        conn.sendall(b'%d\n' % code)
+    finally:
+        os._exit(code)
+
+
+def serve(target, socket_path: str, preload=(), **parser_kwargs):
+    """
+    Import modules, build parser of the target and fork child for each request.
+
+    :param target: :class:`argser.SubCommands`, function, arguments class
+        or import path of any of them
+    :param socket_path: path of Unix domain socket
+    :param preload: names of modules to import before serving
+    :param parser_kwargs: parameters for :func:`argser.parse_args`
+    """
+    import importlib
+
+    from argser.interactive import _make_runner
+    from argser.parse_func import import_target
+    from argser.utils import bind_unix_socket
+
+    for module in preload:
+        importlib.import_module(module)
+    if isinstance(target, str):
+        target = import_target(target)
+    _, run = _make_runner(target, None, parser_kwargs)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        bind_unix_socket(server, socket_path)
+    except BaseException:
+        server.close()
+        raise
+    server.listen(64)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # children are reaped automatically
+    try:
+        while True:
+            _accept(server, run)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _accept(server: socket.socket, run):
+    conn, _ = server.accept()
+    with conn:
+        conn.settimeout(REQUEST_TIMEOUT)
+        try:
+            request, fds = _recv_request(conn)
+        except (OSError, ValueError):
+            return
+        conn.settimeout(None)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            server.close()
+            _run_child(run, conn, request, fds)
+        for fd in fds:
+            os.close(fd)
+
+
+def run(socket_path: str, argv, fds=(0, 1, 2), cwd=None, env=None) -> int:
+    """
+    Run command line in the fork-server.
+
+    :param socket_path: path of server's Unix domain socket
+    :param argv: list of arguments
+    :param fds: file descriptors of stdin, stdout and stderr for the command
+    :param cwd: working directory for the command, default is current
+    :param env: environment variables for the command, default is current
+    :return: exit code of the command
+    """
+    request = {
+        'argv': list(argv),
+        'cwd': cwd or os.getcwd(),
+        'env': dict(os.environ if env is None else env),
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        _send_fds(sock, json.dumps(request).encode() + b'\n', fds)
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    return int(line) if line.strip() else 1
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        import argparse
+
+        parser = argparse.ArgumentParser(prog='python -m argser.forkserver serve')
+        parser.add_argument('target', help="import path of the CLI, e.g. pkg.cli:subs")
+        parser.add_argument('socket')
+        parser.add_argument('--preload', nargs='*', default=[], help="modules to import")
+        args = parser.parse_args(argv[1:])
+        serve(args.target, args.socket, preload=args.preload)
+        return 0
+    if not argv:
+        sys.stderr.write(
+            "usage: python -m argser.forkserver SOCKET [ARGS...]\n"
+            "       python -m argser.forkserver serve TARGET SOCKET [--preload MODULE ...]\n"
+        )
+        return 2
+    return run(argv[0], argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
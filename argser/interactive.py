@@ -0,0 +1,161 @@
+"""
+Interactive loop that parses each entered line with parser built only once.
+"""
+import shlex
+import sys
+import time
+import traceback
+from argparse import ArgumentParser
+from typing import List
+
+from argser.parse_func import SubCommands, _get_parser_params, bind, compile_func, run_coroutine
+from argser.parser import _get_sub_parsers_action, make_parser, parse_args
+
+EXIT_COMMANDS = ('exit', 'quit')
+
+
+def complete(parser: ArgumentParser, line: str, text: str) -> List[str]:
+    """
+    Get completions of :attr:`text` from options and sub-commands of the parser.
+
+    :param parser: root parser
+    :param line: part of the line before :attr:`text`
+    :param text: word to complete
+    :return: sorted list of completions
+
+    >>> from argser import sub_command
+    >>> class Sub:
+    ...     foo = 1
+    >>> class Args:
+    ...     bar = 1
+    ...     sub = sub_command(Sub)
+    >>> parser, _ = make_parser(Args())
+    >>> complete(parser, '', 's')
+    ['sub']
+    >>> complete(parser, 'sub ', '--f')
+    ['--foo']
+    """
+    try:
+        words = shlex.split(line)
+    except ValueError:
+        words = line.split()
+    for word in words:
+        action = _get_sub_parsers_action(parser)
+        # ambiguous prefix of sub-commands is in choices but has no parser
+        sub_parser = action and action.choices.get(word)
+        if sub_parser is not None:
+            parser = sub_parser
+    candidates = []
+    # noinspection PyProtectedMember
+    for action in parser._actions:
+        candidates.extend(action.option_strings)
+    action = _get_sub_parsers_action(parser)
+    if action is not None:
+        candidates.extend(action.choices)
+    return sorted(c for c in candidates if c.startswith(text))
+
+
+def _setup_readline(parser: ArgumentParser):
+    try:
+        import readline
+    except ImportError:  # not available on some platforms
+        return
+    matches = []
+
+    def completer(text, state):
+        if state == 0:
+            line = readline.get_line_buffer()[: readline.get_begidx()]
+            matches[:] = complete(parser, line, text)
+        return matches[state] if state < len(matches) else None
+
+    readline.set_completer(completer)
+    readline.set_completer_delims(' \t\n')
+    readline.parse_and_bind('tab: complete')
+
+
+def _make_runner(target, handler, parser_kwargs):
+    """Build parser of the target once. Return parser and function that runs parsed line."""
+    if isinstance(target, SubCommands):
+        _, (parser, _) = target.compile(**parser_kwargs)
+        return parser, lambda argv: target.parse(argv, **parser_kwargs)
+    if callable(target) and not isinstance(target, type):
+        parser_kwargs.setdefault('parser_prog', target.__name__)
+        Args, compiled = compile_func(target, **parser_kwargs)
+        if compiled is None:
+            compiled = make_parser(Args(), **_get_parser_params(parser_kwargs))
+
+        def run_func(argv):
+            args = parse_args(Args, argv, compiled=compiled, **parser_kwargs)
+            return run_coroutine(bind(target, compiled[1].nodes[0][1])(args))
+
+        return compiled[0], run_func
+    args_ins = target() if isinstance(target, type) else target
+    compiled = make_parser(args_ins, **_get_parser_params(parser_kwargs))
+
+    def run_args(argv):
+        args = parse_args(target, argv, compiled=compiled, **parser_kwargs)
+        return handler(args) if handler else args
+
+    return compiled[0], run_args
+
+
+def repl(
+    target,
+    prompt='> ',
+    handler=None,
+    timing=False,
+    input_fn=input,
+    print_fn=print,
+    **parser_kwargs,
+):
+    """
+    Read lines in a loop and run them with parser that is built only once.
+    Enter ``exit``, ``quit`` or EOF to stop.
+
+    :param target: :class:`argser.SubCommands`, function or arguments class
+    :param prompt: input prompt
+    :param handler: function to call with parsed arguments class,
+        by default parsed arguments are printed
+    :param timing: print time spent on each command
+    :param input_fn: function that reads line
+    :param print_fn: function that prints results
+    :param parser_kwargs: parameters for :func:`argser.parse_args`
+
+    >>> lines = iter(['-a 2', '-a x', 'exit'])
+    >>> def foo(a: int = 1):
+    ...     return a * 2
+    >>> repl(foo, input_fn=lambda prompt: next(lines), parser_prog='foo')
+    4
+    """
+    parser, run = _make_runner(target, handler, parser_kwargs)
+    if input_fn is input:
+        _setup_readline(parser)
+    while True:
+        try:
+            line = input_fn(prompt).strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if line in EXIT_COMMANDS:
+            break
+        if not line:
+            continue
+        start = time.perf_counter()
+        result = _run_line(run, line)
+        if result is not None:
+            print_fn(result)
+        if timing:
+            print_fn(f"[{(time.perf_counter() - start) * 1000:.2f} ms]")
+
+
+def _run_line(run, line: str):
+    try:
+        argv = shlex.split(line)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return
+    try:
+        return run(argv)
+    except SystemExit:  # argparse already reported the error or printed help
+        pass
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
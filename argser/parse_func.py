@@ -1,13 +1,47 @@
+import importlib
 import inspect
+import keyword
+import logging
+import shlex
+import sys
+import time
+from functools import partial
+from threading import Thread
 from types import FunctionType
+from weakref import WeakKeyDictionary, ref
 
+from argser.consts import RESULT_MARK
 from argser.docstring import parse_docstring
+from argser.exceptions import ArgserException
 from argser.fields import Arg, Opt
-from argser.parser import parse_args, sub_command
+from argser.logging import VERBOSE
+from argser.parser import (
+    SubCommandsAction,
+    _get_fields,
+    _get_sub_parsers_action,
+    add_sub_command,
+    make_parser,
+    parse_args,
+    sub_command,
+)
 from argser.utils import args_to_dict
 
+logger = logging.getLogger(__name__)
 
 NOTSET = object()
+# parameters of parse_args that don't affect parser generation
+PARSE_PARAMS = {
+    name
+    for name, param in inspect.signature(parse_args).parameters.items()
+    if param.kind is inspect.Parameter.KEYWORD_ONLY
+}
+# function -> ((code, defaults, doc), Args, {parser params: (parser, spec)})
+_compiled = WeakKeyDictionary()
+# function -> (code, {fields: binder(func, holder)}, {holder class: binder})
+_binders = WeakKeyDictionary()
+# weak refs of the last function and holder class, its code and binder:
+# hot loops call the same function with the same holder, so dict lookups are skipped
+_last_binder = (None, None, None, None)
 
 
 def _get_default_args(func):
@@ -52,12 +86,196 @@ def make_args_cls(func: FunctionType):
     return Args
 
 
+def _get_parser_params(parser_kwargs: dict) -> dict:
+    """Select parameters of :func:`argser.parse_args` that are used for parser generation."""
+    return {
+        k: v
+        for k, v in parser_kwargs.items()
+        if k not in PARSE_PARAMS and not k.startswith('tabulate_')
+    }
+
+
+def _get_parser_key(parser_kwargs: dict):
+    key = tuple(sorted(_get_parser_params(parser_kwargs).items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _get_holder_fields(args_cls) -> tuple:
+    if isinstance(args_cls, (tuple, list)):
+        return tuple(args_cls)
+    cls = args_cls if isinstance(args_cls, type) else args_cls.__class__
+    if hasattr(cls, RESULT_MARK):
+        return tuple(getattr(cls, RESULT_MARK))
+    return tuple(_get_fields(cls))
+
+
+def _make_binder(func, fields: tuple):
+    try:
+        params = list(inspect.signature(func).parameters.values())
+    except (TypeError, ValueError):  # signature of some builtins is unknown
+        params = []
+    positional = []
+    rest = list(fields)
+    for param in params:
+        if param.kind not in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            break
+        if param.name not in rest:
+            break
+        positional.append(param.name)
+        rest.remove(param.name)
+
+    def get(name):
+        if name.isidentifier() and not keyword.iskeyword(name):
+            return f'h.{name}'
+        return f'getattr(h, {name!r})'
+
+    args = [get(name) for name in positional]
+    args.extend(f'**{{{name!r}: {get(name)}}}' for name in rest)
+    source = f"def bound(func, h):\n    return func({', '.join(args)})\n"
+    logger.log(VERBOSE, source)
+    namespace = {}
+    exec(source, namespace)
+    return namespace['bound']
+
+
+def bind(func, args_cls):
+    """
+    Make function that calls :attr:`func` with values from holder of :attr:`args_cls`.
+    Arguments are passed positionally in order of function parameters where possible,
+    the rest are passed by keyword. Binder is cached per function and holder fields.
+
+    :param func: function to call
+    :param args_cls: arguments class, its instance, generated result class
+        or list of field names
+    :return: function that accepts populated holder and returns result of :attr:`func`
+
+    >>> class Args:
+    ...     b = 2
+    ...     a = 1
+    >>> def foo(a, b, c=3):
+    ...     return a, b, c
+    >>> bind(foo, Args)(parse_args(Args, '-a 5'))
+    (5, 2, 3)
+    """
+    return partial(_get_binder(func, args_cls), func)
+
+
+def _get_binder(func, args_cls):
+    """Same as :func:`bind`, but binder is called as ``binder(func, holder)``."""
+    global _last_binder
+    cls = args_cls if isinstance(args_cls, type) else args_cls.__class__
+    code = getattr(func, '__code__', None)
+    func_ref, cls_ref, last_code, binder = _last_binder
+    if func_ref is not None and func_ref() is func and cls_ref() is cls and last_code is code:
+        return binder
+    try:
+        entry = _binders.get(func)
+    except TypeError:  # function can't be weakly referenced
+        binder = _make_binder(func, _get_holder_fields(args_cls))
+        return lambda _, holder: binder(func, holder)
+    if entry is None or entry[0] is not code:
+        entry = code, {}, WeakKeyDictionary()
+        _binders[func] = entry
+    by_class = entry[2]
+    binder = None if cls in (tuple, list) else by_class.get(cls)
+    if binder is None:
+        fields = _get_holder_fields(args_cls)
+        binders = entry[1]
+        if fields not in binders:
+            # binder doesn't keep reference to the function to not prevent its collection
+            binders[fields] = _make_binder(func, fields)
+        binder = binders[fields]
+        if cls not in (tuple, list):
+            by_class[cls] = binder
+    if cls not in (tuple, list):
+        _last_binder = ref(func), ref(cls), code, binder
+    return binder
+
+
+def compile_func(func: FunctionType, **parser_kwargs):
+    """
+    Get arguments class and compiled parser of the function.
+    Both are cached until function's code, defaults or docstring are changed.
+
+    :param func: function to make arguments class from, see :func:`make_args_cls`
+    :param parser_kwargs: parameters for parser generation, see :func:`argser.make_parser`
+    :return: ``(Args, (parser, spec))``. Parser is ``None`` if parameters are
+        unhashable and can't be used as a cache key.
+    """
+    version = (func.__code__, func.__defaults__, func.__doc__)
+    entry = _compiled.get(func)
+    if entry is None or any(a is not b for a, b in zip(entry[0], version)):
+        entry = version, make_args_cls(func), {}
+        _compiled[func] = entry
+    _, Args, parsers = entry
+    key = _get_parser_key(parser_kwargs)
+    if key is None:
+        return Args, None
+    if key not in parsers:
+        kwargs = {k: v for k, v in key}
+        parsers[key] = make_parser(Args(), **kwargs)
+    return Args, parsers[key]
+
+
+def import_target(path: str):
+    """
+    Import object by path ``'package.module:object'`` or ``'package.module.object'``.
+
+    >>> import_target('argser.parse_func:import_target') is import_target
+    True
+    """
+    module_name, _, attrs = path.partition(':')
+    if not attrs:
+        module_name, _, attrs = path.rpartition('.')
+    if not module_name or not attrs:
+        raise ArgserException(f"Invalid import path {path!r}, expected 'module:object'.")
+    obj = importlib.import_module(module_name)
+    for attr in attrs.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def run_coroutine(result):
+    """Run coroutine in new event loop and return its result, return anything else as is."""
+    if not inspect.iscoroutine(result):
+        return result
+    import asyncio
+
+    if sys.version_info >= (3, 7):
+        return asyncio.run(result)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(result)
+    finally:
+        loop.close()
+
+
 def _call(func: FunctionType, *parser_args, **parser_kwargs):
-    Args = make_args_cls(func)
     parser_kwargs.setdefault('parser_prog', func.__name__)
-    args = parse_args(Args, *parser_args, **parser_kwargs)
-    data = args_to_dict(args)
-    return func(**data)
+    Args, compiled = compile_func(func, **parser_kwargs)
+    args = parse_args(Args, *parser_args, compiled=compiled, **parser_kwargs)
+    if compiled is None:
+        return func(**args_to_dict(args))
+    return bind(func, compiled[1].nodes[0][1])(args)
+
+
+async def call_async(func: FunctionType, *args, **kwargs):
+    """
+    Same as :func:`call` but awaits result of coroutine function in running event loop.
+
+    >>> async def foo(a: int):
+    ...     return a + 1
+    >>> run_coroutine(call_async(foo, '1'))
+    2
+    """
+    result = _call(func, *args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
 
 
 def call(func=None, *args, **kwargs):
@@ -88,19 +306,81 @@ def call(func=None, *args, **kwargs):
     ...     assert a == '1' and b == 2
     """
     if isinstance(func, FunctionType):
-        return _call(func, *args, **kwargs)
+        return run_coroutine(_call(func, *args, **kwargs))
     args = (func,) + args
 
     def dec(f):
-        return _call(f, *args, **kwargs)
+        return run_coroutine(_call(f, *args, **kwargs))
 
     return dec
 
 
+# function and names of its parameters in worker process of call_many
+_worker = None
+
+
+def _init_worker(func, fields):
+    global _worker
+    _worker = func, fields
+
+
+def _run_worker(values: tuple):
+    func, fields = _worker
+    return run_coroutine(func(**dict(zip(fields, values))))
+
+
+def _make_payloads(func, argv_iterable, parser_kwargs):
+    Args, compiled = compile_func(func, **parser_kwargs)
+    for argv in argv_iterable:
+        try:
+            args = parse_args(Args, argv, compiled=compiled, slots=True, **parser_kwargs)
+        except SystemExit as e:
+            raise ArgserException(f"Invalid arguments: {argv!r}") from e
+        yield args.to_tuple()
+
+
+def call_many(
+    func: FunctionType, argv_iterable, workers=None, chunksize=1, ordered=True, **parser_kwargs
+):
+    """
+    Call function with each of the command lines in pool of processes.
+    Command lines are parsed in current process with cached parser,
+    workers receive only tuples of parsed values.
+
+    :param func: function to call, should be importable from worker processes
+    :param argv_iterable: strings or lists of arguments
+    :param workers: number of processes, default is number of CPUs
+    :param chunksize: number of command lines sent to worker at once
+    :param ordered: yield results in order of command lines,
+        otherwise yield them as soon as they are ready
+    :param parser_kwargs: parameters for :func:`argser.parse_args`
+    :return: generator of results
+    """
+    from multiprocessing import Pool
+
+    parser_kwargs.setdefault('parser_prog', func.__name__)
+    parser_kwargs.setdefault('keep_namespace', False)
+    Args, (_, spec) = compile_func(func, **parser_kwargs)
+    fields = spec.nodes[0][1]
+    payloads = _make_payloads(func, argv_iterable, parser_kwargs)
+    with Pool(workers, initializer=_init_worker, initargs=(func, fields)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(_run_worker, payloads, chunksize)
+
+
 class SubCommands:
     """
     Allows to create sub-commands from multiple functions.
 
+    Parser is compiled on the first :meth:`parse` and reused afterwards.
+    Commands added or replaced after that are injected into the compiled parser.
+    Commands registered with :meth:`add_lazy` are imported only when selected.
+
+    :param preload: import module of selected lazy sub-command in background thread
+        while parser is compiled
+    :param timing: hook that is called with name of preloaded sub-command,
+        time spent on its import and time spent waiting for the import to finish
+
     >>> subs = SubCommands()
 
     >>> @subs.add(description="foo bar")
@@ -120,13 +400,30 @@ class SubCommands:
     ['1', 2]
     """
 
-    def __init__(self):
+    def __init__(self, preload=False, timing=None):
+        self.preload = preload
+        self.timing = timing
         self.commands = {}
         self.functions = {}
+        # (parser params, Args, parser, spec)
+        self._compiled = None
+        self._pending = []
+        # sub-command name -> function bound to its arguments holder, see bind
+        self._bindings = {}
+        # sub-command name -> (import path, sub-command params)
+        self._lazy = {}
+
+    def _register(self, name: str, sub_cmd, func):
+        if self._compiled and name not in self._pending:
+            # new and replaced sub-commands are patched into compiled parser
+            self._pending.append(name)
+        self._bindings.pop(name, None)
+        self.commands[name] = sub_cmd
+        self.functions[name] = func
 
     def _add(self, func: FunctionType, name: str, **kwargs):
-        self.commands[name] = sub_command(make_args_cls(func), **kwargs)
-        self.functions[name] = func
+        self._lazy.pop(name, None)
+        self._register(name, sub_command(make_args_cls(func), **kwargs), func)
 
     def add(self, func=None, name=None, **kwargs):
         """
@@ -146,11 +443,231 @@ class SubCommands:
 
         return dec
 
-    def parse(self, *parser_args, **parser_kwargs):
-        Args = type('Args', (), {name: sub_cmd for name, sub_cmd in self.commands.items()})
-        args = parse_args(Args, *parser_args, **parser_kwargs)
+    def add_lazy(self, name: str, path: str, **kwargs):
+        """
+        Register sub-command by import path of the function, e.g. ``'pkg.commands:train'``.
+        Module is imported and arguments are read from the function only when
+        the sub-command is selected. Until then sub-command is shown in the help
+        with provided ``help`` and ``description`` only.
+
+        :param name: name of the sub-command
+        :param path: import path, see :func:`import_target`
+        :param kwargs: parameters of sub-command parser, same as in :meth:`add`
+        """
+        placeholder = type('Args', (), {'__doc__': kwargs.get('description')})
+        self._register(name, sub_command(placeholder, **kwargs), None)
+        self._lazy[name] = path, kwargs
+
+    def add_entry_points(self, group: str, **kwargs):
+        """
+        Register sub-commands provided by installed distributions in entry points group.
+        Sub-commands are lazy, only selected one is imported.
+
+        :param group: name of entry points group
+        :param kwargs: parameters for :func:`argser.plugins.find_entry_points`
+        """
+        from argser.plugins import find_entry_points
+
+        for name, path in find_entry_points(group, **kwargs).items():
+            if name not in self.commands:
+                self.add_lazy(name, path)
+
+    def _resolve(self, name: str):
+        path, kwargs = self._lazy[name]
+        self._add(import_target(path), name, **kwargs)
+
+    def _preload(self, name: str):
+        """Import lazy sub-command in background thread."""
+        path = self._lazy[name][0]
+        result = {}
+
+        def target():
+            start = time.perf_counter()
+            try:
+                func = import_target(path)
+                result['func'] = func, make_args_cls(func)
+            except BaseException as e:
+                result['error'] = e
+            result['time'] = time.perf_counter() - start
+
+        thread = Thread(target=target, name=f'argser-preload-{name}', daemon=True)
+        thread.start()
+        return thread, result
+
+    def _join(self, name: str, thread: Thread, result: dict):
+        start = time.perf_counter()
+        thread.join()
+        waited = time.perf_counter() - start
+        if 'error' in result:
+            raise result['error']
+        func, args_cls = result['func']
+        _, kwargs = self._lazy.pop(name)
+        self._register(name, sub_command(args_cls, **kwargs), func)
+        if self.timing:
+            self.timing(name, result['time'], waited)
+
+    def _find_command(self, args):
+        """Get name of the sub-command from command line without parsing it."""
+        if args is None:
+            args = sys.argv[1:]
+        elif isinstance(args, str):
+            args = shlex.split(args)
+        for arg in args:
+            if arg in ('-h', '--help'):
+                return None
+            if not arg.startswith('-'):
+                return arg
+
+    def _match_command(self, name: str, **parser_kwargs):
+        """Get name of the sub-command by its alias or prefix."""
+        _, (parser, _) = self.compile(**parser_kwargs)
+        action = _get_sub_parsers_action(parser)
+        if isinstance(action, SubCommandsAction):
+            names = action.choices.matches(name)
+            if len(names) == 1:
+                return names[0]
+        return name
+
+    def compile(self, exclude=(), **parser_kwargs):
+        """
+        Get arguments class and compiled parser of the sub-commands.
+        Parser is rebuilt only if parameters for its generation have changed,
+        new commands are added to already compiled parser.
+
+        :param exclude: names of sub-commands to skip if parser is built from scratch
+        :param parser_kwargs: parameters for :func:`argser.parse_args`
+        :return: ``(Args, (parser, spec))``
+        """
+        key = _get_parser_key(parser_kwargs)
+        compiled = self._compiled
+        if compiled is None or key is None or compiled[0] != key or not compiled[3][1]:
+            commands = {k: v for k, v in self.commands.items() if k not in exclude}
+            Args = type('Args', (), commands)
+            parser, spec = make_parser(Args(), **_get_parser_params(parser_kwargs))
+            self._compiled = compiled = key, Args, parser, spec
+            self._pending = list(exclude)
+            self._bindings = {}
+        _, Args, parser, spec = compiled
+        pending = [name for name in self._pending if name not in exclude]
+        self._pending = [name for name in self._pending if name in exclude]
+        for name in pending:
+            setattr(Args, name, self.commands[name])
+            command = self.commands[name]
+            add_sub_command(parser, spec, name, command, replace=True, **parser_kwargs)
+        nodes = spec.nodes
+        for name, index in nodes[0][3].items():
+            if name not in self._bindings and self.functions[name]:
+                self._bindings[name] = bind(self.functions[name], nodes[index][1])
+        return Args, (parser, spec)
+
+    def _get_chosen(self, args):
+        namespace = getattr(args, '__namespace__', None)
+        if namespace is not None:
+            # destination of the root sub-parsers action
+            return vars(namespace).get('__root__')
         for name in self.commands:
-            sub_args = getattr(args, name, None)
-            if sub_args is not None:
-                data = args_to_dict(sub_args)
-                return self.functions[name](**data)
+            if getattr(args, name, None) is not None:
+                return name
+
+    def _parse(self, *parser_args, **parser_kwargs):
+        if self._lazy:
+            argv = parser_args[0] if parser_args else parser_kwargs.get('args')
+            name = self._find_command(argv)
+            if name is not None and name not in self._lazy:
+                # alias or prefix of the sub-command
+                name = self._match_command(name, **parser_kwargs)
+            if name in self._lazy and self.preload:
+                thread, result = self._preload(name)
+                # compile the rest of the parser while sub-command is imported
+                self.compile(exclude=(name,), **parser_kwargs)
+                self._join(name, thread, result)
+            elif name in self._lazy:
+                self._resolve(name)
+        Args, compiled = self.compile(**parser_kwargs)
+        args = parse_args(Args, *parser_args, compiled=compiled, **parser_kwargs)
+        name = self._get_chosen(args)
+        if name in self._lazy:
+            # sub-command wasn't found in command line before parsing
+            self._resolve(name)
+            return self._parse(*parser_args, **parser_kwargs)
+        if name is not None:
+            return self._bindings[name](getattr(args, name))
+
+    def parse(self, *parser_args, **parser_kwargs):
+        """
+        Parse arguments and call selected sub-command. Coroutine functions are run in
+        new event loop.
+
+        :param parser_args: positional arguments for :func:`argser.parse_args`
+        :param parser_kwargs: keyword arguments for :func:`argser.parse_args`
+        :return: result of sub-command function or ``None`` if no sub-command was selected
+        """
+        return run_coroutine(self._parse(*parser_args, **parser_kwargs))
+
+    async def parse_async(self, *parser_args, **parser_kwargs):
+        """Same as :meth:`parse` but awaits coroutine functions in running event loop."""
+        result = self._parse(*parser_args, **parser_kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def parse_many_async(self, lines, concurrency=10, **parser_kwargs):
+        """
+        Parse and run multiple command lines concurrently.
+
+        :param lines: strings or lists of arguments
+        :param concurrency: max number of sub-commands running at the same time
+        :param parser_kwargs: keyword arguments for :func:`argser.parse_args`
+        :return: list of results in order of lines. If sub-command failed its exception
+            is returned instead of result (including ``SystemExit`` for invalid arguments)
+        """
+        import asyncio
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(line):
+            async with semaphore:
+                try:
+                    return await self.parse_async(line, **parser_kwargs)
+                except (Exception, SystemExit) as e:
+                    return e
+
+        return await asyncio.gather(*map(run, lines))
+
+
+def _get_summary(func):
+    doc = getattr(func, '__doc__', None) or ''
+    for line in doc.strip().splitlines():
+        line = line.strip()
+        if not line or line.startswith(':'):
+            break
+        return line
+
+
+def module_cli(module, **kwargs) -> SubCommands:
+    """
+    Make sub-commands from public functions of the module.
+    Function names are collected without inspection of the functions.
+    Arguments of the function are read only when its sub-command is selected.
+
+    :param module: module or its import path
+    :param kwargs: parameters for :class:`SubCommands`
+    :return: sub-commands, use :meth:`SubCommands.parse` to run selected function
+
+    >>> cli = module_cli('textwrap')
+    >>> cli.parse('dedent "  foo"')
+    'foo'
+    """
+    if isinstance(module, str):
+        module = importlib.import_module(module)
+    namespace = vars(module)
+    names = namespace.get('__all__')
+    if names is None:
+        names = [name for name in namespace if not name.startswith('_')]
+    subs = SubCommands(**kwargs)
+    for name in names:
+        func = namespace.get(name)
+        if not isinstance(func, FunctionType) or func.__module__ != module.__name__:
+            continue
+        subs.add_lazy(name, f'{module.__name__}:{name}', help=_get_summary(func))
+    return subs
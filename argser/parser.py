@@ -1,10 +1,12 @@
+import copy
 import logging
 import re
 import shlex
-from argparse import ArgumentParser, Namespace
+import threading
+from argparse import SUPPRESS, ArgumentError, ArgumentParser, _SubParsersAction
 from functools import partial
 from types import FunctionType
-from typing import Any, List, Type, Tuple, Dict
+from typing import Any, Callable, List, Type, Tuple, Dict, Optional
 
 from argser.consts import Args, ArgsObj, SUB_COMMAND_MARK
 from argser.display import print_args, stringify
@@ -12,9 +14,176 @@ from argser.exceptions import ArgserException
 from argser.fields import Opt
 from argser.logging import VERBOSE
 from argser.formatters import ColoredHelpFormatter, HelpFormatter
+from argser.spec import REGULAR, HolderNamespace, Spec, get_spec
+from argser.trie import Trie
 
 logger = logging.getLogger(__name__)
 
+# minimal number of option strings to resolve abbreviations with prefix tree
+INDEX_THRESHOLD = 64
+
+
+class IndexedParser(ArgumentParser):
+    """
+    Parser that resolves abbreviated options with prefix tree of option strings instead
+    of scanning all of them for every token, which matters for parsers with many options.
+    """
+
+    _option_index = None  # (number of option strings, trie of them with their positions)
+
+    def _get_option_index(self) -> Trie:
+        # options can be added by parser, its groups and parents, so the trie is rebuilt lazily
+        actions = self._option_string_actions
+        if self._option_index is None or self._option_index[0] != len(actions):
+            self._option_index = len(actions), Trie((o, i) for i, o in enumerate(actions))
+        return self._option_index[1]
+
+    def _get_option_tuples(self, option_string):
+        actions = self._option_string_actions
+        if len(actions) < INDEX_THRESHOLD:
+            return super()._get_option_tuples(option_string)
+        index = self._get_option_index()
+        items = index.items(option_string.split('=', 1)[0])
+        short = option_string[:2]
+        if short in actions:
+            items.append((short, index[short]))
+        # argparse lists ambiguous matches in order of declaration, not alphabetically
+        candidates = [option for option, _ in sorted(items, key=lambda item: item[1])]
+        # let argparse match candidates, so behaviour is the same in all python versions
+        view = copy.copy(self)
+        view._option_string_actions = {o: actions[o] for o in candidates}
+        return super(IndexedParser, view)._get_option_tuples(option_string)
+
+
+class _LazyParsers(dict):
+    """
+    Sub-parsers by names and aliases. Parser is made on first access and shared by its aliases,
+    names can be abbreviated to unique prefixes.
+    """
+
+    def __init__(self, abbrev=True):
+        super().__init__()
+        self.abbrev = abbrev
+        self.names = {}  # name or alias -> name
+        self._keys = {}  # name -> name and aliases
+        self._factories = {}  # name -> function that makes parser
+        self._index = None  # (number of names, trie of names)
+        self._lock = threading.Lock()  # parser can be chosen by several threads at once
+
+    def add(self, name: str, aliases, factory: Callable[[], ArgumentParser]):
+        """Add sub-command or replace existing one, its names keep their order."""
+        keys = (name, *aliases)
+        for key in self._keys.get(name, ()):
+            if key not in keys:
+                del self.names[key]
+                super().__delitem__(key)
+        self._keys[name] = keys
+        self._factories[name] = factory
+        for key in keys:
+            self.names[key] = name
+            super().__setitem__(key, None)
+        self._index = None
+
+    def matches(self, key: str) -> List[str]:
+        """Get names of sub-commands that match the key exactly or by prefix."""
+        if key in self.names:
+            return [self.names[key]]
+        if not self.abbrev or not isinstance(key, str):
+            return []
+        if self._index is None or self._index[0] != len(self.names):
+            self._index = len(self.names), Trie(self.names.items())
+        return sorted({name for _, name in self._index[1].items(key)})
+
+    def __contains__(self, key):
+        # ambiguous prefix is valid choice, so the action can report all its matches,
+        # but it has no parser: use get() or matches() to look up parsers
+        return bool(self.matches(key))
+
+    def __getitem__(self, key):
+        names = self.matches(key)
+        if len(names) != 1:
+            raise KeyError(key)
+        name = names[0]
+        parser = super().__getitem__(name)
+        if parser is None:
+            with self._lock:
+                parser = super().__getitem__(name)
+                if parser is None:
+                    parser = self._factories.pop(name)()
+                    for k in self._keys[name]:
+                        super().__setitem__(k, parser)
+        return parser
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+class SubCommandsAction(_SubParsersAction):
+    """
+    Sub-parsers action which parsers are made only when they are chosen.
+    Sub-commands can have aliases and can be abbreviated to unique prefixes if ``abbrev`` is set.
+    """
+
+    def __init__(self, *args, abbrev=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._name_parser_map = self.choices = _LazyParsers(abbrev)
+
+    def add_parser(
+        self, name: str, lazy: Callable[[], ArgumentParser] = None, replace=False, **kwargs
+    ):
+        """
+        Add sub-command.
+
+        :param name: name of sub-command
+        :param lazy: function that makes parent parser with all arguments of sub-command,
+            sub-parser is made on first use then and None is returned
+        :param replace: replace sub-command with the same name, it keeps its place in the help
+        :param kwargs: sub-parser kwargs, including ``aliases`` and ``help``
+        """
+        kwargs.setdefault('prog', f'{self._prog_prefix} {name}')
+        aliases = kwargs.pop('aliases', ())
+        names = self._name_parser_map.names
+        for key in (name, *aliases):
+            if key in names and not (replace and names[key] == name):
+                raise ArgumentError(self, f"conflicting sub-command: {key}")
+        position = len(self._choices_actions)
+        for i, action in enumerate(self._choices_actions if replace else ()):
+            if action.dest == name:
+                position = i
+                del self._choices_actions[i]
+                break
+        if 'help' in kwargs:
+            help = kwargs.pop('help')
+            self._choices_actions.insert(position, self._ChoicesPseudoAction(name, aliases, help))
+        if lazy is None:
+            parser = self._parser_class(**kwargs)
+            self._name_parser_map.add(name, aliases, lambda: parser)
+            return parser
+
+        def make():
+            return self._parser_class(parents=[lazy()], add_help=False, **kwargs)
+
+        self._name_parser_map.add(name, aliases, make)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        names = self._name_parser_map.matches(values[0])
+        if len(names) > 1:
+            raise ArgumentError(
+                self, f"ambiguous sub-command {values[0]!r} could match {', '.join(names)}"
+            )
+        if names:  # aliases and prefixes are stored as the name of sub-command
+            values = [names[0], *values[1:]]
+        super().__call__(parser, namespace, values, option_string)
+
 
 def _collect_annotations(cls: type):
     ann = getattr(cls, '__annotations__', {}).copy()  # don't modify class annotation
@@ -164,7 +333,7 @@ def _make_parser(
     :return:
     """
     logger.log(VERBOSE, f"parser {name}:\n - {args}\n - {sub_commands}\n - {parser}")
-    parser = parser or ArgumentParser(formatter_class=formatter_class, **kwargs)
+    parser = parser or IndexedParser(formatter_class=formatter_class, **kwargs)
     if args:
         parser.prefix_chars = ''.join({a.prefix for a in args})  # get all possible prefixes
 
@@ -174,54 +343,94 @@ def _make_parser(
     if not sub_commands:
         return parser
 
-    sub_parser = parser.add_subparsers(dest=_uwrap(name))
+    sub_parser = parser.add_subparsers(
+        dest=_uwrap(name), action=SubCommandsAction, abbrev=parser.allow_abbrev
+    )
 
     for sub_name, (args_ins, args, sub_p) in sub_commands.items():
-        p = getattr(args_ins, '__parser', None)
-        parser_kwargs = getattr(args_ins, '__kwargs', {})
-        parser_kwargs.setdefault('formatter_class', formatter_class)
-        parser_kwargs.setdefault('description', args_ins.__doc__)
+        _add_sub_parser(sub_parser, name, sub_name, args_ins, args, sub_p, formatter_class)
+
+    return parser
 
-        p = _make_parser(
+
+def _add_sub_parser(
+    sub_parser: _SubParsersAction,
+    name: str,
+    sub_name: str,
+    args_ins: Args,
+    args: List[Opt],
+    sub_commands: dict,
+    formatter_class=HelpFormatter,
+    replace=False,
+):
+    parser_kwargs = dict(getattr(args_ins, '__kwargs', {}))
+    parser_kwargs.setdefault('formatter_class', formatter_class)
+    parser_kwargs.setdefault('description', args_ins.__doc__)
+
+    def factory():
+        return _make_parser(
             name=_join_names(name, sub_name),
             args=args,
-            sub_commands=sub_p,
-            parser=p,
+            sub_commands=sub_commands,
+            parser=getattr(args_ins, '__parser', None),
             formatter_class=formatter_class,
         )
-        sub_parser.add_parser(sub_name, parents=[p], add_help=False, **parser_kwargs)
 
-    return parser
+    if replace:
+        parser_kwargs['replace'] = True
+    sub_parser.add_parser(sub_name, lazy=factory, **parser_kwargs)
+
+
+def _get_sub_parsers_action(parser: ArgumentParser) -> Optional[_SubParsersAction]:
+    # noinspection PyProtectedMember
+    for action in parser._actions:
+        if isinstance(action, _SubParsersAction):
+            return action
+
 
+def _is_suppressed(option: Opt):
+    """Check if argparse will never put value of the option into namespace."""
+    return option.default is SUPPRESS or option.action in ('help', 'version')
 
-def _set_values(
-    parser_name: str, res: Args, namespace: Namespace, args: List[Opt], sub_commands: dict,
+
+def _make_nodes(
+    holder: Args, args: List[Opt], sub_commands: dict, parser_name='root', spec=None,
 ):
     """
-    Recursively extract attributes from namespace and add them to :attr:`res`.
+    Recursively collect holders and map namespace destinations to their fields.
 
-    :param parser_name: name of parser prefixed with parent parser name
-    :param res:
-    :param namespace:
+    :param holder: arguments holder
     :param args:
     :param sub_commands:
-    :return:
+    :param parser_name: name of parser prefixed with parent parser name
+    :param spec: ``(nodes, routes, commands, defaults)`` to update
+    :return: ``(nodes, routes, commands, defaults)``, see :class:`argser.spec.Spec`
     """
-    logger.log(VERBOSE, f'setting values for: {parser_name} ~ {res}')
+    nodes, routes, commands, defaults = spec or ([], {}, {}, [])
+    index = len(nodes)
+    fields = tuple(arg.name for arg in args)
+    suppressed = tuple(arg.name for arg in args if _is_suppressed(arg))
+    children = {}
+    nodes.append((holder, fields, suppressed, children))
+    defaults.append({arg.name: None if _is_suppressed(arg) else arg.default for arg in args})
     for arg in args:
-        setattr(res, arg.name, namespace.__dict__.get(arg.dest))
-
+        routes[arg.dest] = (index, arg.name)
+    if sub_commands:
+        commands[_uwrap(parser_name)] = index
     for name, (args_ins, args, sub_c) in sub_commands.items():
-        # set values only if sub-command was chosen
-        if getattr(namespace, _uwrap(parser_name)) == name:
-            sub = getattr(res, name)
-            setattr(res, name, sub)
-            sub_parser_name = _join_names(parser_name, name)
-            _set_values(sub_parser_name, sub, namespace, args, sub_c)
-        # otherwise nullify sub-command
-        else:
-            setattr(res, name, None)
-    logger.log(VERBOSE, f'setting complete: {res}')
+        children[name] = len(nodes)
+        _make_nodes(
+            args_ins,
+            args,
+            sub_c,
+            _join_names(parser_name, name),
+            (nodes, routes, commands, defaults),
+        )
+    return nodes, routes, commands, defaults
+
+
+def _make_spec(holder: Args, args: List[Opt], sub_commands: dict):
+    return Spec(args, sub_commands, *_make_nodes(holder, args, sub_commands))
 
 
 def _make_shortcut(name: str):
@@ -271,7 +480,7 @@ def sub_command(args_cls: ArgsObj, parser=None, **kwargs) -> Args:
 
     :param args_cls: data holder
     :param parser: predefined parser
-    :param kwargs: additional parser kwargs
+    :param kwargs: additional parser kwargs, ``aliases`` are other names of the sub-command
     :return: instance of :attr:`args_cls` with added metadata
 
     >>> class Sub:
@@ -321,7 +530,7 @@ def make_parser(
 
     :param args: instance of some class with static attributes to be used as
         ArgParser's options
-    :param parser: predefined parser
+    :param parser: predefined parser, by default :class:`IndexedParser` is created
     :param make_shortcuts: make short version of arguments: ``--abc -> -a``,
         ``--abc_def -> --ad``
     :param bool_flag:
@@ -338,8 +547,8 @@ def make_parser(
     :param argcomplete_kwargs: argcomplete kwargs
     :param kwargs: additional params for parser or argcomplete,
         should be prefixed with target name
-    :return: instance of ArgumentParser and tuple with options
-        (main_options, sub_command_options)
+    :return: instance of ArgumentParser and compiled :class:`argser.spec.Spec`,
+        which unpacks into tuple with options (main_options, sub_command_options)
     """
     args_ins, options, sub_commands = _read_args(
         args, override=override, bool_flag=bool_flag, prefix=prefix, repl=repl
@@ -356,31 +565,162 @@ def make_parser(
     argcomplete_kwargs = argcomplete_kwargs or {}
     _add_prefixed_key(kwargs, argcomplete_kwargs, 'argcomplete_')
     _setup_argcomplete(parser, **argcomplete_kwargs)
-    return parser, (options, sub_commands)
+    return parser, _make_spec(args_ins, options, sub_commands)
+
+
+def add_sub_command(
+    parser: ArgumentParser,
+    spec: Spec,
+    name: str,
+    args_ins: Args,
+    make_shortcuts=True,
+    bool_flag=True,
+    prefix='--',
+    repl=('_', '-'),
+    replace=False,
+    **kwargs,
+):
+    """
+    Add sub-command to the root of parser made by :func:`make_parser` without rebuilding
+    the parser and its spec. Root parser should already have some sub-commands.
+
+    :param parser: root parser
+    :param spec: compiled spec of the root parser
+    :param name: name of the new sub-command
+    :param args_ins: holder made by :func:`sub_command`
+    :param make_shortcuts: see :func:`make_parser`
+    :param bool_flag: see :func:`make_parser`
+    :param prefix: see :func:`make_parser`
+    :param repl: see :func:`make_parser`
+    :param replace: replace existing sub-command with the same name
+    :param kwargs: the rest of :func:`make_parser` parameters, ignored
+    """
+    sub_parser = _get_sub_parsers_action(parser)
+    if sub_parser is None or not spec.nodes[0][3]:
+        raise ArgserException("Parser should already have sub-commands.")
+    if name in spec.nodes[0][3] and not replace:
+        raise ArgserException(f"Sub-command {name!r} already exists.")
+    dest = _join_names('root', name)
+    sub = _read_args(args_ins, dest, bool_flag=bool_flag, prefix=prefix, repl=repl)
+    if make_shortcuts:
+        _make_shortcuts_sub_wise(sub[1], sub[2])
+    _add_sub_parser(
+        sub_parser, 'root', name, *sub, formatter_class=parser.formatter_class, replace=replace
+    )
+    spec[1][name] = sub
+    _put_nodes(spec, spec.nodes[0][3].setdefault(name, len(spec.nodes)), sub, dest)
+    spec.clear_cache()
 
 
-def populate_holder(args_ins: Args, parser: ArgumentParser, options: tuple, args=None):
+def _put_nodes(spec: Spec, index: int, sub: tuple, dest: str):
+    """
+    Put nodes of the sub-command into the spec: its own node is placed at :attr:`index`
+    (existing node is replaced), nodes of its sub-commands are appended.
+    """
+    nodes, routes, commands, defaults = _make_nodes(*sub, dest)
+    size = len(spec.nodes)
+
+    def move(i):
+        return index if i == 0 else size + i - (index != size)
+
+    for key in [key for key, (i, _) in spec.routes.items() if i == index]:
+        del spec.routes[key]
+    for i, (holder, fields, suppressed, children) in enumerate(nodes):
+        node = holder, fields, suppressed, {k: move(v) for k, v in children.items()}
+        if move(i) < len(spec.nodes):
+            spec.nodes[move(i)], spec.defaults[move(i)] = node, defaults[i]
+        else:
+            spec.nodes.append(node)
+            spec.defaults.append(defaults[i])
+    spec.routes.update({key: (move(i), field) for key, (i, field) in routes.items()})
+    spec.commands.update({key: move(i) for key, i in commands.items()})
+
+
+def populate_holder(
+    args_ins: Args, parser: ArgumentParser, options: tuple, args=None, keep_namespace=None,
+):
     """
     Parse provided string or command line and populate :attr:`args_cls`
     with parsed values.
 
     :param args_ins: arguments holder
     :param parser: generated parser
-    :param options: tuple with root arguments and sub-command arguments
+    :param options: compiled spec or tuple with root arguments and sub-command arguments
     :param args: string to parse or ``None``
+    :param keep_namespace: save parser's namespace in holder's ``__namespace__``.
+        By default namespace is saved only if holder isn't generated result
+        (see :meth:`argser.spec.Spec.make_result`)
     :return: instance of :attr:`args_cls` with populated fields.
     """
     if isinstance(args, str):
         args = shlex.split(args)
-    namespace = parser.parse_args(args)
+    if not isinstance(options, Spec):
+        options = _make_spec(args_ins, *options)
+    namespace = HolderNamespace(options, args_ins)
+    parser.parse_args(args, namespace=namespace)
+    namespace.finalize()
     logger.log(VERBOSE, namespace)
 
-    args, sub_commands = options
-    _set_values('root', args_ins, namespace, args, sub_commands)
-    setattr(args_ins, '__namespace__', namespace)
+    if keep_namespace is None:
+        keep_namespace = options.get_kind(args_ins) == REGULAR
+    if keep_namespace:
+        setattr(args_ins, '__namespace__', namespace)
     return args_ins
 
 
+def _is_default(value, default):
+    # don't mix up 1 and True
+    return value is default or value.__class__ is default.__class__ and value == default
+
+
+def _to_argv(holder: Args, args: List[Opt], sub_commands: dict, only_changed: bool):
+    optionals, positionals = [], []
+    for arg in args:
+        value = getattr(holder, arg.name)
+        if not arg.options:
+            positionals.extend(arg.to_argv(value))
+            continue
+        if only_changed and _is_default(value, arg.default) and not arg.extra.get('required'):
+            continue
+        optionals.extend(arg.to_argv(value))
+    res = optionals + positionals
+    for name, (_, args, sub_c) in sub_commands.items():
+        sub = getattr(holder, name)
+        if sub is not None:
+            res.append(name)
+            res.extend(_to_argv(sub, args, sub_c, only_changed))
+            break
+    return res
+
+
+def to_argv(holder: Args, spec: Spec = None, only_changed=True) -> List[str]:
+    """
+    Make command line arguments that will be parsed into the same values as in :attr:`holder`.
+
+    :param holder: parsed arguments holder
+    :param spec: compiled spec of the holder. Can be omitted for generated results
+        and for holders that kept parser's namespace.
+    :param only_changed: skip options with default values
+    :return: list of command line arguments
+
+    >>> class Args:
+    ...     a = 1
+    ...     b = True
+    ...     c = []
+    >>> to_argv(parse_args(Args, '-a 2 --no-b'))
+    ['-a', '2', '--no-b']
+    >>> to_argv(parse_args(Args, '-c foo bar'), only_changed=False)
+    ['-a', '1', '-b', '-c', 'foo', 'bar']
+    """
+    index = 0
+    if spec is None:
+        spec, index = get_spec(holder)
+    if index != 0:
+        raise ArgserException("Command line arguments can be made only for root holder.")
+    args, sub_commands = spec
+    return _to_argv(holder, args, sub_commands, only_changed)
+
+
 def parse_args(
     args_cls: ArgsObj,
     args=None,
@@ -390,6 +730,10 @@ def parse_args(
     shorten=False,
     fill=40,
     tabulate_kwargs=None,
+    keep_namespace=None,
+    slots=False,
+    sparse=False,
+    compiled=None,
     **kwargs,
 ) -> Args:
     """
@@ -411,6 +755,17 @@ def parse_args(
         int - just number of columns,
         'sub' / 'sub-auto' / 'sub-INT' - split by sub-commands,
         gap: string, space between tables/columns
+    :param keep_namespace: save parser's namespace in holder's ``__namespace__``.
+        By default namespace is saved only if :attr:`slots` and :attr:`sparse` are false
+    :param slots: return compact instance of class generated from the spec
+        (with ``__slots__``, see :func:`argser.spec.make_result_cls`)
+        instead of populating :attr:`args_cls`
+    :param sparse: return instance of class generated from the spec that stores
+        only explicitly provided values, the rest are read from defaults shared
+        between all results of the spec
+    :param compiled: ``(parser, spec)`` returned by :func:`make_parser` for the same
+        :attr:`args_cls`. If provided then parser will not be rebuilt and parameters for
+        parser generation are ignored
     :param kwargs: parameters for parser generation.
         Check out :func:`make_parser` for more params
     :return: instance of :attr:`args_cls` with populated attributed based of command
@@ -425,8 +780,12 @@ def parse_args(
     """
     args_ins = _get_args_instance(args_cls)
 
-    parser, options = make_parser(args_ins, **kwargs)
-    result = populate_holder(args_ins, parser, options, args)
+    parser, options = compiled or make_parser(args_ins, **kwargs)
+    if slots and sparse:
+        raise ArgserException("slots and sparse results can't be used together.")
+    if slots or sparse:
+        args_ins = options.make_result(sparse=sparse)
+    result = populate_holder(args_ins, parser, options, args, keep_namespace=keep_namespace)
 
     tabulate_kwargs = tabulate_kwargs or {}
     _add_prefixed_key(kwargs, tabulate_kwargs, 'tabulate_')
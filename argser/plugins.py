@@ -0,0 +1,131 @@
+"""
+Discovery of sub-commands provided by installed distributions via entry points.
+
+Metadata of the distributions is scanned only when it was changed since the last run,
+discovered entry points are saved into persistent index.
+"""
+import logging
+import os
+import sys
+from configparser import ConfigParser, Error as ConfigError
+from typing import Dict, Iterable, Optional
+
+from argser.logging import VERBOSE
+from argser.utils import dump_json, load_json, user_cache_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+METADATA_SUFFIXES = ('.dist-info', '.egg-info')
+
+
+def default_index_path():
+    return user_cache_path('entry_points.json')
+
+
+def _read_entry_points(dist_path: str) -> Dict[str, Dict[str, str]]:
+    """Read ``entry_points.txt`` of distribution: ``{group: {name: 'module:object'}}``."""
+    config = ConfigParser(delimiters=('=',), interpolation=None)
+    config.optionxform = str  # keep case of names
+    try:
+        config.read(os.path.join(dist_path, 'entry_points.txt'), encoding='utf-8')
+    except ConfigError as e:
+        logger.warning(f"invalid entry points in {dist_path}: {e}")
+        return {}
+    return {
+        group: {name: value.split('[')[0].strip() for name, value in config.items(group)}
+        for group in config.sections()
+    }
+
+
+def _scan_dist(dist_path: str, prev: Optional[list]) -> list:
+    """
+    Entry points of the distribution keyed on mtime of its ``entry_points.txt``,
+    which may be rewritten in place without touching the directories.
+    """
+    try:
+        mtime = os.stat(os.path.join(dist_path, 'entry_points.txt')).st_mtime_ns
+    except OSError:
+        return [None, {}]
+    if prev and prev[0] == mtime:
+        return prev
+    logger.log(VERBOSE, f"reading entry points of {dist_path}")
+    return [mtime, _read_entry_points(dist_path)]
+
+
+def _scan_dir(path: str, old: Optional[list]):
+    """
+    Collect entry points of distributions in the directory. The directory is listed only
+    if its mtime changed, but ``entry_points.txt`` of known distributions is checked every time.
+
+    :param path: directory from ``sys.path``
+    :param old: ``[mtime, {dist: [mtime of entry_points.txt, groups]}]`` from the previous scan
+    :return: updated entry of the index or ``None`` if path isn't a directory
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if old and old[0] == mtime:
+            names = list(old[1])
+        else:
+            names = [
+                entry.name
+                for entry in os.scandir(path)
+                if entry.name.endswith(METADATA_SUFFIXES) and entry.is_dir()
+            ]
+    except OSError:
+        return None
+    old_dists = old[1] if old else {}
+    dists = {name: _scan_dist(os.path.join(path, name), old_dists.get(name)) for name in names}
+    if old and old[0] == mtime and dists == old_dists:
+        return old
+    return [mtime, dists]
+
+
+def _load_index(index_path: str) -> dict:
+    index = load_json(index_path)
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        return {}
+    return index.get('paths', {})
+
+
+def _save_index(index_path: str, paths: dict):
+    try:
+        dump_json(index_path, {'version': INDEX_VERSION, 'paths': paths})
+    except OSError as e:
+        logger.warning(f"unable to save entry points index {index_path}: {e}")
+
+
+def find_entry_points(group: str, paths: Iterable[str] = None, index_path=None) -> Dict[str, str]:
+    """
+    Find entry points of the group in installed distributions.
+
+    :param group: name of entry points group
+    :param paths: directories with distributions, default is ``sys.path``
+    :param index_path: path to the persistent index, ``False`` to disable it.
+        Default is ``$XDG_CACHE_HOME/argser/entry_points.json``
+    :return: ``{name: 'module:object'}``. If name is provided by multiple distributions
+        the one found first in ``paths`` is used.
+    """
+    if paths is None:
+        paths = sys.path
+    if index_path is None:
+        index_path = default_index_path()
+    old = _load_index(index_path) if index_path else {}
+    index = {}
+    result = {}
+    for path in paths:
+        path = os.path.abspath(path or '.')
+        if path in index:
+            continue
+        entry = _scan_dir(path, old.get(path))
+        if entry is None:
+            continue
+        index[path] = entry
+        for dist in sorted(entry[1]):
+            for name, value in entry[1][dist][1].get(group, {}).items():
+                result.setdefault(name, value)
+    if index_path:
+        merged = {**old, **index}
+        if merged != old:
+            _save_index(index_path, merged)
+    return result
@@ -0,0 +1,271 @@
+"""
+Discovery of python scripts marked with ``PYTHON_ARGCOMPLETE_OK``.
+
+Directory tree is walked with :func:`os.scandir`, hidden and vendor directories,
+virtual environments and paths ignored by ``.gitignore`` files are skipped.
+Headers of scripts are read in pool of threads, results are saved into persistent index,
+so the next run reads only files which size or modification time was changed.
+"""
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from argser.utils import dump_json, load_json, user_cache_path
+
+logger = logging.getLogger(__name__)
+
+MARK = b'PYTHON_ARGCOMPLETE_OK'
+HEADER_SIZE = 1024
+INDEX_VERSION = 1
+IGNORED_DIRS = frozenset(
+    {'__pycache__', 'node_modules', 'bower_components', 'site-packages', 'venv', 'build', 'dist'}
+)
+# minimal number of headers to read them in pool of threads
+POOL_THRESHOLD = 16
+
+
+def default_index_path():
+    return user_cache_path('scripts.json')
+
+
+# .gitignore
+
+
+def _translate_class(pattern: str, i: int):
+    """Translate ``[...]`` at position ``i``, return regex and position after the class."""
+    end = pattern.find(']', i + 2)
+    if end == -1:
+        return re.escape('['), i + 1
+    start = i + 1
+    body = pattern[start:end].replace('\\', '\\\\')
+    if body[0] in '!^':
+        body = '^' + body[1:]
+    return f'[{body}]', end + 1
+
+
+def _translate(pattern: str) -> str:
+    """Translate gitignore glob into regex that matches path relative to ``.gitignore``."""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    res, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            res.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            res.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            res.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            res.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            regex, i = _translate_class(pattern, i)
+            res.append(regex)
+        else:
+            if pattern[i] == '\\' and i + 1 < len(pattern):
+                i += 1
+            res.append(re.escape(pattern[i]))
+            i += 1
+    return ('' if anchored else '(?:.*/)?') + ''.join(res) + '$'
+
+
+def _read_gitignore(path: str) -> list:
+    """
+    Read rules of ``.gitignore`` in the directory.
+
+    :return: list of ``(base directory, regex, negate, only directories)``
+    """
+    rules = []
+    try:
+        with open(os.path.join(path, '.gitignore'), encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        line = line[1:] if negate else line
+        dir_only = line.endswith('/')
+        try:
+            regex = re.compile(_translate(line.rstrip('/')))
+        except re.error:
+            logger.debug(f"invalid pattern {line!r} in {path}/.gitignore")
+            continue
+        rules.append((path, regex, negate, dir_only))
+    return rules
+
+
+def _ignored(rules: list, path: str, is_dir: bool) -> bool:
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        offset = len(base) + 1
+        rel_path = path[offset:].replace(os.sep, '/')
+        if regex.match(rel_path):
+            ignored = not negate
+    return ignored
+
+
+# walk
+
+
+def _skip_dir(name: str) -> bool:
+    return name.startswith('.') or name in IGNORED_DIRS or name.endswith('.egg-info')
+
+
+def _is_dir(entry: os.DirEntry) -> Optional[bool]:
+    """None for hidden and unreadable entries."""
+    if entry.name.startswith('.'):
+        return None
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return None
+
+
+def _scan_dir(path: str, rules: list, recursive: bool):
+    """
+    List python files and directories to walk into.
+
+    :return: list of :class:`os.DirEntry` of files, list of directories with their rules
+    """
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return [], []
+    names = {entry.name for entry in entries}
+    if 'pyvenv.cfg' in names:  # virtual environment
+        return [], []
+    if '.gitignore' in names:
+        rules = rules + _read_gitignore(path)
+    files, dirs = [], []
+    for entry in entries:
+        is_dir = _is_dir(entry)
+        if is_dir is None or _ignored(rules, entry.path, is_dir):
+            continue
+        if is_dir and recursive and not _skip_dir(entry.name):
+            dirs.append((entry.path, rules))
+        elif not is_dir and entry.name.endswith('.py'):
+            files.append(entry)
+    return files, dirs
+
+
+def walk(root: str, recursive=True) -> Dict[str, tuple]:
+    """
+    Find python files in the directory.
+
+    :param root: directory to walk
+    :param recursive: walk into sub-directories
+    :return: ``{path: (mtime in ns, size)}``
+    """
+    result = {}
+    stack = [(os.path.abspath(root), [])]
+    while stack:
+        files, dirs = _scan_dir(*stack.pop(), recursive)
+        stack.extend(reversed(dirs))
+        for entry in files:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            result[entry.path] = (st.st_mtime_ns, st.st_size)
+    return result
+
+
+# headers
+
+
+def has_mark(path: str) -> bool:
+    """Check if ``PYTHON_ARGCOMPLETE_OK`` is in the first 1024 bytes of the file."""
+    try:
+        with open(path, 'rb') as f:
+            return MARK in f.read(HEADER_SIZE)
+    except OSError:
+        return False
+
+
+def _check_chunk(paths: List[str]) -> List[bool]:
+    return [has_mark(path) for path in paths]
+
+
+def _check_headers(paths: List[str], workers: Optional[int]) -> Dict[str, bool]:
+    """Read headers of files in pool of threads, which overlaps waiting for disk."""
+    if len(paths) < POOL_THRESHOLD or workers == 1:
+        return dict(zip(paths, _check_chunk(paths)))
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    # few large chunks per thread, overhead of the pool per file is about the same as reading it
+    step = workers * 4
+    chunks = [paths[i::step] for i in range(step)]
+    result = {}
+    with ThreadPoolExecutor(workers) as pool:
+        for chunk, marks in zip(chunks, pool.map(_check_chunk, chunks)):
+            result.update(zip(chunk, marks))
+    return result
+
+
+# index
+
+
+def _load_index(index_path: str) -> dict:
+    index = load_json(index_path)
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        return {}
+    return index.get('files', {})
+
+
+def _save_index(index_path: str, files: dict):
+    try:
+        dump_json(index_path, {'version': INDEX_VERSION, 'files': files})
+    except OSError as e:
+        logger.warning(f"unable to save scripts index {index_path}: {e}")
+
+
+def _in_root(path: str, root: str, recursive: bool) -> bool:
+    if recursive:
+        return path.startswith(root + os.sep)
+    return os.path.dirname(path) == root
+
+
+def find_scripts(root='.', mark=True, recursive=True, index_path=None, workers=None) -> List[str]:
+    """
+    Find python scripts in the directory.
+
+    :param root: directory to search in
+    :param mark: find only scripts with ``PYTHON_ARGCOMPLETE_OK`` mark
+    :param recursive: search in sub-directories
+    :param index_path: path to the persistent index of checked files, ``False`` to disable it.
+        Default is ``$XDG_CACHE_HOME/argser/scripts.json``
+    :param workers: number of threads that read headers of files
+    :return: sorted list of absolute paths
+    """
+    root = os.path.abspath(root)
+    files = walk(root, recursive)
+    if not mark:
+        return sorted(files)
+    if index_path is None:
+        index_path = default_index_path()
+    old = _load_index(index_path) if index_path else {}
+    index, changed = {}, []
+    for path, (mtime, size) in files.items():
+        prev = old.get(path)
+        if prev and prev[:2] == [mtime, size]:
+            index[path] = prev
+        else:
+            changed.append(path)
+    for path, marked in _check_headers(changed, workers).items():
+        index[path] = [*files[path], marked]
+    if index_path:
+        merged = {p: v for p, v in old.items() if not _in_root(p, root, recursive)}
+        merged.update(index)
+        if merged != old:
+            _save_index(index_path, merged)
+    return sorted(path for path, (_, _, marked) in index.items() if marked)
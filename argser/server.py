@@ -0,0 +1,241 @@
+"""
+Long-lived command server that keeps imports and parsers warm.
+
+Requests and responses are newline-delimited JSON objects sent over Unix domain socket.
+Request: ``{"argv": [...], "cwd": "...", "env": {...}}``, ``cwd`` and ``env`` are optional.
+Response: ``{"ok": bool, "exit_code": int, "result": ..., "stdout": "...", "stderr": "...",
+"error": {"type": "...", "message": "..."}}``.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import contextmanager
+
+from argser.consts import RESULT_MARK, Args
+from argser.interactive import _make_runner
+from argser.utils import args_to_dict, bind_unix_socket
+
+logger = logging.getLogger(__name__)
+
+# function that runs parsed command line, set before worker processes are forked
+_runner = None
+
+
+class _ThreadLocalStream:
+    """Stream that writes into buffer of the current thread if there is one."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def __getattr__(self, item):
+        return getattr(getattr(self.local, 'buffer', None) or self.stream, item)
+
+    def write(self, s):
+        return (getattr(self.local, 'buffer', None) or self.stream).write(s)
+
+
+def _install_streams():
+    if not isinstance(sys.stdout, _ThreadLocalStream):
+        sys.stdout = _ThreadLocalStream(sys.stdout)
+    if not isinstance(sys.stderr, _ThreadLocalStream):
+        sys.stderr = _ThreadLocalStream(sys.stderr)
+
+
+@contextmanager
+def _capture_output():
+    out, err = io.StringIO(), io.StringIO()
+    sys.stdout.local.buffer, sys.stderr.local.buffer = out, err
+    try:
+        yield out, err
+    finally:
+        sys.stdout.local.buffer = sys.stderr.local.buffer = None
+
+
+@contextmanager
+def _environment(cwd=None, env=None):
+    old_cwd, old_env = os.getcwd(), dict(os.environ)
+    try:
+        if cwd:
+            os.chdir(cwd)
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(env)
+        yield
+    finally:
+        if cwd:
+            os.chdir(old_cwd)
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(old_env)
+
+
+def _to_json(result):
+    # parsed arguments holder
+    if hasattr(result, '__namespace__') or hasattr(result.__class__, RESULT_MARK):
+        return args_to_dict(result)
+    return result
+
+
+def _error(e: BaseException) -> dict:
+    return {'type': e.__class__.__name__, 'message': str(e), 'traceback': traceback.format_exc()}
+
+
+def execute(run, request: dict) -> dict:
+    """
+    Run command line from the request and collect its output.
+
+    :param run: function that parses and runs list of arguments
+    :param request: ``{"argv": [...], "cwd": "...", "env": {...}}``
+    :return: response
+    """
+    response = {'ok': False, 'exit_code': 1, 'result': None}
+    with _capture_output() as (out, err):
+        try:
+            with _environment(request.get('cwd'), request.get('env')):
+                response['result'] = _to_json(run(list(request.get('argv') or [])))
+            response['ok'], response['exit_code'] = True, 0
+        except SystemExit as e:  # invalid arguments or help
+            code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            response['ok'], response['exit_code'] = code == 0, code
+        except Exception as e:
+            response['error'] = _error(e)
+    response['stdout'], response['stderr'] = out.getvalue(), err.getvalue()
+    return response
+
+
+def _execute_in_worker(request: dict) -> dict:
+    _install_streams()
+    return execute(_runner, request)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: 'CommandServer'
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.handle_line(line)
+            data = json.dumps(response, default=repr).encode()
+            self.wfile.write(data + b'\n')
+            self.wfile.flush()
+
+
+class CommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server that runs command lines with parser built only once.
+    Use :func:`make_server` to create it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, run, workers=4, processes=False):
+        self.socket_path = socket_path
+        self.pool = None
+        self._bound = False
+        super().__init__(socket_path, _Handler)
+        self.run = run
+        self.workers = workers
+        self.processes = processes
+        if processes:
+            global _runner
+            import multiprocessing
+
+            _runner = run
+            self.pool = multiprocessing.get_context('fork').Pool(workers)
+        else:
+            from multiprocessing.pool import ThreadPool
+
+            _install_streams()
+            self.pool = ThreadPool(workers)
+
+    def handle_line(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request should be JSON object")
+        except ValueError as e:
+            return {'ok': False, 'exit_code': 2, 'error': _error(e)}
+        uses_env = request.get('cwd') or request.get('env') is not None
+        if uses_env and not self.processes and self.workers > 1:
+            e = ValueError("cwd and env are supported only with processes or single worker")
+            return {'ok': False, 'exit_code': 2, 'error': _error(e)}
+        if self.processes:
+            return self.pool.apply(_execute_in_worker, (request,))
+        return self.pool.apply(execute, (self.run, request))
+
+    def server_bind(self):
+        bind_unix_socket(self.socket, self.server_address)
+        self._bound = True
+        self.server_address = self.socket.getsockname()
+
+    def server_close(self):
+        super().server_close()
+        if self.pool is not None:
+            self.pool.terminate()
+        if self._bound and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def make_server(
+    target, socket_path: str, workers=4, processes=False, handler=None, **parser_kwargs
+) -> CommandServer:
+    """
+    Build parser of the target and create server for it.
+
+    :param target: :class:`argser.SubCommands`, function or arguments class
+    :param socket_path: path of Unix domain socket
+    :param workers: number of threads or processes that run commands
+    :param processes: run commands in pool of forked processes instead of threads.
+        Each process runs one command at a time, so ``cwd`` and ``env`` of request
+        are supported with any number of workers.
+    :param handler: function to call with parsed arguments class,
+        by default parsed arguments are returned as dictionary
+    :param parser_kwargs: parameters for :func:`argser.parse_args`
+    """
+    _, run = _make_runner(target, handler, parser_kwargs)
+    return CommandServer(socket_path, run, workers=workers, processes=processes)
+
+
+def serve(target: Args, socket_path: str, **kwargs):
+    """
+    Serve command lines of the target over Unix domain socket until interrupted.
+    Parameters are the same as in :func:`make_server`.
+    """
+    server = make_server(target, socket_path, **kwargs)
+    logger.info(f"serving on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def request(socket_path: str, argv, cwd=None, env=None) -> dict:
+    """
+    Send command line to the server and wait for response.
+
+    :param socket_path: path of server's Unix domain socket
+    :param argv: list of arguments
+    :param cwd: working directory for the command
+    :param env: environment variables for the command
+    :return: response, see :mod:`argser.server`
+    """
+    data = {'argv': list(argv)}
+    if cwd:
+        data['cwd'] = cwd
+    if env is not None:
+        data['env'] = dict(env)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(data).encode() + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline())
@@ -0,0 +1,504 @@
+import copy
+import keyword
+import logging
+from argparse import Namespace
+from typing import Dict, List, Optional, Tuple
+
+from argser.consts import Args, RESULT_MARK, SPEC_MARK, SUB_COMMAND_MARK
+from argser.display import stringify
+from argser.exceptions import ArgserException
+from argser.fields import Opt
+from argser.logging import VERBOSE
+
+logger = logging.getLogger(__name__)
+
+# (holder, field names, names of fields with suppressed defaults, {sub-command: node index})
+Node = Tuple[Args, Tuple[str, ...], Tuple[str, ...], Dict[str, int]]
+
+# kinds of serialized holders
+REGULAR, SLOTS, SPARSE = range(3)
+FINGERPRINT_SIZE = 8
+HEADER_SIZE = FINGERPRINT_SIZE + 1  # fingerprint and kind of results
+
+# specs of serialized holders, see :meth:`Spec.register`
+_specs: Dict[bytes, 'Spec'] = {}
+
+
+# methods of generated result classes
+RESULT_METHODS = ('to_dict', 'to_tuple')
+
+
+def _check_field_name(name: str):
+    if not name.isidentifier() or keyword.iskeyword(name) or name.startswith('__'):
+        raise ArgserException(f"{name!r} can't be used as a field of result class.")
+    if name in RESULT_METHODS:
+        raise ArgserException(
+            f"{name!r} can't be used as a field of result class, it's a method of the result. "
+            f"Rename the field or use regular holders (slots=False, sparse=False)."
+        )
+
+
+def _result_eq(self, other):
+    if other.__class__ is not self.__class__:
+        return NotImplemented
+    return self.to_tuple() == other.to_tuple()
+
+
+def _type_name(obj) -> Optional[str]:
+    """Name of type or action that doesn't depend on address of the object."""
+    if obj is None or isinstance(obj, str):
+        return obj
+    return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}"
+
+
+def _sparse_init(self, **values):
+    for key, value in values.items():
+        setattr(self, key, value)
+
+
+def make_result_cls(name: str, fields: List[str], sub_command=False, defaults=None) -> type:
+    """
+    Generate compact class for parsed values with ``__slots__``,
+    precomputed order of fields and fast :meth:`to_dict` / :meth:`to_tuple`.
+
+    :param name: name of the class
+    :param fields: names of the fields
+    :param sub_command: mark class as sub-command holder
+    :param defaults: if provided then generate sparse class instead: defaults are
+        stored as class attributes and instances keep only overridden values.
+        Mutable defaults are shared between instances - assign new values
+        instead of modifying them in place.
+    :return: generated class
+
+    >>> Result = make_result_cls('Result', ['a', 'b'])
+    >>> res = Result(1, b='foo')
+    >>> res.to_dict()
+    {'a': 1, 'b': 'foo'}
+    >>> res.to_tuple()
+    (1, 'foo')
+
+    >>> Result = make_result_cls('Result', ['a', 'b'], defaults={'a': 1, 'b': 2})
+    >>> res = Result(b=3)
+    >>> res.to_dict(), vars(res)
+    ({'a': 1, 'b': 3}, {'b': 3})
+    """
+    fields = tuple(fields)
+    for field in fields:
+        _check_field_name(field)
+    # fields never start with '__', so the instance parameter can't clash with them
+    params = ''.join(f', {f}=None' for f in fields)
+    init_body = ''.join(f'\n    __self.{f} = {f}' for f in fields) or '\n    pass'
+    values = ''.join(f'__self.{f}, ' for f in fields)
+    pairs = ', '.join(f'{f!r}: __self.{f}' for f in fields)
+    source = (
+        f"def __init__(__self{params}):{init_body}\n"
+        f"def to_dict(__self):\n    return {{{pairs}}}\n"
+        f"def to_tuple(__self):\n    return ({values})\n"
+    )
+    logger.log(VERBOSE, source)
+    namespace = {}
+    exec(source, {}, namespace)
+    if defaults is None:
+        namespace['__slots__'] = fields
+    else:
+        namespace['__init__'] = _sparse_init
+        namespace.update({f: defaults.get(f) for f in fields})
+    namespace.update(
+        __eq__=_result_eq,
+        __hash__=None,
+        __str__=stringify,
+        __repr__=stringify,
+        __module__=__name__,
+        __qualname__=name,
+        **{RESULT_MARK: fields},
+    )
+    if sub_command:
+        namespace[SUB_COMMAND_MARK] = True
+    return type(name, (), namespace)
+
+
+class Spec(tuple):
+    """
+    Compiled arguments specification. Unpacks into ``(options, sub_commands)``
+    and keeps index of namespace destinations, so parsed values can be routed
+    straight into holders.
+
+    :param options: root options
+    :param sub_commands: sub-commands options
+    :param nodes: holders in order of parsers, parent parsers go before their children.
+        Holder of the root node is replaced with provided one on each parsing,
+        holders of chosen sub-commands are copied, so parsings in different threads don't share them.
+    :param routes: ``dest -> (node index, field name)``
+    :param commands: ``sub-parser dest -> node index``
+    :param defaults: default values of the fields for each node
+    """
+
+    def __new__(cls, options: List[Opt], sub_commands: dict, *args, **kwargs):
+        return super().__new__(cls, (options, sub_commands))
+
+    def __init__(
+        self,
+        options: List[Opt],
+        sub_commands: dict,
+        nodes: List[Node],
+        routes: Dict[str, Tuple[int, str]],
+        commands: Dict[str, int],
+        defaults: List[dict],
+    ):
+        super().__init__()
+        self.nodes = nodes
+        self.routes = routes
+        self.commands = commands
+        self.defaults = defaults
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Drop generated classes and fingerprint after modification of the spec."""
+        self._result_types = None
+        self._sparse_types = None
+        self._fingerprint = None
+
+    def _make_types(self, sparse: bool) -> List[type]:
+        types = []
+        for i, (holder, fields, _, sub_commands) in enumerate(self.nodes):
+            cls = make_result_cls(
+                holder.__class__.__name__,
+                fields + tuple(sub_commands),
+                sub_command=i > 0,
+                defaults=self.defaults[i] if sparse else None,
+            )
+            setattr(cls, SPEC_MARK, (self, i))
+            cls.__reduce__ = _result_reduce
+            types.append(cls)
+        return types
+
+    @property
+    def result_types(self) -> List[type]:
+        """Generated result classes, one per node. See :func:`make_result_cls`."""
+        if self._result_types is None:
+            self._result_types = self._make_types(sparse=False)
+        return self._result_types
+
+    @property
+    def sparse_types(self) -> List[type]:
+        """Generated sparse result classes, one per node. Defaults are shared between them."""
+        if self._sparse_types is None:
+            self._sparse_types = self._make_types(sparse=True)
+        return self._sparse_types
+
+    def make_result(self, sparse=False):
+        """Make empty instance of the root result class."""
+        cls = self.sparse_types[0] if sparse else self.result_types[0]
+        return cls.__new__(cls)
+
+    def get_kind(self, holder, index=0) -> int:
+        """Check if :attr:`holder` of node with :attr:`index` is generated result."""
+        for kind, types in ((SLOTS, self._result_types), (SPARSE, self._sparse_types)):
+            if types is not None and holder.__class__ is types[index]:
+                return kind
+        return REGULAR
+
+    def get_types(self, kind: int) -> Optional[List[type]]:
+        """Get generated classes of the :attr:`kind`, ``None`` for regular holders."""
+        if kind == SLOTS:
+            return self.result_types
+        if kind == SPARSE:
+            return self.sparse_types
+
+    def _node_options(self) -> List[List[Opt]]:
+        """Options of each node, in the same order as nodes."""
+        result = [[] for _ in self.nodes]
+
+        def collect(index, options, sub_commands):
+            result[index] = options
+            children = self.nodes[index][3]
+            for name, (_, sub_options, sub_sub_commands) in sub_commands.items():
+                collect(children[name], sub_options, sub_sub_commands)
+
+        collect(0, *self)
+        return result
+
+    @property
+    def fingerprint(self) -> bytes:
+        """
+        Short digest of holders structure, defaults, types and actions of the fields,
+        the same for equal specs in different processes.
+        """
+        if self._fingerprint is None:
+            structure = [
+                (
+                    holder.__class__.__name__,
+                    fields,
+                    tuple(children),
+                    [
+                        (o.name, _type_name(o.factory), _type_name(o.action), o.nargs)
+                        for o in options
+                    ],
+                    defaults,
+                )
+                for (holder, fields, _, children), options, defaults in zip(
+                    self.nodes, self._node_options(), self.defaults
+                )
+            ]
+            import hashlib
+
+            digest = hashlib.sha1(repr(structure).encode()).digest()
+            self._fingerprint = digest[:FINGERPRINT_SIZE]
+        return self._fingerprint
+
+    def get_state(self) -> tuple:
+        """
+        Get structure of holders that is enough to restore serialized results in other process,
+        see :meth:`from_state`.
+        """
+        nodes = [
+            (holder.__class__.__name__, fields, suppressed, children)
+            for holder, fields, suppressed, children in self.nodes
+        ]
+        return self.fingerprint, nodes, self.defaults
+
+    @classmethod
+    def from_state(cls, state: tuple) -> 'Spec':
+        """Make spec without options from :meth:`get_state`, it can only load results."""
+        fingerprint, nodes, defaults = state
+        nodes = [(type(name, (), {})(), *node) for name, *node in nodes]
+        spec = cls([], {}, nodes, {}, {}, defaults)
+        spec._fingerprint = fingerprint
+        return spec
+
+    def register(self):
+        """Make spec available for :func:`from_bytes` by its fingerprint."""
+        _specs[self.fingerprint] = self
+        return self
+
+    def dump(self, holder, index=0) -> tuple:
+        """
+        Extract values from :attr:`holder` of node with :attr:`index`.
+
+        :return: ``(overrides, sub-command name, sub-command values)``, where overrides are
+            ``{field position: value}`` of values that differ from defaults
+        """
+        _, fields, _, children = self.nodes[index]
+        defaults = self.defaults[index]
+        overrides = {}
+        for i, name in enumerate(fields):
+            value = getattr(holder, name)
+            if value is not defaults[name]:
+                overrides[i] = value
+        for name, sub_index in children.items():
+            sub = getattr(holder, name)
+            if sub is not None:
+                return overrides, name, self.dump(sub, sub_index)
+        return overrides, None, None
+
+    def load(self, values: tuple, holder, index=0):
+        """
+        Populate :attr:`holder` of node with :attr:`index` with values from :meth:`dump`.
+        Sub-commands are populated with new results if :attr:`holder` is generated result
+        (see :meth:`make_result`) or with predefined holders otherwise.
+        """
+        overrides, chosen, sub_values = values
+        _, fields, _, children = self.nodes[index]
+        kind = self.get_kind(holder, index)
+        if kind == SPARSE:
+            for i, value in overrides.items():
+                setattr(holder, fields[i], value)
+        else:
+            defaults = self.defaults[index]
+            for i, name in enumerate(fields):
+                setattr(holder, name, overrides.get(i, defaults[name]))
+        for name, sub_index in children.items():
+            if name != chosen:
+                if kind != SPARSE:
+                    setattr(holder, name, None)
+                continue
+            if kind == REGULAR:
+                sub = copy.copy(self.nodes[sub_index][0])
+            else:
+                cls = self.get_types(kind)[sub_index]
+                sub = cls.__new__(cls)
+            setattr(holder, name, self.load(sub_values, sub, sub_index))
+        return holder
+
+
+class HolderNamespace(Namespace):
+    """
+    Namespace that routes parsed values straight into the arguments holders.
+    Values of unknown destinations (eg from predefined parser) are stored as usual.
+
+    :param spec: compiled specification
+    :param holder: root arguments holder, either instance of arguments class
+        or result made by :meth:`Spec.make_result`
+    """
+
+    __slots__ = ('_spec', '_holders', '_types', '_sparse')
+
+    def __init__(self, spec: Spec, holder: Args):
+        super().__init__()
+        kind = spec.get_kind(holder)
+        types = spec.get_types(kind)
+        # holders of sub-commands will be created only when they are chosen
+        holders = [holder] + [None] * (len(spec.nodes) - 1)
+        object.__setattr__(self, '_spec', spec)
+        object.__setattr__(self, '_holders', holders)
+        object.__setattr__(self, '_types', types)
+        object.__setattr__(self, '_sparse', kind == SPARSE)
+        self._prepare(0)
+
+    def _prepare(self, index: int):
+        holder = self._holders[index]
+        _, fields, suppressed, _ = self._spec.nodes[index]
+        if self._types is None:
+            # drop values left from previous parsing so argparse will set defaults again
+            for name in fields:
+                holder.__dict__.pop(name, None)
+        # argparse never sets values of these fields
+        for name in suppressed:
+            self._set(holder, name, None)
+
+    def _set(self, holder, name: str, value):
+        # sparse holders keep only values that differ from shared defaults
+        if self._sparse and value is getattr(holder.__class__, name):
+            holder.__dict__.pop(name, None)
+        else:
+            setattr(holder, name, value)
+
+    def __setattr__(self, key, value):
+        route = self._spec.routes.get(key)
+        if route:
+            index, name = route
+            self._set(self._holders[index], name, value)
+            return
+        index = self._spec.commands.get(key)
+        if index is not None and value is not None:
+            self._choose(index, value)
+        super().__setattr__(key, value)
+
+    def _choose(self, index: int, chosen):
+        # attach chosen sub-command and nullify the rest
+        holder = self._holders[index]
+        for name, sub_index in self._spec.nodes[index][3].items():
+            if name != chosen:
+                self._set(holder, name, None)
+                continue
+            if self._types is not None:
+                cls = self._types[sub_index]
+                self._holders[sub_index] = cls.__new__(cls)
+            else:
+                # copy of predefined holder, so concurrent parsings don't share sub-commands
+                self._holders[sub_index] = copy.copy(self._spec.nodes[sub_index][0])
+            self._prepare(sub_index)
+            self._set(holder, name, self._holders[sub_index])
+
+    def finalize(self):
+        """Nullify sub-commands of the parsers where none of them was chosen."""
+        reached = {0}
+        # parent parsers are indexed before their children
+        for key, index in self._spec.commands.items():
+            if index not in reached:
+                continue
+            chosen = self.__dict__.get(key)
+            if chosen is None:
+                self._choose(index, None)
+            else:
+                reached.add(self._spec.nodes[index][3][chosen])
+
+    def __getattr__(self, key):
+        # called only if attribute wasn't found in namespace itself
+        route = None if key in HolderNamespace.__slots__ else self._spec.routes.get(key)
+        if route is None:
+            raise AttributeError(key)
+        index, name = route
+        holder = self._holders[index]
+        if holder is None:
+            raise AttributeError(key)
+        if self._types is not None:
+            return getattr(holder, name)
+        try:
+            return holder.__dict__[name]
+        except KeyError:
+            raise AttributeError(key) from None
+
+
+def get_spec(holder: Args) -> Tuple[Spec, int]:
+    """
+    Find compiled spec of parsed :attr:`holder`.
+
+    :return: spec and index of holder's node
+    """
+    mark = getattr(holder.__class__, SPEC_MARK, None)
+    if mark:
+        return mark
+    namespace = getattr(holder, '__namespace__', None)
+    if isinstance(namespace, HolderNamespace):
+        return namespace._spec, 0
+    raise ArgserException(f"Spec of {holder!r} is unknown, it should be provided explicitly.")
+
+
+def to_bytes(holder: Args, spec: Spec = None) -> bytes:
+    """
+    Serialize values of parsed :attr:`holder` with fingerprint of its spec.
+    Only values that differ from defaults are stored.
+
+    :param holder: parsed arguments holder
+    :param spec: compiled spec of the holder. Can be omitted for generated results
+        and for holders that kept parser's namespace.
+    :return: serialized values
+    """
+    index = 0
+    if spec is None:
+        spec, index = get_spec(holder)
+    spec.register()
+    kind = spec.get_kind(holder, index)
+    import pickle
+
+    payload = pickle.dumps((index, spec.dump(holder, index)), pickle.HIGHEST_PROTOCOL)
+    return spec.fingerprint + bytes([kind]) + payload
+
+
+def from_bytes(data: bytes, spec: Spec = None, holder: Args = None) -> Args:
+    """
+    Rebuild holder from values serialized by :func:`to_bytes` without parsing.
+
+    :param data: serialized values
+    :param spec: compiled spec of the holder. If omitted then spec will be looked up
+        by fingerprint among registered specs, see :meth:`Spec.register`
+    :param holder: holder to populate. By default new result of the same kind is made
+        (results with slots are made for regular holders)
+    :return: populated holder
+
+    >>> from argser import parse_args
+    >>> class Args:
+    ...     a = 1
+    ...     b = 'foo'
+    >>> data = to_bytes(parse_args(Args, '-a 2', slots=True))
+    >>> from_bytes(data)
+    Args(a=2, b='foo')
+    """
+    fingerprint, kind = data[:FINGERPRINT_SIZE], data[FINGERPRINT_SIZE]
+    if spec is None:
+        spec = _specs.get(fingerprint)
+        if spec is None:
+            raise ArgserException("Spec of serialized holder is not registered.")
+    elif spec.fingerprint != fingerprint:
+        raise ArgserException("Serialized holder doesn't match the spec.")
+    import pickle
+
+    index, values = pickle.loads(data[HEADER_SIZE:])
+    if holder is None:
+        cls = spec.get_types(SPARSE if kind == SPARSE else SLOTS)[index]
+        holder = cls.__new__(cls)
+    return spec.load(values, holder, index)
+
+
+def _restore(state: tuple, data: bytes) -> Args:
+    spec = _specs.get(state[0])
+    if spec is None:
+        # process that didn't compile the spec, eg worker of multiprocessing pool
+        spec = Spec.from_state(state).register()
+    return from_bytes(data, spec)
+
+
+def _result_reduce(self):
+    spec, _ = get_spec(self)
+    return _restore, (spec.get_state(), to_bytes(self))
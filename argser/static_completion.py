@@ -0,0 +1,310 @@
+"""
+Static completion scripts generated from the parser tree of a script.
+
+Generated bash, fish and tcsh code knows sub-commands, options and choices of the script,
+so no python is started at Tab time. Values of options with dynamic ``completer``
+are completed by running the script as argcomplete does (bash and fish),
+tcsh completes them as file names. tcsh code doesn't track nested sub-commands:
+words after sub-command name are completed from that sub-command.
+
+Generated code is cached per script and regenerated only when script's modification
+time changes: ``eval "$(python -m argser completion --static foo.py)"``.
+"""
+import hashlib
+import os
+import re
+from argparse import SUPPRESS, ArgumentParser, _SubParsersAction
+from shlex import quote
+from typing import Dict, List, NamedTuple, Optional
+
+from argser.completion import _capture_parser
+from argser.exceptions import ArgserException
+from argser.utils import user_cache_path, write_atomic
+
+SHELLS = ('bash', 'fish', 'tcsh')
+DYNAMIC = object()  # values of the option are completed by its completer at runtime
+HEADER = '# argser static completion: {path} {mtime}'
+
+BASH_RUNTIME = r'''
+_argser_static_runtime() {
+    local IFS=$'\013'
+    COMPREPLY=($(IFS="$IFS" \
+        COMP_LINE="$COMP_LINE" \
+        COMP_POINT="$COMP_POINT" \
+        COMP_TYPE="$COMP_TYPE" \
+        _ARGCOMPLETE_COMP_WORDBREAKS="$COMP_WORDBREAKS" \
+        _ARGCOMPLETE=1 \
+        _ARGCOMPLETE_SHELL="bash" \
+        "$1" 8>&1 9>&2 1>/dev/null 2>&1 </dev/null))
+}
+'''
+
+FISH_RUNTIME = r'''
+function %(function)s_runtime
+    set -lx _ARGCOMPLETE 1
+    set -lx _ARGCOMPLETE_DFS \t
+    set -lx _ARGCOMPLETE_IFS \n
+    set -lx _ARGCOMPLETE_SUPPRESS_SPACE 1
+    set -lx _ARGCOMPLETE_SHELL fish
+    set -lx COMP_LINE (commandline -p)
+    set -lx COMP_POINT (string length (commandline -cp))
+    set -lx COMP_TYPE
+    %(script)s 8>&1 9>&2 1>/dev/null 2>&1
+end
+'''
+
+
+class Command(NamedTuple):
+    """Completions of the root parser or sub-command at the path like ``root/sub/nested``."""
+
+    path: str
+    options: List[str]
+    # option that takes value -> list of choices, None for any value or DYNAMIC
+    values: Dict[str, object]
+    # sub-commands and choices of positional arguments
+    words: List[str]
+    # some positional argument has dynamic completer
+    dynamic: bool = False
+
+
+def _choices(action) -> Optional[object]:
+    if callable(getattr(action, 'completer', None)):
+        return DYNAMIC
+    if action.choices is not None:
+        return [str(c) for c in action.choices]
+    return None
+
+
+def walk(parser: ArgumentParser, path='root') -> List[Command]:
+    """
+    Collect completions of the parser and its sub-commands.
+
+    :param parser: root parser
+    :param path: path of the parser
+    :return: list of commands, root goes first
+    """
+    command = Command(path, [], {}, [])
+    children = []
+    # noinspection PyProtectedMember
+    for action in parser._actions:
+        if isinstance(action, _SubParsersAction):
+            for name, sub_parser in action.choices.items():
+                command.words.append(name)
+                children.extend(walk(sub_parser, f'{path}/{name}'))
+        elif action.help == SUPPRESS:
+            continue
+        elif action.option_strings:
+            command.options.extend(action.option_strings)
+            if action.nargs != 0:
+                command.values.update(dict.fromkeys(action.option_strings, _choices(action)))
+        else:
+            choices = _choices(action)
+            if choices is DYNAMIC:
+                command = command._replace(dynamic=True)
+            elif choices:
+                command.words.extend(choices)
+    return [command] + children
+
+
+def _names(script: str) -> str:
+    """Complete script by its path and by its name (if it's in PATH)."""
+    return f'{quote(script)} {quote(os.path.basename(script))}'
+
+
+def _words(words) -> str:
+    return quote(' '.join(words))
+
+
+def _patterns(keys) -> str:
+    return '|'.join(map(quote, keys))
+
+
+def _transitions(commands: List[Command]):
+    """
+    Get ``path:word`` keys of options that take value (next word should be skipped)
+    and of sub-commands (path changes to ``path/word``).
+    """
+    skip = [f'{c.path}:{option}' for c in commands for option in c.values]
+    subs = [':'.join(c.path.rsplit('/', 1)) for c in commands[1:]]
+    return skip, subs
+
+
+def _bash(script: str, function: str, commands: List[Command]) -> str:
+    lines = [
+        f'{function}() {{',
+        '    local cur="${COMP_WORDS[COMP_CWORD]}" prev="${COMP_WORDS[COMP_CWORD-1]}"',
+        '    local cmd=root words="" i w',
+        '    for ((i = 1; i < COMP_CWORD; i++)); do',
+        '        w="${COMP_WORDS[i]}"',
+        '        case "$cmd:$w" in',
+    ]
+    skip, subs = _transitions(commands)
+    if skip:
+        lines.append(f'            {_patterns(skip)}) ((i++)) ;;')
+    if subs:
+        lines.append(f'            {_patterns(subs)}) cmd="$cmd/$w" ;;')
+    lines += ['        esac', '    done', '    case "$cmd:$prev" in']
+    # options of the same action share choices
+    values = {}
+    for command in commands:
+        for option, choices in command.values.items():
+            values.setdefault(id(choices), (choices, []))[1].append(f'{command.path}:{option}')
+    for choices, keys in values.values():
+        key = _patterns(keys)
+        if choices is DYNAMIC:
+            lines.append(f'        {key}) _argser_static_runtime "$1"; return ;;')
+        elif choices:
+            compgen = f'COMPREPLY=($(compgen -W {_words(choices)} -- "$cur"))'
+            lines.append(f'        {key}) {compgen}; return ;;')
+        else:
+            lines.append(f'        {key}) return ;;')
+    lines += ['    esac', '    case "$cmd" in']
+    for command in commands:
+        words = f'words={_words(command.options + command.words)}'
+        if command.dynamic:
+            words = f'[[ "$cur" != -* ]] && {{ _argser_static_runtime "$1"; return; }}; {words}'
+        lines.append(f'        {quote(command.path)}) {words} ;;')
+    lines += [
+        '    esac',
+        '    COMPREPLY=($(compgen -W "$words" -- "$cur"))',
+        '}',
+        f'complete -o default -o bashdefault -F {function} {_names(script)}',
+    ]
+    return BASH_RUNTIME + '\n'.join(lines) + '\n'
+
+
+def _fish_option(option: str) -> str:
+    if option.startswith('--'):
+        return f'-l {quote(option[2:])}'
+    if len(option) == 2:
+        return f'-s {quote(option[1:])}'
+    return f'-o {quote(option[1:])}'
+
+
+def _fish(script: str, function: str, commands: List[Command]) -> str:
+    lines = [
+        f'function {function}_cmd',
+        '    set -l cmd root',
+        '    set -l skip 0',
+        '    for w in (commandline -opc)[2..-1]',
+        '        if test $skip = 1',
+        '            set skip 0',
+        '            continue',
+        '        end',
+        '        switch "$cmd:$w"',
+    ]
+    skip, subs = _transitions(commands)
+    if skip:
+        lines += [f'            case {" ".join(map(quote, skip))}', '                set skip 1']
+    if subs:
+        lines += [f'            case {" ".join(map(quote, subs))}', '                set cmd "$cmd/$w"']
+    lines += ['        end', '    end', '    echo $cmd', 'end']
+    names = ' '.join(f'-c {quote(name)}' for name in (script, os.path.basename(script)))
+    lines.append(f'complete {names} -f')
+    for command in commands:
+        complete = f'complete {names} -n {quote(f"test ({function}_cmd) = {command.path}")}'
+        if command.dynamic:
+            lines.append(f'{complete} -a {quote(f"({function}_runtime)")}')
+        if command.words:
+            lines.append(f'{complete} -a {_words(command.words)}')
+        for option in command.options:
+            choices = command.values.get(option, False)
+            if choices is DYNAMIC:
+                value = f' -x -a {quote(f"({function}_runtime)")}'
+            elif choices:
+                value = f' -x -a {_words(choices)}'
+            elif choices is None:
+                value = ' -r -F'
+            else:
+                value = ''
+            lines.append(f'{complete} {_fish_option(option)}{value}')
+    runtime = FISH_RUNTIME % dict(function=function, script=quote(script))
+    return runtime + '\n'.join(lines) + '\n'
+
+
+def _tcsh_words(words) -> str:
+    # tcsh can't quote words inside of the list
+    return ' '.join(w for w in words if re.match(r'^[\w.,:+=@%-]+$', w))
+
+
+def _tcsh(script: str, function: str, commands: List[Command]) -> str:
+    patterns, options = [], []
+    for command in commands:
+        options.extend(command.options)
+        for option, choices in command.values.items():
+            if choices is None or choices is DYNAMIC:
+                patterns.append(f'n/{option}/f/')
+            else:
+                patterns.append(f'n/{option}/({_tcsh_words(choices)})/')
+    for command in commands[1:]:
+        name = command.path.rpartition('/')[2]
+        patterns.append(f'n/{name}/({_tcsh_words(command.options + command.words)})/')
+    patterns.append(f'c/-/({_tcsh_words(dict.fromkeys(options))})/')
+    patterns.append(f'p/1/({_tcsh_words(commands[0].options + commands[0].words)})/')
+    patterns = ' '.join(quote(p) for p in patterns)
+    return '\n'.join(
+        f'complete {quote(name)} {patterns}' for name in (script, os.path.basename(script))
+    ) + '\n'
+
+
+GENERATORS = {'bash': _bash, 'fish': _fish, 'tcsh': _tcsh}
+
+
+def generate(script: str, parser: ArgumentParser, shell='bash') -> str:
+    """
+    Make completion code for the script.
+
+    :param script: path of the script
+    :param parser: parser of the script
+    :param shell: one of ``bash``, ``fish`` or ``tcsh``
+    """
+    if shell not in GENERATORS:
+        raise ArgserException(f"unsupported shell {shell!r}, choose from {', '.join(SHELLS)}")
+    name = re.sub(r'\W', '_', os.path.basename(script))
+    digest = hashlib.sha1(script.encode()).hexdigest()[:8]
+    return GENERATORS[shell](script, f'_argser_static_{name}_{digest}', walk(parser))
+
+
+def default_cache_dir():
+    return user_cache_path('completion')
+
+
+def _cache_path(cache_dir: str, script: str, shell: str) -> str:
+    digest = hashlib.sha1(script.encode()).hexdigest()
+    return os.path.join(cache_dir, shell, f'{digest}.{shell}')
+
+
+def _read_cached(path: str, header: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            if f.readline().rstrip('\n') == header:
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+
+def static_completion(script: str, shell='bash', cache_dir=None) -> str:
+    """
+    Make completion code for the script, reuse cached code if the script wasn't modified.
+
+    :param script: path of the script, it's run until its parser is built
+    :param shell: one of ``bash``, ``fish`` or ``tcsh``
+    :param cache_dir: directory for generated code, by default ``~/.cache/argser/completion``.
+        Pass False to disable cache.
+    :return: code to evaluate in the shell
+    """
+    script = os.path.abspath(script)
+    header = HEADER.format(path=script, mtime=os.stat(script).st_mtime_ns)
+    if cache_dir is not False:
+        cache_path = _cache_path(cache_dir or default_cache_dir(), script, shell)
+        code = _read_cached(cache_path, header)
+        if code is not None:
+            return code
+    captured = _capture_parser(script)
+    if captured is None:
+        raise ArgserException(f"script {script} didn't build parser")
+    code = generate(script, captured[0], shell)
+    if cache_dir is not False:
+        write_atomic(cache_path, f'{header}\n{code}')
+    return code
@@ -0,0 +1,93 @@
+"""
+Prefix tree for fast lookup of option and sub-command names by their prefixes.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+# key of the node's value, it can't collide with single characters of names
+_VALUE = ''
+_MISSING = object()
+
+
+class Trie:
+    """
+    Mapping of strings to values with lookup of all keys that start with some prefix.
+    Lookup takes ``O(len(prefix))`` steps plus the number of nodes below the prefix.
+
+    >>> trie = Trie([('--name', 1), ('--no-name', 2), ('--number', 3)])
+    >>> trie.items('--na')
+    [('--name', 1)]
+    >>> trie.unique('--nu')
+    ('--number', 3)
+    >>> trie.keys('--n')
+    ['--name', '--no-name', '--number']
+    """
+
+    def __init__(self, items: Iterable[Tuple[str, object]] = ()):
+        self.root = {}
+        self.size = 0
+        for key, value in items:
+            self[key] = value
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.items()})'
+
+    def __len__(self):
+        return self.size
+
+    def __setitem__(self, key: str, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        if _VALUE not in node:
+            self.size += 1
+        node[_VALUE] = value
+
+    def _node(self, prefix: str) -> Optional[dict]:
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key: str, default=None):
+        node = self._node(key)
+        return default if node is None else node.get(_VALUE, default)
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def items(self, prefix='', limit: int = None) -> List[Tuple[str, object]]:
+        """
+        Get sorted items which keys start with prefix.
+
+        :param prefix: prefix of keys
+        :param limit: stop after this number of items
+        """
+        node = self._node(prefix)
+        if node is None:
+            return []
+        result = []
+        stack = [(prefix, node)]
+        while stack and len(result) != limit:
+            key, node = stack.pop()
+            if _VALUE in node:
+                result.append((key, node[_VALUE]))
+            for char in sorted(node, reverse=True):
+                if char != _VALUE:
+                    stack.append((key + char, node[char]))
+        return result
+
+    def keys(self, prefix='') -> List[str]:
+        return [key for key, _ in self.items(prefix)]
+
+    def unique(self, prefix: str) -> Optional[Tuple[str, object]]:
+        """Get the only item which key starts with prefix, None if there are none or many of them."""
+        items = self.items(prefix, limit=2)
+        return items[0] if len(items) == 1 else None
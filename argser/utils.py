@@ -1,10 +1,12 @@
+import os
 import re
 from argparse import ArgumentTypeError
 from functools import partial
 
 import termcolor
 
-from argser.consts import FALSE_VALUES, TRUE_VALUES, Args
+from argser.consts import FALSE_VALUES, RESULT_MARK, TRUE_VALUES, Args
+from argser.exceptions import ArgserException
 
 RE_INV_CODES = re.compile(r"\x1b\[\d+[;\d]*m|\x1b\[\d*;\d*;\d*m")
 
@@ -54,10 +56,100 @@ class colors:
 
 
 def args_to_dict(args: Args) -> dict:
+    if hasattr(args.__class__, RESULT_MARK):
+        return args.to_dict()
     return {key: value for key, value in args.__dict__.items() if not key.startswith('_')}
 
 
+def user_cache_path(*parts: str) -> str:
+    """Path in cache directory of argser: ``$XDG_CACHE_HOME/argser``, ``~/.cache/argser`` by default."""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache')
+    return os.path.join(os.path.expanduser(cache_dir), 'argser', *parts)
+
+
+def write_atomic(path: str, text: str):
+    """
+    Write file via temporary file, so concurrent readers see either old or new content.
+    Missing directories are created.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def dump_json(path: str, data):
+    """Save data into JSON file atomically, see :func:`write_atomic`."""
+    import json
+
+    write_atomic(path, json.dumps(data))
+
+
+def load_json(path: str):
+    """Load JSON file, ``None`` if it's missing or malformed."""
+    import json
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def bind_unix_socket(sock, path: str):
+    """
+    Bind Unix domain socket that only its owner can connect to.
+    Socket file left by a stopped server is removed, but other files and sockets of running servers
+    are never replaced.
+
+    :param sock: ``AF_UNIX`` socket
+    :param path: path of the socket file
+    :raises ArgserException: if path isn't a socket or some server is listening on it
+    """
+    import socket
+    import stat
+
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            raise ArgserException(f"{path} already exists and isn't a socket")
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+        except OSError:
+            os.unlink(path)  # stale socket of previous server
+        else:
+            raise ArgserException(f"server is already listening on {path}")
+        finally:
+            client.close()
+    umask = os.umask(0o177)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+
+
+# argser.parse_func._get_binder, it's imported on the first call to avoid import cycle
+_get_binder = None
+
+
 def with_args(func, options, *args, **kwargs):
+    global _get_binder
+    if not args and not kwargs:
+        if _get_binder is None:
+            from argser.parse_func import _get_binder
+        return _get_binder(func, options)(func, options)
     data = args_to_dict(options)
     data.update(kwargs)
     return func(*args, **data)
@@ -0,0 +1,100 @@
+"""
+Compare latency of Tab completion:
+
+- plain: bare interpreter start-up, the lower bound for any python command
+- argcomplete: script completes itself, imports modules and builds parser on every Tab press
+- daemon: thin client (``argser/completion.py`` run as a script) asks completion daemon
+  that has cached parser of the script
+
+Usage: ``python benchmarks/completion.py [-n 20] [--modules asyncio decimal ...]``
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT = os.path.join(ROOT, 'argser', 'completion.py')
+DEFAULT_MODULES = [
+    'asyncio',
+    'decimal',
+    'email.mime.multipart',
+    'http.client',
+    'json',
+    'logging.handlers',
+    'unittest.mock',
+    'xml.etree.ElementTree',
+]
+
+CLI = '''
+{imports}
+from argser import SubCommands
+
+subs = SubCommands()
+
+
+@subs.add
+def add(a: int, b: int = 1):
+    return a + b
+
+
+@subs.add
+def mul(a: int, b: int = 2):
+    return a * b
+
+
+if __name__ == '__main__':
+    print(subs.parse())
+'''
+
+
+def measure(cmd, env, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=20, help="number of runs")
+    parser.add_argument('--modules', nargs='*', default=DEFAULT_MODULES)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    script = os.path.join(tmp, 'bench_cli.py')
+    imports = '\n'.join(f'import {m}' for m in args.modules)
+    with open(script, 'w') as f:
+        f.write(CLI.format(imports=imports))
+    line = 'bench_cli.py add --'
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        ARGSER_COMPLETE_SOCKET=os.path.join(tmp, 'complete.sock'),
+        COMP_LINE=line,
+        COMP_POINT=str(len(line)),
+        _ARGCOMPLETE='1',
+        _ARGCOMPLETE_STDOUT_FILENAME=os.path.join(tmp, 'out.txt'),
+    )
+    client = [sys.executable, '-S', CLIENT, 'complete', script]
+    subprocess.run(client, env=env, check=True)  # start daemon
+    try:
+        results = {
+            'plain': measure([sys.executable, '-c', 'pass'], env, args.n),
+            'argcomplete': measure([sys.executable, script], env, args.n),
+            'daemon': measure(client, env, args.n),
+        }
+    finally:
+        subprocess.run([sys.executable, CLIENT, 'stop', env['ARGSER_COMPLETE_SOCKET']])
+    print(f"{'':<12} {'median, ms':>10} {'min, ms':>10}")
+    for name, times in results.items():
+        print(f"{name:<12} {statistics.median(times):>10.1f} {min(times):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
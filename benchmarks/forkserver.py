@@ -0,0 +1,99 @@
+"""
+Compare start-up time of a command line tool:
+
+- plain: bare interpreter start-up, the lower bound for any python command
+- cold: tool started directly, imports modules and builds parser every time
+- fork-server: thin client (``argser/forkserver.py`` run as a script, so argser isn't
+  imported) that runs the tool in a child of warm fork-server
+
+Usage: ``python benchmarks/forkserver.py [-n 20] [--modules asyncio decimal ...]``
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT = os.path.join(ROOT, 'argser', 'forkserver.py')
+DEFAULT_MODULES = [
+    'asyncio',
+    'decimal',
+    'email.mime.multipart',
+    'http.client',
+    'json',
+    'logging.handlers',
+    'unittest.mock',
+    'xml.etree.ElementTree',
+]
+
+CLI = '''
+{imports}
+from argser import SubCommands
+
+subs = SubCommands()
+
+
+@subs.add
+def add(a: int, b: int = 1):
+    return a + b
+
+
+@subs.add
+def mul(a: int, b: int = 2):
+    return a * b
+
+
+if __name__ == '__main__':
+    print(subs.parse())
+'''
+
+
+def measure(cmd, env, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=20, help="number of runs")
+    parser.add_argument('--modules', nargs='*', default=DEFAULT_MODULES)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    imports = '\n'.join(f'import {m}' for m in args.modules)
+    with open(os.path.join(tmp, 'bench_cli.py'), 'w') as f:
+        f.write(textwrap.dedent(CLI.format(imports=imports)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([tmp, ROOT]))
+    sock = os.path.join(tmp, 'bench.sock')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'argser.forkserver', 'serve', 'bench_cli:subs', sock]
+        + ['--preload', *args.modules],
+        env=env,
+    )
+    try:
+        while not os.path.exists(sock):
+            time.sleep(0.01)
+        results = {
+            'plain': measure([sys.executable, '-c', 'pass'], env, args.n),
+            'cold': measure([sys.executable, '-m', 'bench_cli', 'add', '1'], env, args.n),
+            'fork-server': measure([sys.executable, CLIENT, sock, 'add', '1'], env, args.n),
+        }
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+    print(f"{'':<12} {'median, ms':>10} {'min, ms':>10}")
+    for name, times in results.items():
+        print(f"{name:<12} {statistics.median(times):>10.1f} {min(times):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare parsing of abbreviated options by parser with many options:
+
+- argparse: :class:`argparse.ArgumentParser` scans all option strings for every abbreviation
+- indexed: :class:`argser.parser.IndexedParser` looks them up in prefix tree
+
+Usage: ``python benchmarks/options.py [--options 5000] [--repeat 20]``
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from argser.parser import IndexedParser  # noqa: E402
+
+
+def make(cls, options: int):
+    parser = cls()
+    for i in range(options):
+        parser.add_argument(f'--option-{i}-value', f'--o{i}v')
+        parser.add_argument(f'--flag-{i}', f'--no-flag-{i}', action='store_true')
+    return parser
+
+
+def measure(name, parser, argv, repeat):
+    parser.parse_args(argv)  # build index
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser.parse_args(argv)
+    print(f"{name:<9} {(time.perf_counter() - start) / repeat * 1000:>8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--options', type=int, default=5000, help="number of options")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    n = args.options
+    argv = []
+    for i in range(0, n, max(1, n // 20)):
+        argv += [f'--option-{i}-v', str(i), f'--no-flag-{i}']
+    print(f"{len(argv)} tokens, {n * 4} option strings")
+    measure('argparse', make(argparse.ArgumentParser, n), argv, args.repeat)
+    measure('indexed', make(IndexedParser, n), argv, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
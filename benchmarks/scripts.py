@@ -0,0 +1,82 @@
+"""
+Compare discovery of scripts with ``PYTHON_ARGCOMPLETE_OK`` mark on synthetic tree:
+
+- glob: previous implementation, recursive glob and serial read of every file
+- cold: :func:`argser.scripts.find_scripts` without index
+- warm: :func:`argser.scripts.find_scripts` with up-to-date index
+
+The tree has sources, ``node_modules``, virtual environment and ``.gitignore``-d build output,
+each file is as large as typical module. ``glob`` runs first, so with cold page cache
+it also pays for reading files from disk: ``sync; echo 3 > /proc/sys/vm/drop_caches``.
+
+Usage: ``python benchmarks/scripts.py [--files 100000] [--dir /tmp/tree]``
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from argser.scripts import find_scripts  # noqa: E402
+
+FILE = '"""module"""\n' + 'x = 1\n' * 500
+MARKED = '#!/usr/bin/env python\n# PYTHON_ARGCOMPLETE_OK\n' + FILE
+FILES_PER_DIR = 50
+
+
+def glob_scripts(root: str):
+    res = []
+    for fp in glob.glob(os.path.join(root, '**', '*.py'), recursive=True):
+        with open(fp) as f:
+            if 'PYTHON_ARGCOMPLETE_OK' in f.read(1024):
+                res.append(os.path.abspath(fp))
+    return res
+
+
+def make_tree(root: str, files: int):
+    """Sources get 40% of files, the rest are split between vendor directories."""
+    parts = {'src': 0.4, 'node_modules': 0.2, '.venv/lib': 0.2, 'build': 0.1, 'generated': 0.1}
+    for part, share in parts.items():
+        count = int(files * share)
+        for i in range(0, count, FILES_PER_DIR):
+            path = os.path.join(root, part, f'd{i // 1000}', f'p{i}')
+            os.makedirs(path, exist_ok=True)
+            for j in range(min(FILES_PER_DIR, count - i)):
+                text = MARKED if part == 'src' and j == 0 else FILE
+                with open(os.path.join(path, f'm{j}.py'), 'w') as f:
+                    f.write(text)
+    with open(os.path.join(root, '.venv', 'pyvenv.cfg'), 'w'):
+        pass
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write('/generated/\n')
+
+
+def measure(name, func):
+    start = time.perf_counter()
+    res = func()
+    print(f"{name:<6} {time.perf_counter() - start:>8.2f} s, {len(res)} scripts")
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=100000, help="number of files in the tree")
+    parser.add_argument('--dir', help="existing tree or where to create it")
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp()
+    if not os.path.exists(os.path.join(root, '.gitignore')):
+        print(f"creating {args.files} files in {root}")
+        make_tree(root, args.files)
+    index = os.path.join(tempfile.mkdtemp(), 'index.json')
+    measure('glob', lambda: glob_scripts(root))
+    measure('cold', lambda: find_scripts(root, index_path=index))
+    measure('warm', lambda: find_scripts(root, index_path=index))
+
+
+if __name__ == '__main__':
+    main()
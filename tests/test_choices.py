@@ -0,0 +1,108 @@
+import pytest
+
+from argser import ArgserException, Choices, Opt, make_parser, parse_args
+
+
+@pytest.fixture()
+def regions(tmp_path):
+    path = tmp_path / 'regions.txt'
+    path.write_text('# regions\nus-east-1\n\neu-west-1\neu-central-1\nap-south-1\nus-west-2\nsa-east-1\n')
+    return str(path)
+
+
+def test_choices():
+    c = Choices(range(10), limit=3)
+    assert 5 in c and 10 not in c
+    assert len(c) == 10
+    assert list(c) == list(range(10))
+    assert c.summary() == '0, 1, 2, ... (10 total)'
+    assert Choices(['b', 'a']).summary() == 'a, b'
+    with pytest.raises(ArgserException):
+        Choices()
+    with pytest.raises(ArgserException):
+        Choices(['a'], path='x.txt')
+
+
+def test_complete():
+    c = Choices([f'{i:05}' for i in range(100000)])
+    assert c.complete('0999') == [f'0999{i}' for i in range(10)]
+    assert c.complete('99999') == ['99999']
+    assert c.complete('x') == []
+    assert len(c.complete('')) == 100000
+
+
+def test_parse():
+    class Args:
+        a: int = Opt(choices=Choices(range(1000), limit=2), default=1)
+        b: str = Opt(choices=Choices(['x', 'y']), default='z')
+
+    args = parse_args(Args, '-a 999')
+    assert args.a == 999 and args.b == 'z'
+    args = parse_args(Args, '-b y')
+    assert args.a == 1 and args.b == 'y'
+
+
+def test_invalid(capsys):
+    class Args:
+        a: int = Opt(choices=Choices(range(1000), limit=2), default=1)
+
+    with pytest.raises(SystemExit):
+        parse_args(Args, '-a 1000')
+    err = capsys.readouterr().err
+    assert "invalid choice: '1000' (choose from 0, 1, ... (1000 total))" in err
+    assert '999' not in err
+
+
+def test_from_file(regions):
+    choices = Choices.from_file(regions, limit=2)
+
+    class Args:
+        region: str = Opt(choices=choices, default='us-east-1', help="AWS region")
+
+    parser, _ = make_parser(Args())
+    assert 'AWS region (one of values from /' in parser.format_help()
+    # default is not validated, so the file isn't read until there is value to check
+    assert parse_args(Args, '').region == 'us-east-1'
+    assert choices._values is None
+
+    assert parse_args(Args, '-r eu-west-1').region == 'eu-west-1'
+    assert len(choices) == 6
+    assert choices.summary() == 'ap-south-1, eu-central-1, ... (6 total)'
+    with pytest.raises(SystemExit):
+        parse_args(Args, '-r regions')
+
+
+def test_from_file_typed(tmp_path, capsys):
+    ids = tmp_path / 'ids.txt'
+    ids.write_text('1\n2\n3\n')
+
+    class Args:
+        shard: int = Opt(choices=Choices.from_file(str(ids)))
+        ratio: float = Opt(choices=Choices.from_file(str(ids)))
+
+    args = parse_args(Args, '--shard 2 -r 3')
+    assert args.shard == 2 and args.ratio == 3.0
+    assert parse_args(Args, '--shard 02').shard == 2
+    with pytest.raises(SystemExit):
+        parse_args(Args, '--shard 4')
+    assert "invalid choice: '4' (choose from 1, 2, 3)" in capsys.readouterr().err
+
+    ids.write_text('1\nx\n')
+
+    class Broken:
+        shard: int = Opt(choices=Choices.from_file(str(ids)))
+
+    with pytest.raises(ArgserException, match='invalid choice in'):
+        parse_args(Broken, '--shard 1')
+
+
+def test_completer(regions):
+    class Args:
+        region: str = Opt(choices=Choices.from_file(regions))
+        other: str = Opt(choices=Choices.from_file(regions), completer=lambda **kwargs: ['x'])
+
+    parser, _ = make_parser(Args())
+    actions = {a.dest.split('__')[-1]: a for a in parser._actions}
+    assert actions['region'].completer(prefix='eu') == ['eu-central-1', 'eu-west-1']
+    assert actions['region'].choices is None
+    assert actions['other'].completer() == ['x']
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from argparse import Namespace
+
+import pytest
+
+from argser import Opt, cached_completer, make_parser
+from argser.completers import CachedCompleter
+
+
+def wait_for(func, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        res = func()
+        if res:
+            return res
+        time.sleep(0.02)
+    raise TimeoutError
+
+
+@pytest.fixture()
+def calls(tmp_path):
+    """Completer that logs calls into file, so calls from forked processes are counted too."""
+    log = tmp_path / 'calls.log'
+    log.touch()
+
+    def completer(prefix, parsed_args=None, **kwargs):
+        with open(log, 'a') as f:
+            f.write(prefix + '\n')
+        db = getattr(parsed_args, 'root__db', None)
+        return [f'{prefix}{db}1', f'{prefix}{db}2']
+
+    completer.count = lambda: len(log.read_text().splitlines())
+    return completer
+
+
+def test_cache(calls, tmp_path):
+    c = cached_completer(calls, timeout=None, args=['db'], cache_dir=str(tmp_path / 'cache'))
+    assert isinstance(c, CachedCompleter)
+    assert c(prefix='a', parsed_args=Namespace(root__db='x')) == ['ax1', 'ax2']
+    assert c(prefix='a', parsed_args=Namespace(root__db='x')) == ['ax1', 'ax2']
+    assert calls.count() == 1
+    # other prefix or argument
+    assert c(prefix='b', parsed_args=Namespace(root__db='x')) == ['bx1', 'bx2']
+    assert c(prefix='a', parsed_args=Namespace(root__db='y', root__other=1)) == ['ay1', 'ay2']
+    assert calls.count() == 3
+    # cache is shared between processes
+    other = cached_completer(calls, timeout=None, args=['db'], cache_dir=str(tmp_path / 'cache'))
+    assert other(prefix='a', parsed_args=Namespace(root__db='x')) == ['ax1', 'ax2']
+    assert calls.count() == 3
+
+
+@pytest.mark.parametrize('fork', [True, False])
+def test_timeout(tmp_path, monkeypatch, fork):
+    if not fork:
+        monkeypatch.delattr(os, 'fork')
+
+    @cached_completer(timeout=0.5, cache_dir=str(tmp_path))
+    def slow(prefix, **kwargs):
+        yield 'a'
+        yield 'b'
+        time.sleep(1)
+        yield 'c'
+
+    start = time.monotonic()
+    assert slow(prefix='') == ['a', 'b']
+    assert time.monotonic() - start < 0.9
+    # completer has finished in background
+    assert wait_for(lambda: slow(prefix='') == ['a', 'b', 'c'])
+
+
+@pytest.mark.parametrize('fork', [True, False])
+def test_fast(tmp_path, monkeypatch, fork):
+    if not fork:
+        monkeypatch.delattr(os, 'fork')
+    c = cached_completer(lambda prefix, **kwargs: {'x': 'help x'}, cache_dir=str(tmp_path))
+    assert c(prefix='') == {'x': 'help x'}
+    assert c.load(c._key('', None))['result'] == {'x': 'help x'}
+
+
+def test_refresh(calls, tmp_path):
+    c = cached_completer(calls, ttl=0, cache_dir=str(tmp_path))
+    key = c._key('p', None)
+    c.save(key, ['old'])
+    # stale completions are returned and refreshed in background
+    assert c(prefix='p') == ['old']
+    assert wait_for(lambda: c.load(key)['result'] == ['pNone1', 'pNone2'])
+    assert wait_for(lambda: not os.path.exists(c._path(key) + '.lock'))
+    assert calls.count() == 1
+
+    # refresh is already in progress
+    c._lock(key)
+    assert c(prefix='p') == ['pNone1', 'pNone2']
+    time.sleep(0.1)
+    assert calls.count() == 1
+
+    # without refresh stale completions are used only if completer is out of time
+    c._unlock(key)
+    c = cached_completer(calls, ttl=0, refresh=False, cache_dir=str(tmp_path))
+    c.save(key, ['old'])
+    assert c(prefix='p') == ['pNone1', 'pNone2']
+
+
+@pytest.mark.parametrize('timeout', [0.5, None])
+def test_locked_by_other(calls, tmp_path, timeout):
+    """Completions that are computed by other process are awaited, its lock is left alone."""
+    c = cached_completer(calls, timeout=timeout, cache_dir=str(tmp_path))
+    key = c._key('p', None)
+    assert c._lock(key)
+
+    def other():
+        time.sleep(0.1)
+        c.save(key, ['other'])
+        c._unlock(key)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    assert c(prefix='p') == ['other']
+    thread.join()
+    assert calls.count() == 0
+
+    # other process is out of time too
+    c = cached_completer(calls, timeout=0.1, cache_dir=str(tmp_path))
+    key = c._key('q', None)
+    assert c._lock(key)
+    assert c(prefix='q') == []
+    assert os.path.exists(c._path(key) + '.lock')
+    assert calls.count() == 0
+
+
+def test_failure(tmp_path):
+    def broken(prefix, **kwargs):
+        yield 'a'
+        raise ValueError
+
+    c = cached_completer(broken, cache_dir=str(tmp_path))
+    assert c(prefix='') == ['a']
+    assert c.load(c._key('', None)) is None
+    with pytest.raises(ValueError):
+        cached_completer(broken, timeout=None, cache_dir=str(tmp_path))(prefix='')
+
+
+def test_opt(calls, tmp_path):
+    completer = cached_completer(calls, cache_dir=str(tmp_path))
+
+    class Args:
+        table: str = Opt(completer=completer)
+
+    parser, _ = make_parser(Args())
+    assert parser._actions[-1].completer is completer
@@ -0,0 +1,164 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from argser import completion
+
+pytest.importorskip('argcomplete')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+import os
+import sys
+from argser import parse_args, sub_command
+
+LOADS = os.environ.get('LOADS_FILE')
+if LOADS:
+    with open(LOADS, 'a') as f:
+        f.write('load\\n')
+
+
+class Sub:
+    value = 1
+
+
+class Args:
+    flag = False
+    name: str = 'x'
+    sub = sub_command(Sub)
+
+
+if __name__ == '__main__':
+    print(parse_args(Args))
+'''
+
+
+@pytest.fixture()
+def script(tmp_path, monkeypatch):
+    path = tmp_path / 'tool.py'
+    path.write_text(SCRIPT)
+    monkeypatch.setenv('LOADS_FILE', str(tmp_path / 'loads.txt'))
+    return str(path)
+
+
+def loads(tmp_path):
+    path = tmp_path / 'loads.txt'
+    return len(path.read_text().splitlines()) if path.exists() else 0
+
+
+def make_request(script, line, **env):
+    env = dict(
+        os.environ,
+        COMP_LINE=line,
+        COMP_POINT=str(len(line)),
+        _ARGCOMPLETE='1',
+        _ARGCOMPLETE_SHELL='fish',
+        _ARGCOMPLETE_SUPPRESS_SPACE='1',
+        **env,
+    )
+    return {'script': script, 'cwd': os.getcwd(), 'env': env}
+
+
+def split(response):
+    assert response['ok'], response
+    return sorted(response['output'].split('\x0b'))
+
+
+def test_complete_request(script, tmp_path):
+    cache = {}
+    res = completion.complete_request(cache, make_request(script, 'tool.py --'))
+    assert split(res) == ['--flag', '--help', '--name', '--no-f', '--no-flag']
+    res = completion.complete_request(cache, make_request(script, 'tool.py s'))
+    assert split(res) == ['sub']
+    res = completion.complete_request(cache, make_request(script, 'tool.py sub --v'))
+    assert split(res) == ['--value']
+    assert loads(tmp_path) == 1
+    assert 'LOADS_FILE' in os.environ and 'COMP_LINE' not in os.environ
+
+    # script was changed
+    st = os.stat(script)
+    os.utime(script, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    completion.complete_request(cache, make_request(script, 'tool.py --'))
+    assert loads(tmp_path) == 2
+
+
+def test_no_parser(tmp_path):
+    path = tmp_path / 'plain.py'
+    path.write_text('print(1)\n')
+    res = completion.complete_request({}, make_request(str(path), 'plain.py '))
+    assert res['ok'] is False
+    res = completion.complete_request({}, make_request(str(tmp_path / 'nope.py'), 'nope.py '))
+    assert res['ok'] is False and 'FileNotFoundError' in res['error']
+
+
+def test_shellcode():
+    code = completion.shellcode(['/bin/foo.py', 'bar baz'])
+    assert "complete -o nospace -o default -o bashdefault -F _argser_complete" in code
+    assert "/bin/foo.py 'bar baz'" in code
+    assert f"{os.path.abspath(completion.__file__)} complete \"$1\"" in code
+
+
+def test_daemon(script, tmp_path):
+    sock = str(tmp_path / 'run' / 'complete.sock')
+    out = tmp_path / 'out.txt'
+    client = [sys.executable, '-S', completion.__file__, 'complete', script]
+    env = make_request(script, 'tool.py --n', _ARGCOMPLETE_STDOUT_FILENAME=str(out))['env']
+    env.update(ARGSER_COMPLETE_SOCKET=sock, PYTHONPATH=ROOT)
+    try:
+        # first request starts the daemon
+        subprocess.run(client, env=env, check=True, timeout=30)
+        assert sorted(out.read_text().split('\x0b')) == ['--name', '--no-f', '--no-flag']
+        assert os.path.exists(sock)
+        env.update(COMP_LINE='tool.py --f', COMP_POINT='11')
+        subprocess.run(client, env=env, check=True, timeout=30)
+        assert out.read_text() == '--flag'
+        assert loads(tmp_path) == 1
+    finally:
+        assert completion.stop(sock)
+    for _ in range(100):
+        if not os.path.exists(sock):
+            break
+        time.sleep(0.05)
+    assert not os.path.exists(sock)
+    assert completion.stop(sock) is False
+
+
+def test_unsafe_dir(tmp_path, monkeypatch):
+    run = tmp_path / 'run'
+    run.mkdir(mode=0o700)
+    link = tmp_path / 'link'
+    link.symlink_to(run)
+    started = []
+    monkeypatch.setattr(completion, '_start_daemon', started.append)
+
+    def check(directory):
+        sock = str(directory / 'complete.sock')
+        with pytest.raises(PermissionError):
+            completion._bind(sock)
+        with pytest.raises(PermissionError):
+            completion._request_or_start(sock, {})
+        assert completion.stop(sock) is False
+        assert not started and not os.path.exists(sock)
+
+    check(link)
+    run.chmod(0o755)
+    check(run)
+    run.chmod(0o700)
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    check(run)
+
+
+def test_cli_daemon(script, capsys):
+    from argser.__main__ import main
+    from unittest import mock
+
+    with mock.patch('sys.argv', ['argser', 'auto', script, '--daemon', '--no-mark']):
+        main()
+    captured = capsys.readouterr()
+    assert '_argser_complete' in captured.out
+    assert script in captured.err
@@ -0,0 +1,91 @@
+import sys
+from unittest import mock
+
+import pytest
+
+from argser import MultiTool, Opt, SubCommands, parse_func
+from argser.dispatch import _tool_name
+
+
+class Args:
+    a = 1
+    b: bool = Opt(default=False)
+
+
+def make_tools():
+    tools = MultiTool(prog='tools')
+    tools.add(Args, name='args')
+    tools.add(Args, name='handled', handler=lambda args: args.a * 2)
+    tools.add('argser.parse_func:import_target', name='imp')
+
+    subs = SubCommands()
+
+    @subs.add
+    def foo(x: int = 0):
+        return x + 1
+
+    tools.add(subs, name='subs')
+
+    @tools.add
+    def func(c: int):
+        return c * 3
+
+    return tools
+
+
+@pytest.mark.parametrize(
+    'executable, name',
+    [('/usr/bin/foo', 'foo'), ('foo.py', 'foo'), ('C:\\foo.exe', 'C:\\foo'), ('foo-script.py', 'foo')],
+)
+def test_tool_name(executable, name):
+    assert _tool_name(executable) == name
+
+
+class TestMultiTool:
+    def test_first_token(self):
+        tools = make_tools()
+        args = tools.run('args -a 5 -b')
+        assert args.a == 5 and args.b is True
+        assert tools.run('handled -a 3') == 6
+        assert tools.run('subs foo -x 2') == 3
+        assert tools.run('func 2') == 6
+        assert tools.run(['imp', 'argser:MultiTool']) is MultiTool
+
+    def test_executable(self):
+        tools = make_tools()
+        assert tools.run('-a 3', prog='/usr/local/bin/handled') == 6
+        assert tools.run('2', prog='func.py') == 6
+        with mock.patch.object(sys, 'argv', ['/bin/subs', 'foo', '-x', '5']):
+            assert tools.run() == 6
+
+    def test_only_chosen_is_built(self, mocker):
+        spy = mocker.spy(parse_func, 'make_args_cls')
+        tools = make_tools()
+        assert tools.run('func 1') == 3
+        assert spy.call_count == 2  # subs.foo on registration + chosen func
+        tools.run('func 1')
+        assert spy.call_count == 2
+        assert list(tools._compiled) == ['func']
+
+    def test_warm(self):
+        tools = make_tools()
+        tools.warm()
+        assert set(tools._compiled) == set(tools.tools)
+        parser, _ = tools._compiled['args'][1]
+        tools.run('args')
+        assert tools._compiled['args'][1][0] is parser
+
+    def test_unknown(self, capsys):
+        tools = make_tools()
+        with pytest.raises(SystemExit):
+            tools.run('nope')
+        assert 'invalid choice' in capsys.readouterr().err
+
+    def test_main(self, capsys):
+        tools = make_tools()
+        with mock.patch.object(sys, 'argv', ['tools', 'imp', 'os.path:sep']):
+            assert tools.main() is None
+        assert capsys.readouterr().out == '/\n'
+        # integer result is exit code
+        with mock.patch.object(sys, 'argv', ['tools', 'func', '2']):
+            assert tools.main() == 6
@@ -0,0 +1,124 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from argser import forkserver
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, 'fork') or not hasattr(forkserver.socket, 'SCM_RIGHTS'),
+    reason="requires fork and file descriptors passing",
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLI = '''
+import os
+from argser import SubCommands
+
+PID = os.getpid()
+subs = SubCommands()
+
+
+@subs.add
+def add(a: int, b: int = 1):
+    return a + b
+
+
+@subs.add
+def read():
+    return input().upper()
+
+
+@subs.add
+def info():
+    import sys
+    print('warm' if 'argser_fork_cli' in sys.modules else 'cold', os.getcwd())
+    print('error', file=sys.stderr)
+    return PID != os.getpid()
+
+
+@subs.add
+def fail():
+    raise ValueError('boom')
+'''
+
+
+@pytest.fixture()
+def server(tmp_path):
+    (tmp_path / 'argser_fork_cli.py').write_text(CLI)
+    sock = str(tmp_path / 'fork.sock')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), ROOT]))
+    cmd = [sys.executable, '-m', 'argser.forkserver', 'serve', 'argser_fork_cli:subs', sock]
+    proc = subprocess.Popen(cmd + ['--preload', 'json'], env=env)
+    for _ in range(100):
+        if os.path.exists(sock):
+            break
+        time.sleep(0.05)
+    yield sock
+    proc.send_signal(signal.SIGINT)
+    proc.wait(5)
+
+
+def call(sock, argv, stdin=b'', cwd=None):
+    in_r, in_w = os.pipe()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    os.write(in_w, stdin)
+    os.close(in_w)
+    try:
+        code = forkserver.run(sock, argv, fds=(in_r, out_w, err_w), cwd=cwd)
+    finally:
+        for fd in (in_r, out_w, err_w):
+            os.close(fd)
+    with os.fdopen(out_r) as out, os.fdopen(err_r) as err:
+        return code, out.read(), err.read()
+
+
+def test_fork_server(server, tmp_path):
+    assert call(server, ['add', '1', '-b', '2']) == (0, '3\n', '')
+    assert call(server, ['read'], stdin=b'foo\n') == (0, 'FOO\n', '')
+    code, out, err = call(server, ['info'], cwd=str(tmp_path))
+    assert code == 0
+    assert out == f'warm {tmp_path}\nTrue\n'
+    assert err == 'error\n'
+
+    code, out, err = call(server, ['add', 'x'])
+    assert code == 2 and "invalid int value: 'x'" in err
+    code, out, err = call(server, ['fail'])
+    assert code == 1 and 'ValueError: boom' in err
+
+
+def test_socket_path(server, tmp_path):
+    from argser import ArgserException
+
+    def add(a: int):
+        return a
+
+    assert os.stat(server).st_mode & 0o077 == 0
+    with pytest.raises(ArgserException, match='already listening'):
+        forkserver.serve(add, server)
+    assert call(server, ['add', '1']) == (0, '2\n', '')
+
+    other = tmp_path / 'other'
+    other.write_text('data')
+    with pytest.raises(ArgserException, match="isn't a socket"):
+        forkserver.serve(add, str(other))
+    assert other.read_text() == 'data'
+
+
+def test_silent_client(tmp_path, monkeypatch):
+    from argser.utils import bind_unix_socket
+
+    monkeypatch.setattr(forkserver, 'REQUEST_TIMEOUT', 0.1)
+    with forkserver.socket.socket(forkserver.socket.AF_UNIX) as server:
+        bind_unix_socket(server, str(tmp_path / 'fork.sock'))
+        server.listen(1)
+        with forkserver.socket.socket(forkserver.socket.AF_UNIX) as client:
+            client.connect(str(tmp_path / 'fork.sock'))
+            start = time.monotonic()
+            forkserver._accept(server, run=None)  # gives up on client that sends nothing
+            assert time.monotonic() - start < 2
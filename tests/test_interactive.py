@@ -0,0 +1,103 @@
+import pytest
+
+import argser
+from argser import Opt, SubCommands, sub_command
+from argser.interactive import complete
+
+
+def run_lines(target, lines, **kwargs):
+    lines = iter(lines)
+    output = []
+
+    def input_fn(prompt):
+        try:
+            return next(lines)
+        except StopIteration:
+            raise EOFError
+
+    argser.repl(target, input_fn=input_fn, print_fn=output.append, **kwargs)
+    return output
+
+
+def make_subs():
+    subs = SubCommands()
+
+    @subs.add
+    def add(a: int, b: int = 1):
+        return a + b
+
+    @subs.add
+    def fail():
+        raise ValueError('fail')
+
+    return subs
+
+
+class TestRepl:
+    def test_sub_commands(self, mocker, capsys):
+        from argser import parse_func
+
+        subs = make_subs()
+        spy = mocker.spy(parse_func, 'make_parser')
+        output = run_lines(subs, ['add 1', '', 'add x', 'fail', 'add 2 -b 3', 'exit', 'add 5'])
+        assert output == [2, 5]
+        assert spy.call_count == 1
+        err = capsys.readouterr().err
+        assert "invalid int value: 'x'" in err
+        assert 'ValueError: fail' in err
+
+    def test_args(self):
+        class Args:
+            a = 1
+            b: bool = Opt(default=False)
+
+        output = run_lines(Args, ['-a 2', '-b'], handler=lambda args: (args.a, args.b))
+        assert output == [(2, False), (1, True)]
+        output = run_lines(Args, ['-a 3'])
+        assert output[0].a == 3
+
+    def test_help_and_quotes(self, capsys):
+        output = run_lines(make_subs(), ['-h', 'add "1', 'add 1'])
+        assert output == [2]
+        captured = capsys.readouterr()
+        assert 'usage:' in captured.out
+        assert 'No closing quotation' in captured.err
+
+    def test_timing(self):
+        output = run_lines(make_subs(), ['add 1'], timing=True)
+        assert output[0] == 2
+        assert output[1].startswith('[') and output[1].endswith(' ms]')
+
+
+@pytest.mark.parametrize(
+    'line, text, expected',
+    [
+        ('', '--', ['--flag', '--help', '--no-f', '--no-flag']),
+        ('', '', ['--flag', '--help', '--no-f', '--no-flag', '-f', '-h', 'bar', 'baz', 'foo']),
+        ('', 'f', ['foo']),
+        ('--flag ', 'b', ['bar', 'baz']),
+        ('foo ', '-', ['--help', '-a', '-h']),
+        ('bar ', '--v', ['--value']),
+        ('bar "unclosed ', '--v', ['--value']),
+        ('fo ', '-', ['--help', '-a', '-h']),
+        ('ba ', '-', ['--flag', '--help', '--no-f', '--no-flag', '-f', '-h']),  # ambiguous
+    ],
+)
+def test_complete(line, text, expected):
+    class Foo:
+        a = 1
+
+    class Bar:
+        value = 2
+
+    class Baz:
+        pass
+
+    class Args:
+        flag = False
+        foo = sub_command(Foo)
+        bar = sub_command(Bar)
+        baz = sub_command(Baz)
+
+    parser, _ = argser.make_parser(Args())
+    assert complete(parser, line, text) == expected
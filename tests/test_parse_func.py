@@ -1,7 +1,11 @@
+import asyncio
+import sys
 from typing import List
 
+import pytest
+
 import argser
-from argser.parse_func import SubCommands
+from argser.parse_func import SubCommands, run_coroutine
 
 
 def test_simple_case():
@@ -70,3 +74,490 @@ def test_alternative_sub_cmd_name():
         return a + 1
 
     assert sub.parse('foo -a 2') == 3
+
+
+class TestCompiledCache:
+    def test_cached(self, mocker):
+        from argser import parse_func
+
+        spy = mocker.spy(parse_func, 'make_args_cls')
+
+        def foo(a, b=1):
+            return [a, b]
+
+        assert argser.call(foo, '1') == ['1', 1]
+        assert argser.call(foo, '2 -b 3') == ['2', 3]
+        assert spy.call_count == 1
+        assert parse_func.compile_func(foo, parser_prog='foo') == parse_func.compile_func(
+            foo, parser_prog='foo'
+        )
+
+        # different parser params - same class, different parser
+        assert argser.call(foo, '2 -b 3', bool_flag=False) == ['2', 3]
+        assert spy.call_count == 1
+
+    def test_invalidation(self):
+        from argser import parse_func
+
+        def foo(a=1):
+            return a
+
+        args_cls, _ = parse_func.compile_func(foo)
+        foo.__defaults__ = (2,)
+        assert argser.call(foo, '') == 2
+        assert parse_func.compile_func(foo)[0] is not args_cls
+
+    def test_weak_reference(self):
+        import gc
+        import weakref
+        from argser import parse_func
+
+        def foo(a=1):
+            return a
+
+        argser.call(foo, '')
+        assert foo in parse_func._compiled
+        ref = weakref.ref(foo)
+        del foo
+        gc.collect()
+        assert ref() is None  # cache doesn't keep function alive
+
+    def test_unhashable_params(self):
+        def foo(a=1):
+            return a
+
+        assert argser.call(foo, '-a 5', parser_kwargs={'description': 'foo'}) == 5
+
+
+class TestSubCommandsDispatcher:
+    def make_subs(self):
+        subs = SubCommands()
+
+        @subs.add
+        def foo(a, b: int = 1):
+            return [a, b]
+
+        @subs.add
+        def bar(x=1.5):
+            return x
+
+        return subs
+
+    def test_compiled_once(self, mocker):
+        from argser import parse_func
+
+        subs = self.make_subs()
+        spy = mocker.spy(parse_func, 'make_parser')
+        assert subs.parse('foo 1') == ['1', 1]
+        assert subs.parse('foo 2 -b 3') == ['2', 3]
+        assert subs.parse('bar -x 2') == 2.0
+        assert subs.parse('') is None
+        assert spy.call_count == 1
+
+        # different parser params
+        assert subs.parse('bar -x 2', bool_flag=False) == 2.0
+        assert spy.call_count == 2
+
+    def test_added_after_compilation(self, mocker, capsys):
+        from argser import parse_func
+
+        subs = self.make_subs()
+        assert subs.parse('bar') == 1.5
+        spy = mocker.spy(parse_func, 'make_parser')
+
+        @subs.add(name='baz')
+        def func(c: List[int] = None, flag=False):
+            return c, flag
+
+        assert subs.parse('baz -c 1 2 --flag') == ([1, 2], True)
+        assert subs.parse('baz') == (None, False)
+        assert subs.parse('foo 1') == ['1', 1]
+        assert spy.call_count == 0
+
+        with pytest.raises(SystemExit):
+            subs.parse('-h')
+        assert 'baz' in capsys.readouterr().out
+
+    def test_replaced(self, mocker, capsys):
+        from argser import parse_func
+
+        subs = self.make_subs()
+        assert subs.parse('bar') == 1.5
+        spy = mocker.spy(parse_func, 'make_parser')
+
+        @subs.add(name='bar', help='new bar')
+        def new_bar(y=2):
+            return y
+
+        assert subs.parse('bar -y 3') == 3
+        assert subs.parse('bar', slots=True) == 2
+        assert subs.parse('foo 1') == ['1', 1]
+        with pytest.raises(SystemExit):
+            subs.parse('bar -x 1')
+        assert spy.call_count == 0
+
+        with pytest.raises(SystemExit):
+            subs.parse('-h')
+        out = capsys.readouterr().out
+        assert '{foo,bar}' in out and 'new bar' in out
+
+
+class TestLazySubCommands:
+    @pytest.fixture()
+    def module(self, tmp_path, monkeypatch):
+        name = 'argser_lazy_commands'
+        (tmp_path / f'{name}.py').write_text(
+            'def train(epochs: int = 1, name="model"):\n'
+            '    """\n'
+            '    Train model.\n\n'
+            '    :param epochs: number of epochs\n'
+            '    """\n'
+            '    return epochs, name\n'
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        yield name
+        sys.modules.pop(name, None)
+
+    def make_subs(self, module):
+        subs = SubCommands()
+
+        @subs.add
+        def foo(a=1):
+            return a
+
+        subs.add_lazy('train', f'{module}:train', help='train model')
+        return subs
+
+    def test_import_count(self, module, mocker, capsys):
+        from argser import parse_func
+
+        spy = mocker.spy(parse_func.importlib, 'import_module')
+        subs = self.make_subs(module)
+        assert subs.parse('foo -a 2') == 2
+        with pytest.raises(SystemExit):
+            subs.parse('-h')
+        assert 'train model' in capsys.readouterr().out
+        assert module not in sys.modules
+        assert spy.call_count == 0
+
+        assert subs.parse('train --epochs 3') == (3, 'model')
+        assert subs.parse('train -n foo') == (1, 'foo')
+        assert subs.parse('foo') == 1
+        assert spy.call_count == 1
+        assert module in sys.modules
+
+    def test_resolved_after_compilation(self, module, mocker):
+        from argser import parse_func
+
+        subs = self.make_subs(module)
+        assert subs.parse('foo') == 1
+        spy = mocker.spy(parse_func, 'make_parser')
+        assert subs.parse('train --epochs 3') == (3, 'model')
+        assert subs.parse('foo -a 2') == 2
+        assert spy.call_count == 0
+
+    def test_help_of_selected(self, module, capsys):
+        subs = self.make_subs(module)
+        with pytest.raises(SystemExit):
+            subs.parse('train -h')
+        assert 'number of epochs' in capsys.readouterr().out
+
+    def test_not_found_in_command_line(self, module):
+        subs = self.make_subs(module)
+        # emulate command line that was not recognized before parsing
+        subs._find_command = lambda args: None
+        assert subs.parse(['train']) == (1, 'model')
+
+    @pytest.mark.parametrize('preload', [False, True])
+    @pytest.mark.parametrize('name', ['t', 'tra', 'train'])
+    def test_alias_and_prefix(self, module, preload, name):
+        subs = SubCommands(preload=preload)
+
+        @subs.add
+        def foo(a=1):
+            return a
+
+        subs.add_lazy('train', f'{module}:train', aliases=['t'])
+        assert subs.parse(f'{name} --epochs 3') == (3, 'model')
+        assert subs.parse('t') == (1, 'model')
+        assert subs.parse('f -a 2') == 2
+
+    def test_invalid_path(self):
+        subs = SubCommands()
+        subs.add_lazy('foo', 'foo')
+        with pytest.raises(argser.ArgserException):
+            subs.parse('foo')
+
+
+class TestPreload:
+    @pytest.fixture()
+    def modules(self, tmp_path, monkeypatch):
+        # import of commands module is blocked until the parser is compiled
+        (tmp_path / 'argser_preload_gate.py').write_text(
+            'import threading\nevent = threading.Event()\n'
+        )
+        (tmp_path / 'argser_preload_commands.py').write_text(
+            'import argser_preload_gate\n'
+            'OVERLAPPED = argser_preload_gate.event.wait(5)\n'
+            'def train(epochs: int = 1):\n'
+            '    return epochs\n'
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        yield
+        sys.modules.pop('argser_preload_gate', None)
+        sys.modules.pop('argser_preload_commands', None)
+
+    def test_import_overlaps_compilation(self, modules, monkeypatch):
+        from argser import parse_func
+        import argser_preload_gate
+
+        make_parser = parse_func.make_parser
+
+        def fake_make_parser(*args, **kwargs):
+            argser_preload_gate.event.set()
+            return make_parser(*args, **kwargs)
+
+        monkeypatch.setattr(parse_func, 'make_parser', fake_make_parser)
+        timings = []
+        subs = SubCommands(preload=True, timing=lambda *a: timings.append(a))
+
+        @subs.add
+        def foo(a=1):
+            return a
+
+        subs.add_lazy('train', 'argser_preload_commands:train')
+        assert subs.parse('train --epochs 2') == 2
+        assert sys.modules['argser_preload_commands'].OVERLAPPED
+        assert len(timings) == 1
+        name, imported, waited = timings[0]
+        assert name == 'train'
+        assert imported >= waited >= 0
+
+        assert subs.parse('train') == 1
+        assert subs.parse('foo -a 3') == 3
+        assert len(timings) == 1
+
+    def test_after_compilation(self, modules, mocker):
+        from argser import parse_func
+        import argser_preload_gate
+
+        argser_preload_gate.event.set()
+        timings = []
+        subs = SubCommands(preload=True, timing=lambda *a: timings.append(a))
+
+        @subs.add
+        def foo(a=1):
+            return a
+
+        subs.add_lazy('train', 'argser_preload_commands:train')
+        assert subs.parse('foo') == 1
+        spy = mocker.spy(parse_func, 'make_parser')
+        assert subs.parse('train --epochs 2') == 2
+        assert [name for name, *_ in timings] == ['train']
+        assert spy.call_count == 0
+
+    def test_only_lazy(self, modules):
+        import argser_preload_gate
+
+        argser_preload_gate.event.set()
+        subs = SubCommands(preload=True)
+        subs.add_lazy('train', 'argser_preload_commands:train')
+        assert subs.parse('train --epochs 2') == 2
+
+    def test_error(self):
+        subs = SubCommands(preload=True)
+        subs.add_lazy('train', 'argser_missing_module:train')
+        with pytest.raises(ImportError):
+            subs.parse('train')
+
+
+class TestModuleCli:
+    @pytest.fixture()
+    def module(self, tmp_path, monkeypatch):
+        name = 'argser_module_cli'
+        (tmp_path / f'{name}.py').write_text(
+            'from os.path import join\n\n'
+            'def add(a: int, b: int = 1):\n'
+            '    """Add numbers."""\n'
+            '    return a + b\n\n'
+            'def mul(a: int, b: int = 2):\n'
+            '    return a * b\n\n'
+            'def _private():\n'
+            '    pass\n\n'
+            'CONST = 1\n'
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        yield name
+        sys.modules.pop(name, None)
+
+    def test_lazy_introspection(self, module, mocker, capsys):
+        from argser import parse_func
+
+        spy = mocker.spy(parse_func, 'make_args_cls')
+        cli = argser.module_cli(module)
+        assert list(cli.commands) == ['add', 'mul']
+        with pytest.raises(SystemExit):
+            cli.parse('-h')
+        assert 'Add numbers.' in capsys.readouterr().out
+        assert spy.call_count == 0
+
+        assert cli.parse('add 2 -b 3') == 5
+        assert spy.call_count == 1
+        assert cli.parse('mul 2') == 4
+        assert spy.call_count == 2
+
+    def test_prefix(self, module):
+        cli = argser.module_cli(module)
+        assert cli.parse('ad 2 -b 3') == 5
+        assert cli.parse('mu 2') == 4
+
+    def test_all(self, module):
+        mod = __import__(module)
+        mod.__all__ = ['mul', 'join']
+        cli = argser.module_cli(mod)
+        assert list(cli.commands) == ['mul']
+
+
+class TestAsync:
+    def make_subs(self):
+        subs = SubCommands()
+
+        @subs.add
+        async def sleep(t: float = 0, name='x'):
+            await asyncio.sleep(t)
+            return name
+
+        @subs.add
+        async def fail():
+            raise ValueError('fail')
+
+        @subs.add
+        def sync(a: int = 1):
+            return a
+
+        return subs
+
+    def test_call(self):
+        async def foo(a: int, b=2):
+            await asyncio.sleep(0)
+            return a * b
+
+        assert argser.call(foo, '3') == 6
+        assert run_coroutine(argser.call_async(foo, '3 -b 3')) == 9
+
+        def bar(a: int):
+            return a
+
+        assert run_coroutine(argser.call_async(bar, '3')) == 3
+
+    def test_parse(self):
+        subs = self.make_subs()
+        assert subs.parse('sleep -n foo') == 'foo'
+        assert subs.parse('sync -a 2') == 2
+        assert run_coroutine(subs.parse_async('sleep -n foo')) == 'foo'
+        assert run_coroutine(subs.parse_async('sync')) == 1
+
+    def test_parse_many(self):
+        subs = self.make_subs()
+        lines = ['sleep -t 0.02 -n a', 'fail', 'sync -a 5', 'sleep -n b', 'sync -a x']
+        res = run_coroutine(subs.parse_many_async(lines, concurrency=2))
+        assert res[0] == 'a'
+        assert isinstance(res[1], ValueError)
+        assert res[2] == 5
+        assert res[3] == 'b'
+        assert isinstance(res[4], SystemExit)
+
+    def test_concurrency(self):
+        subs = SubCommands()
+        running = []
+        peak = []
+
+        @subs.add
+        async def job():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        run_coroutine(subs.parse_many_async(['job'] * 10, concurrency=3))
+        assert max(peak) == 3
+
+
+def multiply(a: int, b: int = 2):
+    return a * b
+
+
+async def multiply_async(a: int, b: int = 2):
+    return a * b
+
+
+class TestCallMany:
+    def test_ordered(self):
+        lines = (f'{i} -b 3' for i in range(20))
+        res = argser.call_many(multiply, lines, workers=2, chunksize=3)
+        assert list(res) == [i * 3 for i in range(20)]
+
+    def test_unordered(self):
+        lines = [[str(i)] for i in range(20)]
+        res = argser.call_many(multiply_async, lines, workers=2, ordered=False)
+        assert sorted(res) == [i * 2 for i in range(20)]
+
+    def test_invalid_arguments(self):
+        with pytest.raises(argser.ArgserException):
+            list(argser.call_many(multiply, ['1', 'x'], workers=1))
+
+
+class TestBind:
+    def test_positional(self, caplog):
+        from argser.parse_func import _binders
+
+        class Args:
+            c = 3
+            b = 2
+            a = 1
+
+        def foo(a, b, *args, c=0, **kwargs):
+            assert not args and not kwargs
+            return a, b, c
+
+        caplog.set_level(argser.logging.VERBOSE)
+        binder = argser.bind(foo, Args)
+        assert 'func(h.a, h.b, **{\'c\': h.c})' in caplog.text
+        assert binder(argser.parse_args(Args, '-a 5')) == (5, 2, 3)
+        assert argser.bind(foo, Args()).func is binder.func  # cached
+        assert len(_binders[foo][1]) == 1
+
+    def test_gaps(self):
+        def foo(a, x=0, b=1):
+            return a, x, b
+
+        binder = argser.bind(foo, ['b', 'a'])
+        holder = argser.make_args_cls(foo)()
+        holder.a, holder.b = 1, 2
+        assert binder(holder) == (1, 0, 2)
+
+    def test_result_class(self):
+        class Args:
+            a = 1
+            b = 'x'
+
+        def foo(b, a):
+            return b, a
+
+        args = argser.parse_args(Args, '-b y', slots=True)
+        assert argser.bind(foo, args.__class__)(args) == ('y', 1)
+
+    def test_invalidation(self):
+        def foo(a, b):
+            return a, b
+
+        binder = argser.bind(foo, ['a', 'b'])
+        foo.__code__ = (lambda b, a: (a, b)).__code__
+        assert argser.bind(foo, ['a', 'b']).func is not binder.func
+
+    def test_builtin(self):
+        class Args:
+            a = 1
+
+        assert argser.bind(dict, Args)(argser.parse_args(Args, '')) == {'a': 1}
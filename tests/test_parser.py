@@ -1,5 +1,6 @@
+import argparse
 import shlex
-from argparse import Action, ArgumentParser, Namespace
+from argparse import SUPPRESS, Action, ArgumentParser, Namespace
 from typing import Callable, List
 
 import pytest
@@ -10,6 +11,7 @@ from argser.exceptions import ArgserException
 from argser.parser import (
     _make_shortcuts_sub_wise as make_shortcuts,
     _read_args as read_args,
+    add_sub_command,
 )
 from argser.utils import args_to_dict
 
@@ -87,8 +89,8 @@ def test_complex_args(args, a, bb, ccc_ddd, e):
 
 
 class TestNargs:
-    @pytest.fixture()
-    def args_cls(self):
+    @staticmethod
+    def make_args():
         class Args:
             a: str = Opt()
             # b = Opt(nargs=0)  # can't be used with default action
@@ -100,6 +102,10 @@ class TestNargs:
 
         return Args
 
+    @pytest.fixture()
+    def args_cls(self):
+        return self.make_args()
+
     @pytest.mark.parametrize("args", ['', '-f 1', '-g 1 -c 1 2', '-g 1 -d 1 2 3 4'])
     def test_error(self, args_cls, args):
         with pytest.raises(SystemExit):
@@ -832,3 +838,442 @@ class TestInstanceOfArgs:
 
         args = parse_args(Args, '-a 38')
         assert args.a == 42
+
+
+class TestHolderNamespace:
+    def test_keep_namespace(self):
+        class Args:
+            a = 1
+
+        args = parse_args(Args, '-a 2')
+        assert args.__namespace__.root__a == 2
+        assert 'root__a' not in vars(args.__namespace__)  # stored only in holder
+
+        args = parse_args(Args, '-a 2', keep_namespace=False)
+        assert args.a == 2
+        assert not hasattr(args, '__namespace__')
+
+    def test_reparse_instance(self):
+        class Args:
+            a = 1
+            b: List[int] = Opt(action='append', default=[])
+
+        args = Args()
+        parse_args(args, '-a 2 -b 1')
+        assert args.a == 2 and args.b == [1]
+        parse_args(args, '-b 2')
+        assert args.a == 1 and args.b == [2]
+
+    def test_reparse_sub_commands(self):
+        class Args:
+            class Sub1:
+                a = 1
+
+                class Sub11:
+                    b = 2
+
+                sub11 = sub_command(Sub11)
+
+            sub1 = sub_command(Sub1)
+
+            class Sub2:
+                c = 3
+
+            sub2 = sub_command(Sub2)
+
+        args = Args()
+        parse_args(args, 'sub1 -a 5 sub11 -b 6')
+        assert args.sub1.a == 5 and args.sub1.sub11.b == 6 and args.sub2 is None
+        parse_args(args, 'sub1')
+        assert args.sub1.a == 1 and args.sub1.sub11 is None and args.sub2 is None
+        parse_args(args, 'sub2 -c 7')
+        assert args.sub1 is None and args.sub2.c == 7
+
+    def test_suppressed(self):
+        class Args:
+            a = Opt(default=SUPPRESS)
+            b = 1
+
+        args = parse_args(Args, '')
+        assert args.a is None
+        args = parse_args(Args, '-a foo')
+        assert args.a == 'foo'
+
+
+class TestSlots:
+    @pytest.fixture()
+    def args_cls(self):
+        class Args:
+            a = 1
+            b: List[int] = []
+            v = Opt(action='version', version='0')
+
+            class Sub:
+                c = 'foo'
+
+                class Sub2:
+                    d = 2.2
+
+                sub2 = sub_command(Sub2)
+
+            sub = sub_command(Sub)
+
+        return Args
+
+    def test_values(self, args_cls):
+        args = parse_args(args_cls, '', slots=True)
+        assert not hasattr(args, '__dict__')
+        assert args.to_dict() == {'a': 1, 'b': [], 'v': None, 'sub': None}
+        assert args.to_tuple() == (1, [], None, None)
+
+        args = parse_args(args_cls, '-b 3 4 -a 2 sub -c bar sub2 -d 5', slots=True)
+        assert args.to_tuple()[:3] == (2, [3, 4], None)
+        assert args.sub.to_dict() == {'c': 'bar', 'sub2': args.sub.sub2}
+        assert args.sub.sub2.d == 5.0
+        assert args_to_dict(args.sub.sub2) == {'d': 5.0}
+        assert not hasattr(args, '__namespace__')
+
+    def test_fresh_sub_results(self, args_cls):
+        args1 = parse_args(args_cls, 'sub -c 1', slots=True)
+        args2 = parse_args(args_cls, 'sub -c 2', slots=True)
+        assert args1.sub is not args2.sub
+        assert args1.sub.c == '1' and args2.sub.c == '2'
+
+    def test_display(self, args_cls):
+        args = parse_args(args_cls, 'sub', slots=True)
+        assert str(args) == "Args(a=1, b=[], v=-, sub=Sub(c='foo', sub2=-))"
+
+    def test_with_args(self):
+        class Args:
+            b = 10
+
+        def func(a, b=1, c=2):
+            return a + b + c
+
+        args = parse_args(Args, '-b 5', slots=True)
+        assert argser.with_args(func, args, 1) == 8
+
+    def test_invalid_field(self):
+        from argser.spec import make_result_cls
+
+        with pytest.raises(ArgserException):
+            make_result_cls('Args', ['class'])
+
+    @pytest.mark.parametrize('kind', ['slots', 'sparse'])
+    def test_self_field(self, kind):
+        class Args:
+            self = 1
+            b = 2
+
+        args = parse_args(Args, '--self 3', **{kind: True})
+        assert args.to_dict() == {'self': 3, 'b': 2}
+        assert args.to_tuple() == (3, 2)
+
+    @pytest.mark.parametrize('kind', ['slots', 'sparse'])
+    @pytest.mark.parametrize('name', ['to_dict', 'to_tuple'])
+    def test_method_field(self, kind, name):
+        args_cls = type('Args', (), {name: 1})
+        with pytest.raises(ArgserException, match="it's a method of the result"):
+            parse_args(args_cls, '', **{kind: True})
+        assert getattr(parse_args(args_cls, ''), name) == 1
+
+
+class TestSparse:
+    @pytest.fixture()
+    def args_cls(self):
+        class Args:
+            a = 1
+            b: List[int] = []
+            c: List[int] = Opt(action='append', default=[])
+            d: bool = True
+
+            class Sub:
+                e = 'foo'
+                f = 2
+
+            sub = sub_command(Sub)
+
+        return Args
+
+    def test_only_overrides_stored(self, args_cls):
+        args = parse_args(args_cls, '', sparse=True)
+        assert vars(args) == {}
+        assert args_to_dict(args) == {'a': 1, 'b': [], 'c': [], 'd': True, 'sub': None}
+
+        args = parse_args(args_cls, '-a 2 -c 1 -c 2 --no-d sub -f 3', sparse=True)
+        assert set(vars(args)) == {'a', 'c', 'd', 'sub'}
+        assert vars(args.sub) == {'f': 3}
+        assert args.to_tuple()[:4] == (2, [], [1, 2], False)
+        assert args.sub.to_dict() == {'e': 'foo', 'f': 3}
+
+    def test_shared_defaults(self, args_cls):
+        parser, spec = argser.make_parser(args_cls())
+        args1 = argser.populate_holder(spec.make_result(sparse=True), parser, spec, '-c 1')
+        args2 = argser.populate_holder(spec.make_result(sparse=True), parser, spec, '')
+        assert vars(args1) == {'c': [1]}
+        assert vars(args2) == {}
+        assert args1.b is args2.b
+        assert args1.__class__ is args2.__class__
+
+    def test_with_slots(self, args_cls):
+        with pytest.raises(ArgserException):
+            parse_args(args_cls, '', sparse=True, slots=True)
+
+
+class TestToArgv:
+    @staticmethod
+    def make_simple():
+        class Args:
+            a: int
+            bb = 'foo'
+            ccc_ddd = [1.1, 2.2]
+            e: List[bool] = []
+
+        return Args
+
+    @staticmethod
+    def make_nested():
+        class Args:
+            a = 1
+            b: bool
+            c = Arg()
+
+            class Sub:
+                a = 3
+                d: int = Arg()
+
+                class Sub2:
+                    a = -1
+                    b = Opt(default='x')
+
+                sub = sub_command(Sub2)
+
+            sub = sub_command(Sub)
+
+            class Other:
+                e = 'e'
+
+            other = sub_command(Other)
+
+        return Args
+
+    make_nargs = staticmethod(TestNargs.make_args)
+
+    @staticmethod
+    def make_actions():
+        class Args:
+            a = Opt(action='store_const', default='42', const=42)
+            b = Opt(action='store_true', default=1)
+            c = Opt(action='store_false')
+            d: List[int] = Opt(action='append', default=[])
+            verbose: int = Opt(action='count', default=0)
+            version: str = Opt('V', action='version', version='%(prog)s 0.0.1')
+            f: bool = Opt(bool_flag=False)
+            g = Opt('gg', 'G', default='')
+
+        return Args
+
+    @pytest.mark.parametrize(
+        "make_args, args",
+        [
+            (make_simple, ''),
+            (make_simple, '-a 2 --bb "foo bar" --ccc-ddd 3.3 4.4 -e 1 0'),
+            (make_simple, '--bb=-x --ccc-ddd -1 -e'),
+            (make_nested, 'foo'),
+            (make_nested, '-a 5 -b foo sub 1'),
+            (make_nested, '--no-b "foo bar" sub -a 7 3 sub -a -5 -b y'),
+            (make_nested, 'foo other -e "e e"'),
+            (make_nargs, '-a 1 -c 2 -d 3 4 5 -e 6 -f -g 9 10'),
+            (make_nargs, '-f 1 2 -g 3'),
+            (make_nargs, '-f -1 -2.5 -g 3 -d 1 -1 .5'),
+            (make_actions, ''),
+            (make_actions, '-a -b -c -d 1 -d 2 -vvv -f false --gg=-g'),
+            (make_actions, '-f 1 -G ""'),
+        ],
+    )
+    @pytest.mark.parametrize("only_changed", [True, False])
+    def test_round_trip(self, make_args, args, only_changed):
+        def plain(res):
+            return {
+                k: plain(v) if hasattr(v, '__sub_command') else v for k, v in args_to_dict(res).items()
+            }
+
+        Args = make_args.__func__()
+        res = parse_args(Args, args)
+        argv = argser.to_argv(res, only_changed=only_changed)
+        assert plain(parse_args(Args, argv)) == plain(res)
+
+    def test_minimal(self):
+        Args = self.make_nested()
+        res = parse_args(Args, '-a 1 foo sub 2 sub -a -1')
+        assert argser.to_argv(res) == ['foo', 'sub', '2', 'sub']
+
+    def test_unrepresentable(self):
+        class Args:
+            a = 1
+            b = Opt(action='count', default=2)
+
+        res = parse_args(Args, '', slots=True)
+        res.a = None
+        with pytest.raises(ArgserException):
+            argser.to_argv(res)
+        res.a, res.b = 1, 0
+        with pytest.raises(ArgserException):
+            argser.to_argv(res)
+
+    @pytest.mark.parametrize('field, value', [('cc', ['-x', 'y']), ('cc', ['--']), ('p', '-p')])
+    def test_looks_like_option(self, field, value):
+        class Args:
+            cc: List[str] = []
+            p: str = Arg()
+            d: List[str] = Opt(action='append', default=[])
+
+        res = parse_args(Args, 'p', slots=True)
+        setattr(res, field, value)
+        with pytest.raises(ArgserException, match="can't be represented"):
+            argser.to_argv(res)
+        # values of options can be joined with them
+        res = parse_args(Args, 'p -d=-x -d y', slots=True)
+        assert argser.to_argv(res) == ['-d=-x', '-d', 'y', 'p']
+
+
+def make_sub():
+    return type('Sub', (), {'a': 1})
+
+
+def test_sub_command_aliases():
+    class Args:
+        sub = sub_command(make_sub(), aliases=['s', 'sb'])
+        other = sub_command(make_sub())
+
+    for line in ('sub -a 2', 's -a 2', 'sb -a 2', 'su -a 2'):
+        args = parse_args(Args, line)
+        assert args.sub.a == 2 and args.other is None
+        assert argser.to_argv(args) == ['sub', '-a', '2']
+
+    parser, _ = argser.make_parser(Args())
+    choices = parser._actions[-1].choices
+    assert choices['s'] is choices['sub'] is choices['sb']
+
+    class Conflict:
+        sub = sub_command(make_sub(), aliases=['s'])
+        s = sub_command(make_sub())
+
+    with pytest.raises(argparse.ArgumentError):
+        argser.make_parser(Conflict())
+
+
+def test_sub_command_prefixes(capsys):
+    class Args:
+        start = sub_command(make_sub())
+        status = sub_command(make_sub(), aliases=['info'])
+        stop = sub_command(make_sub())
+
+    assert parse_args(Args, 'stat -a 2').status.a == 2
+    assert parse_args(Args, 'inf -a 2').status.a == 2
+    assert parse_args(Args, 'sto').stop.a == 1
+    with pytest.raises(SystemExit):
+        parse_args(Args, 'sta -a 2')
+    assert "ambiguous sub-command 'sta' could match start, status" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_args(Args, 'x')
+    assert "invalid choice: 'x'" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_args(Args, 'stat', parser_allow_abbrev=False)
+
+
+def test_many_sub_commands(mocker):
+    """Parsers of sub-commands are made only when they are chosen."""
+    n = 5000
+
+    namespace = {f'cmd{i}': sub_command(make_sub(), aliases=[f'c{i}']) for i in range(n)}
+    Args = type('Args', (), namespace)
+    parser, _ = argser.make_parser(Args())
+    choices = parser._actions[-1].choices
+    assert len(choices) == 2 * n
+    assert not any(dict.values(choices))
+
+    assert choices['c4998'] is choices['cmd4998']
+    assert len([p for p in dict.values(choices) if p is not None]) == 2
+
+    spy = mocker.spy(argser.parser, '_make_parser')
+    args = parse_args(Args, 'cmd4999 -a 2')
+    assert args.cmd4999.a == 2 and args.cmd0 is None
+    # exact name wins over longer names with the same prefix
+    assert parse_args(Args, 'cmd499 -a 3').cmd499.a == 3
+    assert parse_args(Args, 'c4998 -a 4').cmd4998.a == 4
+    assert spy.call_count == 6  # root and chosen sub-command
+    assert choices.matches('cmd499') == ['cmd499']
+    assert choices.matches('cmd49') == ['cmd49']
+    assert len(choices.matches('cm')) == n
+
+
+def test_replace_sub_command():
+    class Args:
+        first = sub_command(make_sub(), aliases=['f'], help='old')
+        second = sub_command(make_sub())
+
+    parser, spec = argser.make_parser(Args())
+    Deep = type('Deep', (), {'c': 3})
+    Args.first = sub_command(type('New', (), {'b': 2, 'deep': sub_command(Deep)}), aliases=['n'])
+    with pytest.raises(ArgserException, match='already exists'):
+        add_sub_command(parser, spec, 'first', Args.first)
+    add_sub_command(parser, spec, 'first', Args.first, replace=True)
+    assert len(spec.nodes) == 4  # node of the replaced sub-command is reused
+
+    compiled = parser, spec
+    args = parse_args(Args, 'n -b 5 deep -c 4', compiled=compiled, slots=True)
+    assert (args.first.b, args.first.deep.c, args.second) == (5, 4, None)
+    assert argser.from_bytes(argser.to_bytes(args)) == args
+    assert parse_args(Args, 'second -a 2', compiled=compiled).second.a == 2
+    choices = parser._actions[-1].choices
+    assert list(choices) == ['first', 'second', 'n'] and 'f' not in choices.names
+    assert 'old' not in parser.format_help()
+    with pytest.raises(SystemExit):
+        parse_args(Args, 'first -a 1', compiled=compiled)
+
+
+def test_sub_commands_registration_is_linear():
+    """Registration time of sub-commands grows linearly with their number."""
+    import timeit
+
+    from argser.parser import SubCommandsAction
+
+    def register(n):
+        action = SubCommandsAction([], prog='prog', parser_class=ArgumentParser, dest='cmd')
+        for i in range(n):
+            action.add_parser(f'cmd{i}', lazy=ArgumentParser, aliases=[f'c{i}'], help='help')
+
+    def measure(n):
+        return min(timeit.repeat(lambda: register(n), number=1, repeat=5))
+
+    # quadratic registration takes ~64 times longer for 8 times more sub-commands
+    assert measure(16000) < measure(2000) * 20
+
+
+def test_lazy_sub_parser_threads():
+    """Sub-parser chosen by several threads at once is made only once."""
+    import sys
+    import threading
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(20):
+            Args = type('Args', (), {'sub': sub_command(make_sub())})
+            compiled = argser.make_parser(Args())
+            barrier = threading.Barrier(8)
+            results = []
+
+            def run():
+                barrier.wait()
+                results.append(parse_args(Args, 'sub -a 2', compiled=compiled).sub.a)
+
+            threads = [threading.Thread(target=run) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [2] * 8
+    finally:
+        sys.setswitchinterval(interval)
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+from argser import plugins
+from argser.parse_func import SubCommands
+
+
+def make_dist(site, name, entry_points: str):
+    dist = site / f'{name}-1.0.dist-info'
+    dist.mkdir()
+    (dist / 'entry_points.txt').write_text(entry_points)
+    return dist
+
+
+def touch(path, shift=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + shift * 10 ** 9))
+
+
+@pytest.fixture()
+def site(tmp_path):
+    site = tmp_path / 'site'
+    site.mkdir()
+    make_dist(site, 'foo', '[tool.commands]\nfoo = foo_mod:main\nbar = foo_mod:bar [extra]\n')
+    make_dist(site, 'baz', '[console_scripts]\nbaz = baz:main\n')
+    return site
+
+
+class TestFindEntryPoints:
+    def test_find(self, site, tmp_path):
+        index = str(tmp_path / 'index.json')
+        res = plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert res == {'foo': 'foo_mod:main', 'bar': 'foo_mod:bar'}
+        assert os.path.exists(index)
+        res = plugins.find_entry_points('console_scripts', paths=[str(site)], index_path=False)
+        assert res == {'baz': 'baz:main'}
+
+    def test_index(self, site, tmp_path, mocker):
+        index = str(tmp_path / 'index.json')
+        spy = mocker.spy(plugins, '_read_entry_points')
+        plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert spy.call_count == 2
+
+        # nothing has changed
+        plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert spy.call_count == 2
+
+        # only new distribution is read
+        make_dist(site, 'new', '[tool.commands]\nnew = new_mod:main\n')
+        touch(site)
+        res = plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert spy.call_count == 3
+        assert res['new'] == 'new_mod:main'
+
+        # only updated distribution is read
+        (site / 'foo-1.0.dist-info' / 'entry_points.txt').write_text(
+            '[tool.commands]\nfoo = foo_mod:main\n'
+        )
+        touch(site / 'foo-1.0.dist-info' / 'entry_points.txt')
+        touch(site, shift=20)
+        res = plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert spy.call_count == 4
+        assert res == {'foo': 'foo_mod:main', 'new': 'new_mod:main'}
+
+    def test_rewritten_in_place(self, site, tmp_path, mocker):
+        index = str(tmp_path / 'index.json')
+        plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        spy = mocker.spy(plugins, '_read_entry_points')
+
+        # mtimes of the directories stay the same
+        dist = site / 'foo-1.0.dist-info'
+        stats = [os.stat(site), os.stat(dist)]
+        (dist / 'entry_points.txt').write_text('[tool.commands]\nqux = foo_mod:qux\n')
+        touch(dist / 'entry_points.txt')
+        for path, st in zip([site, dist], stats):
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        res = plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert res == {'qux': 'foo_mod:qux'}
+        assert spy.call_count == 1
+        plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=index)
+        assert spy.call_count == 1
+
+    def test_broken_index(self, site, tmp_path):
+        index = tmp_path / 'index.json'
+        index.write_text('{broken')
+        res = plugins.find_entry_points('tool.commands', paths=[str(site)], index_path=str(index))
+        assert res['foo'] == 'foo_mod:main'
+
+    def test_missing_path(self, tmp_path):
+        res = plugins.find_entry_points('x', paths=[str(tmp_path / 'nope')], index_path=False)
+        assert res == {}
+
+
+def test_sub_commands(site, tmp_path, monkeypatch):
+    (site / 'foo_mod.py').write_text(
+        'def main(a: int = 1):\n    return a\n\ndef bar():\n    return "bar"\n'
+    )
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.delitem(sys.modules, 'foo_mod', raising=False)
+    subs = SubCommands()
+    subs.add_entry_points('tool.commands', index_path=str(tmp_path / 'index.json'))
+    assert 'foo_mod' not in sys.modules
+    assert subs.parse('foo -a 2') == 2
+    assert subs.parse('bar') == 'bar'
+    sys.modules.pop('foo_mod', None)
@@ -0,0 +1,113 @@
+import os
+import re
+
+import pytest
+
+from argser import scripts
+from argser.scripts import _translate, find_scripts
+
+MARKED = '#!/usr/bin/env python\n# PYTHON_ARGCOMPLETE_OK\n'
+
+
+def write(path, text=MARKED):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    root = tmp_path / 'repo'
+    write(root / 'a.py')
+    write(root / 'plain.py', 'print(1)\n')
+    write(root / 'pkg' / 'b.py')
+    write(root / 'pkg' / 'deep' / 'c.py')
+    write(root / 'pkg' / 'notes.txt')
+    write(root / '.hidden' / 'h.py')
+    write(root / 'node_modules' / 'x' / 'n.py')
+    write(root / 'env' / 'pyvenv.cfg', '')
+    write(root / 'env' / 'lib' / 'v.py')
+    write(root / 'generated' / 'g.py')
+    write(root / 'logs' / 'keep.py')
+    write(root / 'logs' / 'skip.py')
+    write(root / 'pkg' / 'local.py')
+    write(root / '.gitignore', '# comment\ngenerated/\nlogs/*.py\n!logs/keep.py\n')
+    write(root / 'pkg' / '.gitignore', 'local.py\n')
+    return root
+
+
+def rel(root, paths):
+    return [os.path.relpath(p, root) for p in paths]
+
+
+@pytest.mark.parametrize(
+    'pattern, path, matches',
+    [
+        ('*.py', 'a.py', True),
+        ('*.py', 'x/y/a.py', True),
+        ('/a.py', 'x/a.py', False),
+        ('x/*.py', 'x/a.py', True),
+        ('x/*.py', 'x/y/a.py', False),
+        ('x/**/a.py', 'x/a.py', True),
+        ('x/**/a.py', 'x/y/z/a.py', True),
+        ('**/build', 'x/build', True),
+        ('x/**', 'x/y/z', True),
+        ('file?.txt', 'file1.txt', True),
+        ('file[0-9].txt', 'filea.txt', False),
+        ('file[!0-9].txt', 'filea.txt', True),
+        ('\\#name', '#name', True),
+    ],
+)
+def test_translate(pattern, path, matches):
+    assert bool(re.match(_translate(pattern), path)) is matches
+
+
+def test_find(tree, tmp_path):
+    index = str(tmp_path / 'index.json')
+    res = find_scripts(str(tree), index_path=index)
+    assert rel(tree, res) == ['a.py', 'logs/keep.py', 'pkg/b.py', 'pkg/deep/c.py']
+    res = find_scripts(str(tree), mark=False, index_path=index)
+    assert 'plain.py' in rel(tree, res)
+    res = find_scripts(str(tree / 'pkg'), recursive=False, index_path=False)
+    assert rel(tree, res) == ['pkg/b.py']
+
+
+def test_index(tree, tmp_path, mocker):
+    index = str(tmp_path / 'index.json')
+    spy = mocker.spy(scripts, 'has_mark')
+    find_scripts(str(tree), index_path=index)
+    assert spy.call_count == 5
+
+    # nothing has changed
+    find_scripts(str(tree), index_path=index)
+    assert spy.call_count == 5
+
+    # only changed files are read
+    write(tree / 'plain.py', MARKED + 'print(1)\n')
+    write(tree / 'new.py', 'print(2)\n')
+    res = find_scripts(str(tree), index_path=index)
+    assert spy.call_count == 7
+    assert 'plain.py' in rel(tree, res) and 'new.py' not in rel(tree, res)
+
+    # removed files are dropped from index
+    os.remove(tree / 'plain.py')
+    assert 'plain.py' not in rel(tree, find_scripts(str(tree), index_path=index))
+    assert str(tree / 'plain.py') not in scripts._load_index(index)
+
+
+def test_workers(tree):
+    for i in range(scripts.POOL_THRESHOLD):
+        write(tree / 'many' / f'{i}.py', MARKED if i % 2 else '')
+    res = find_scripts(str(tree), index_path=False, workers=4)
+    assert len(res) == 4 + scripts.POOL_THRESHOLD // 2
+    assert find_scripts(str(tree), index_path=False, workers=1) == res
+
+
+def test_cli(tree, monkeypatch, capsys, tmp_path):
+    from argser.__main__ import find_scripts as cli_find, extract_scripts
+
+    monkeypatch.chdir(tree)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    assert rel(tree, cli_find()) == ['a.py', 'logs/keep.py', 'pkg/b.py', 'pkg/deep/c.py']
+    assert rel(tree, extract_scripts(['pkg', 'plain.py'])) == ['pkg/b.py', 'plain.py']
+    with pytest.raises(FileNotFoundError):
+        extract_scripts(['node_modules/x/nope.py'])
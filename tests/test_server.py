@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from argser import Opt, SubCommands, sub_command
+from argser.server import make_server, request
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="requires Unix sockets")
+
+
+def make_subs():
+    subs = SubCommands()
+
+    @subs.add
+    def add(a: int, b: int = 1):
+        return a + b
+
+    @subs.add
+    def echo(text):
+        print(text)
+
+    @subs.add
+    def cwd():
+        return os.getcwd()
+
+    @subs.add
+    def env(name):
+        return os.environ.get(name)
+
+    @subs.add
+    def fail():
+        raise ValueError('fail')
+
+    return subs
+
+
+@pytest.fixture()
+def start(tmp_path):
+    servers = []
+
+    def start_server(target, **kwargs):
+        path = str(tmp_path / f'argser{len(servers)}.sock')
+        server = make_server(target, path, **kwargs)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return path
+
+    yield start_server
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestServer:
+    def test_commands(self, start, mocker):
+        from argser import parse_func
+
+        spy = mocker.spy(parse_func, 'make_parser')
+        path = start(make_subs(), workers=2)
+        assert request(path, ['add', '1', '-b', '2'])['result'] == 3
+        res = request(path, ['echo', 'hello'])
+        assert res['ok'] and res['stdout'] == 'hello\n' and res['result'] is None
+        assert request(path, ['add', '5'])['result'] == 6
+        assert spy.call_count == 1
+
+    def test_errors(self, start):
+        path = start(make_subs())
+        res = request(path, ['add', 'x'])
+        assert not res['ok'] and res['exit_code'] == 2
+        assert "invalid int value: 'x'" in res['stderr']
+        res = request(path, ['fail'])
+        assert not res['ok']
+        assert res['error']['type'] == 'ValueError'
+        res = request(path, ['-h'])
+        assert res['ok'] and res['exit_code'] == 0 and 'usage:' in res['stdout']
+
+    def test_env_with_threads(self, start, tmp_path):
+        path = start(make_subs(), workers=2)
+        res = request(path, ['cwd'], cwd=str(tmp_path))
+        assert not res['ok'] and 'processes' in res['error']['message']
+
+        path = start(make_subs(), workers=1)
+        cwd = os.getcwd()
+        assert request(path, ['cwd'], cwd=str(tmp_path))['result'] == str(tmp_path)
+        assert request(path, ['env', 'FOO'], env={'FOO': 'bar'})['result'] == 'bar'
+        assert os.getcwd() == cwd
+        assert 'FOO' not in os.environ
+
+    def test_processes(self, start, tmp_path):
+        path = start(make_subs(), workers=2, processes=True)
+        assert request(path, ['add', '1'])['result'] == 2
+        assert request(path, ['cwd'], cwd=str(tmp_path))['result'] == str(tmp_path)
+        assert request(path, ['echo', 'foo'])['stdout'] == 'foo\n'
+
+    def test_args_class(self, start):
+        class Args:
+            a = 1
+            b: bool = Opt(default=False)
+
+        path = start(Args)
+        assert request(path, ['-a', '2'])['result'] == {'a': 2, 'b': False}
+
+    def test_concurrent_clients(self, start):
+        class Sub:
+            value = 0
+
+        class Args:
+            sub = sub_command(Sub)
+
+        def check(path, make_argv):
+            errors = []
+
+            def client(n):
+                for i in range(n * 100, n * 100 + 50):
+                    res = request(path, make_argv(i))
+                    if res.get('result') != i:
+                        errors.append((i, res))
+
+            threads = [threading.Thread(target=client, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert errors == []
+
+        def handler(args):
+            time.sleep(0.001)  # let other threads parse their requests
+            return args.sub.value
+
+        path = start(Args, workers=4, handler=handler)
+        check(path, lambda i: ['sub', '-v', str(i)])
+
+        subs = make_subs()
+
+        @subs.add
+        def slow(value: int):
+            time.sleep(0.001)
+            return value
+
+        path = start(subs, workers=4)
+        check(path, lambda i: ['slow', str(i)])
+
+    def test_client(self, start, capsys):
+        from argser.__main__ import main
+
+        path = start(make_subs())
+        argv = ['argser', 'client', '--socket', path, 'echo', 'foo']
+        with mock.patch.object(sys, 'argv', argv), pytest.raises(SystemExit) as e:
+            main()
+        assert e.value.code == 0
+        assert capsys.readouterr().out == 'foo\n'
+
+    def test_socket_path(self, start, tmp_path):
+        from argser import ArgserException
+
+        path = start(make_subs())
+        assert os.stat(path).st_mode & 0o077 == 0
+        with pytest.raises(ArgserException, match='already listening'):
+            make_server(make_subs(), path)
+        assert request(path, ['add', '1'])['result'] == 2
+
+        other = tmp_path / 'other'
+        other.write_text('data')
+        with pytest.raises(ArgserException, match="isn't a socket"):
+            make_server(make_subs(), str(other))
+        assert other.read_text() == 'data'
+
+        stale = str(tmp_path / 'stale.sock')
+        server = make_server(make_subs(), stale)
+        server.socket.close()  # server died without cleanup
+        server = make_server(make_subs(), stale)
+        server.server_close()
+        assert not os.path.exists(stale)
@@ -0,0 +1,130 @@
+import multiprocessing
+import pickle
+from typing import List
+
+import pytest
+
+import argser
+from argser import Opt, parse_args, sub_command
+from argser.exceptions import ArgserException
+from argser.spec import _specs, from_bytes, to_bytes
+
+
+def make_args():
+    class Args:
+        a = 1
+        b: List[int] = []
+        c = Opt(action='count', default=0)
+
+        class Sub:
+            d = 'foo'
+
+            class Sub2:
+                e = 2.2
+
+            sub2 = sub_command(Sub2)
+
+        sub = sub_command(Sub)
+
+        class Other:
+            f = True
+
+        other = sub_command(Other)
+
+    return Args
+
+
+def _in_worker(res):
+    return (res.a, res.sub.d, res.sub.sub2.e), res
+
+
+class TestSerialization:
+    @pytest.mark.parametrize('kind', ['slots', 'sparse'])
+    @pytest.mark.parametrize('args', ['', '-a 2 -cc', '-b 1 2 -a 3 sub -d bar sub2 -e 3', 'other --no-f'])
+    def test_results(self, kind, args):
+        res = parse_args(make_args(), args, **{kind: True})
+        data = to_bytes(res)
+        restored = from_bytes(data)
+        assert restored.__class__ is res.__class__
+        assert restored == res
+
+    @pytest.mark.parametrize('args', ['', '-a 2 sub sub2 -e 3'])
+    def test_regular(self, args):
+        Args = make_args()
+        parser, spec = argser.make_parser(Args())
+        res = argser.populate_holder(Args(), parser, spec, args)
+        data = to_bytes(res, spec)
+        restored = from_bytes(data, spec)
+        assert str(restored) == argser.stringify(res)
+
+        holder = from_bytes(data, spec, holder=Args())
+        assert holder.a == res.a
+        # sub-commands get copies of predefined holders
+        assert type(holder.sub) is type(res.sub)
+        assert holder.sub is None or holder.sub is not res.sub
+        assert argser.stringify(holder) == argser.stringify(res)
+
+    def test_regular_with_namespace(self):
+        res = parse_args(make_args(), '-a 5')
+        assert from_bytes(to_bytes(res)).a == 5
+
+    def test_only_overrides(self):
+        class Wide:
+            pass
+
+        for i in range(1000):
+            setattr(Wide, f'opt{i}', i)
+
+        small = to_bytes(parse_args(Wide, '--opt1 42', slots=True))
+        assert len(small) < 100
+        assert from_bytes(small).opt1 == 42
+
+    def test_pickle(self):
+        res = parse_args(make_args(), 'sub -d bar', slots=True)
+        restored = pickle.loads(pickle.dumps(res))
+        assert restored == res
+        assert restored.sub.d == 'bar'
+
+    @pytest.mark.parametrize('method', ['fork', 'spawn'])
+    @pytest.mark.parametrize('kind', ['slots', 'sparse'])
+    def test_other_process(self, method, kind):
+        if method not in multiprocessing.get_all_start_methods():
+            pytest.skip(f"{method} is not available")
+        # pool is started before the spec is compiled, so workers don't know it
+        with multiprocessing.get_context(method).Pool(1) as pool:
+            res = parse_args(make_args(), '-a 5 sub -d bar sub2 -e 3', **{kind: True})
+            values, restored = pool.apply_async(_in_worker, (res,)).get(timeout=60)
+        assert values == (5, 'bar', 3.0)
+        assert restored == res
+
+    def test_errors(self):
+        res = parse_args(make_args(), '', slots=True)
+        data = to_bytes(res)
+        _specs.clear()
+        with pytest.raises(ArgserException, match='not registered'):
+            from_bytes(data)
+
+        class Args:
+            x = 1
+
+        _, spec = argser.make_parser(Args())
+        with pytest.raises(ArgserException, match="doesn't match"):
+            from_bytes(data, spec)
+
+        with pytest.raises(ArgserException, match="unknown"):
+            to_bytes(parse_args(Args, '', keep_namespace=False))
+
+    def test_fingerprint(self):
+        def spec(a=1, b_type=str):
+            namespace = {'a': a, 'b': '1', '__annotations__': {'b': b_type}}
+            return argser.make_parser(type('Args', (), namespace)())[1]
+
+        assert spec().fingerprint == spec().fingerprint
+        assert spec(a=7).fingerprint != spec().fingerprint
+        assert spec(b_type=int).fingerprint != spec().fingerprint
+        assert spec(a=Opt(default=1, action='count')).fingerprint != spec().fingerprint
+
+        # default value is left out of serialized data, restoring with other default is an error
+        res = parse_args(type('Args', (), {'a': 1}), '', slots=True)
+        with pytest.raises(ArgserException, match="doesn't match"):
+            from_bytes(to_bytes(res), spec(a=7))
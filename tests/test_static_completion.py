@@ -0,0 +1,157 @@
+import os
+import shutil
+import subprocess
+from unittest import mock
+
+import pytest
+
+from argser import ArgserException, make_parser
+from argser import static_completion as sc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+from argser import Opt, parse_args, sub_command
+
+
+class Nested:
+    mode: str = Opt(choices=('fast', 'slow'), default='fast')
+
+
+class Sub:
+    value = 1
+    color: str = Opt(choices=('red', 'green'), default='red')
+    dyn: str = Opt(default='a', completer=lambda prefix, **kwargs: ['dyn1', 'dyn2'])
+    nested = sub_command(Nested)
+
+
+class Args:
+    flag = False
+    name: str = 'x'
+    sub = sub_command(Sub)
+
+
+if __name__ == '__main__':
+    print(parse_args(Args))
+'''
+
+
+@pytest.fixture()
+def script(tmp_path):
+    path = tmp_path / 'tool.py'
+    path.write_text('#!/usr/bin/env python\n' + SCRIPT)
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_walk():
+    namespace = {}
+    exec(SCRIPT, namespace)
+    parser, _ = make_parser(namespace['Args']())
+    root, sub, nested = sc.walk(parser)
+    assert root.path == 'root'
+    assert root.options == ['-h', '--help', '--flag', '-f', '--no-flag', '--no-f', '--name', '-n']
+    assert root.values == {'--name': None, '-n': None}
+    assert root.words == ['sub']
+    assert sub.path == 'root/sub'
+    assert sub.values['--color'] == ['red', 'green']
+    assert sub.values['-d'] is sc.DYNAMIC
+    assert sub.words == ['nested']
+    assert nested.path == 'root/sub/nested'
+    assert nested.values == {'--mode': ['fast', 'slow'], '-m': ['fast', 'slow']}
+
+
+BASH_TEST = '''
+source {code}
+complete_line() {{
+    COMP_LINE="$1"
+    COMP_POINT=${{#COMP_LINE}}
+    read -ra COMP_WORDS <<< "$1"
+    [[ "$1" == *" " ]] && COMP_WORDS+=("")
+    COMP_CWORD=$((${{#COMP_WORDS[@]}} - 1))
+    COMPREPLY=()
+    {function} {script}
+    echo "${{COMPREPLY[*]}}"
+}}
+complete_line "{script} "
+complete_line "{script} --name x sub -"
+complete_line "{script} sub -c g"
+complete_line "{script} sub nested --mode "
+complete_line "{script} sub --dyn "
+'''
+
+
+@pytest.mark.skipif(not shutil.which('bash'), reason="requires bash")
+def test_bash(script, tmp_path):
+    code = sc.static_completion(script, cache_dir=False)
+    function = code.split('-F ')[1].split()[0]
+    assert f'{function} {script} tool.py' in code
+    (tmp_path / 'code.sh').write_text(code)
+    test = BASH_TEST.format(code=tmp_path / 'code.sh', function=function, script=script)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run(['bash', '-c', test], env=env, stdout=subprocess.PIPE, timeout=30)
+    assert out.stdout.decode().splitlines() == [
+        '-h --help --flag -f --no-flag --no-f --name -n sub',
+        '-h --help --value -v --color -c --dyn -d',
+        'green',
+        'fast slow',
+        'dyn1 dyn2',  # completed by the script itself
+    ]
+
+
+def test_fish_and_tcsh(script):
+    fish = sc.static_completion(script, 'fish', cache_dir=False)
+    assert "case root:sub root/sub:nested" in fish
+    assert "-n 'test (_argser_static_tool_py_" in fish
+    assert "_cmd) = root/sub' -l color -x -a 'red green'" in fish
+    assert "_cmd) = root/sub' -s d -x -a '(_argser_static_tool_py_" in fish
+    assert "_cmd) = root' -l name -r -F" in fish
+
+    tcsh = sc.static_completion(script, 'tcsh', cache_dir=False)
+    assert f"complete {script} n/--name/f/" in tcsh
+    assert "'n/--color/(red green)/'" in tcsh
+    assert "'n/nested/(-h --help --mode -m)/'" in tcsh
+    assert "'p/1/(-h --help --flag -f --no-flag --no-f --name -n sub)/'" in tcsh
+    assert ' n/--dyn/f/ ' in tcsh
+
+    with pytest.raises(ArgserException):
+        sc.static_completion(script, 'zsh', cache_dir=False)
+
+
+def test_cache(script, tmp_path, mocker):
+    spy = mocker.spy(sc, '_capture_parser')
+    cache = str(tmp_path / 'cache')
+    code = sc.static_completion(script, cache_dir=cache)
+    assert sc.static_completion(script, cache_dir=cache) == code
+    assert spy.call_count == 1
+    assert sc.static_completion(script, 'fish', cache_dir=cache) != code
+    assert spy.call_count == 2
+
+    # script was changed
+    with open(script, 'a') as f:
+        f.write('\n# new line\n')
+    st = os.stat(script)
+    os.utime(script, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert sc.static_completion(script, cache_dir=cache) == code
+    assert spy.call_count == 3
+
+
+def test_no_parser(tmp_path):
+    path = tmp_path / 'plain.py'
+    path.write_text('print(1)\n')
+    with pytest.raises(ArgserException):
+        sc.static_completion(str(path), cache_dir=False)
+
+
+def test_cli(script, tmp_path, capsys):
+    from argser.__main__ import main
+
+    argv = ['argser', 'completion', '--static', script, str(tmp_path / 'nope.py')]
+    with mock.patch.dict(os.environ, XDG_CACHE_HOME=str(tmp_path / 'cache')):
+        with mock.patch('sys.argv', argv), pytest.raises(SystemExit) as e:
+            main()
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    assert '_argser_static_tool_py_' in captured.out
+    assert 'nope.py' in captured.err
+    assert os.listdir(tmp_path / 'cache' / 'argser' / 'completion' / 'bash')
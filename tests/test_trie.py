@@ -0,0 +1,106 @@
+from argparse import ArgumentParser
+
+import pytest
+
+from argser import make_parser, parse_args
+from argser.parser import INDEX_THRESHOLD, IndexedParser
+from argser.trie import Trie
+
+
+def test_trie():
+    trie = Trie([('abc', 1), ('ab', 2), ('b', 3)])
+    trie['abd'] = 4
+    trie['ab'] = 5
+    assert len(trie) == 4
+    assert trie['ab'] == 5 and trie.get('a') is None and 'a' not in trie and 'abd' in trie
+    with pytest.raises(KeyError):
+        trie['x']
+    assert trie.items('a') == [('ab', 5), ('abc', 1), ('abd', 4)]
+    assert trie.keys() == ['ab', 'abc', 'abd', 'b']
+    assert trie.items('ab', limit=2) == [('ab', 5), ('abc', 1)]
+    assert trie.items('x') == []
+    assert trie.unique('abc') == ('abc', 1)
+    assert trie.unique('b') == ('b', 3)
+    assert trie.unique('ab') is None
+
+
+def make(cls, n=INDEX_THRESHOLD, **kwargs):
+    parser = cls(prog='prog', **kwargs)
+    parser.add_argument('-x')
+    parser.add_argument('-y', action='store_true')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--version-file')
+    parser.add_argument('--width-b')
+    parser.add_argument('--width-a')
+    group = parser.add_argument_group('many')
+    for i in range(n):
+        group.add_argument(f'--opt{i:04}')
+    return parser
+
+
+@pytest.mark.parametrize(
+    'argv',
+    [
+        '--opt0001 1',
+        '--opt00=1',
+        '--opt0063=1',
+        '--opt006 1',  # ambiguous
+        '--verb',
+        '--ver',  # ambiguous
+        '--wid 1',  # ambiguous, matches are listed in order of declaration
+        '--version-f=a',
+        '-x1 -y',
+        '-xy',
+        '-yx',
+        '--nope 1',
+        '--opt1 1',
+        '-v',
+        '-z',
+        '-1',
+    ],
+)
+def test_abbreviations(argv, capsys):
+    """Indexed parser behaves exactly as argparse."""
+
+    def parse(parser):
+        try:
+            return vars(parser.parse_known_args(argv.split())[0]), None
+        except SystemExit as e:
+            return e.code, capsys.readouterr().err
+
+    expected = parse(make(ArgumentParser))
+    assert parse(make(IndexedParser)) == expected
+
+
+def test_no_abbrev(capsys):
+    parser = make(IndexedParser, allow_abbrev=False)
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--opt0001', '1', '--opt0002=2', '--opt00', '3'])
+    assert 'unrecognized arguments: --opt00 3' in capsys.readouterr().err
+
+
+def test_small_parser(mocker):
+    parser = make(IndexedParser, n=2)
+    spy = mocker.spy(Trie, 'items')
+    assert parser.parse_args(['--opt0001', '1', '--verb']).verbose
+    assert spy.call_count == 0
+
+
+def test_index_is_updated():
+    parser = make(IndexedParser)
+    assert parser.parse_args(['--verb']).verbose
+    assert parser._option_index is not None
+    parser.add_argument('--zeta')
+    assert parser.parse_args(['--ze', '1']).zeta == '1'
+
+
+def test_wide_spec():
+    namespace = {f'option_{i}_value': i for i in range(2000)}
+    namespace.update({f'flag_{i}': True for i in range(100)})
+    Args = type('Args', (), namespace)
+    parser, _ = make_parser(Args())
+    assert isinstance(parser, IndexedParser)
+    args = parse_args(Args, '--option-1999-v 1 --option-123-value=2 --no-flag-99 --no-flag-1')
+    assert (args.option_1999_value, args.option_123_value) == (1, 2)
+    assert not args.flag_99 and not args.flag_1 and args.flag_0
+    assert len(parser._get_option_index()) == len(parser._option_string_actions)
@@ -1,11 +1,22 @@
+import os
+import subprocess
+import sys
 import textwrap
 from typing import List
+from unittest import mock
 
 import pytest
 
 from argser import Arg, Opt, sub_command
 from argser.parser import _make_parser, _read_args, parse_args
-from argser.utils import is_list_like_type, with_args
+from argser.utils import (
+    dump_json,
+    is_list_like_type,
+    load_json,
+    user_cache_path,
+    with_args,
+    write_atomic,
+)
 
 
 @pytest.mark.parametrize(
@@ -27,6 +38,14 @@ def test_cli():
     autocomplete(args)
 
 
+def test_cli_run(capsys):
+    from argser.__main__ import main
+
+    with mock.patch('sys.argv', ['argser', 'run', 'textwrap', 'indent', 'foo', '> ']):
+        main()
+    assert capsys.readouterr().out == '> foo\n'
+
+
 class TestHelpFormatting:
     def compare(self, args, help_text: str):
         args, options, sub_commands = _read_args(args)
@@ -222,3 +241,75 @@ def test_with_args():
     assert with_args(func, args, 1, c=5) == 16
     assert with_args(func, args, 1, b=0) == 3
     assert with_args(func, args, 2, b=2, c=2) == 6
+
+
+@pytest.mark.parametrize('slots', [False, True])
+def test_with_args_hot_loop(slots, mocker):
+    """Repeated calls reuse binder and fields of the holder, so they aren't slower than kwargs."""
+    import timeit
+
+    from argser import parse_func
+    from argser.utils import args_to_dict
+
+    class Args:
+        a = 1
+        b = 2
+        c = 'x'
+        d = 1.5
+        e = False
+
+    def func(a, b, c, d, e):
+        return a
+
+    args = parse_args(Args, '', slots=slots)
+    assert with_args(func, args) == 1
+    spy = mocker.spy(parse_func, '_get_fields')
+    assert with_args(func, args) == 1
+    assert spy.call_count == 0
+
+    def with_kwargs():
+        return func(**args_to_dict(args))
+
+    def bound():
+        return with_args(func, args)
+
+    def measure(f):
+        return min(timeit.repeat(f, number=20000, repeat=5))
+
+    assert measure(bound) < measure(with_kwargs) * 1.2
+
+
+def test_user_cache_path(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert user_cache_path('a.json') == str(tmp_path / 'argser' / 'a.json')
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    monkeypatch.setenv('HOME', str(tmp_path))
+    assert user_cache_path() == os.path.join(str(tmp_path), '.cache', 'argser')
+
+
+def test_json_files(tmp_path):
+    path = str(tmp_path / 'sub' / 'data.json')
+    assert load_json(path) is None
+    dump_json(path, {'a': [1]})
+    assert load_json(path) == {'a': [1]}
+    with pytest.raises(TypeError):
+        dump_json(path, {'a': object()})
+    assert load_json(path) == {'a': [1]}
+    assert os.listdir(tmp_path / 'sub') == ['data.json']  # temporary file is removed
+    write_atomic(path, '{')
+    assert load_json(path) is None
+
+
+def test_import_is_light():
+    code = (
+        "import sys, argser; "
+        "print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in MODULES))); "
+        "from argser import CachedCompleter, MultiTool, cached_completer, repl, serve; "
+        "print(serve.__module__, MultiTool.__module__, 'serve' in dir(argser))"
+    )
+    modules = "{'socket', 'socketserver', 'select', 'hashlib', 'pickle', 'json', 'asyncio'}"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.check_output(
+        [sys.executable, '-c', code.replace('MODULES', modules)], cwd=root, universal_newlines=True
+    )
+    assert out == '\nargser.server argser.dispatch True\n'